@@ -0,0 +1,596 @@
+#!/usr/bin/env python
+
+import base64
+import json
+import struct
+import sys
+from collections import OrderedDict
+
+from runTest import binaryMagic, canonicalHash, compileCheckInputType, compileConvertIn, getExampleTypeNames, readChunks, scanJson, sniffChunks, unionTag
+
+# A binary container for the conformance tests.  Each example's engine is stored once, as JSON,
+# and the samples of its trials in Avro binary under the engine's input schema, so reading them
+# takes none of the base64 and "inf"/"nan" fixups of convertIn (see runTest.py).  A sample that
+# would not come back exactly as it was written (such as an integer given for a double, or a
+# float that is not representable in single precision) is kept as JSON.
+#
+# Layout (long is an Avro zig-zag varint; string and bytes are a long length and the data):
+#
+#     "PFATESTS"  long version  string header
+#     { long length  example }*  long 0
+#     string trailer
+#
+# where header and trailer are JSON objects of the top-level members before and after
+# "pfa-tests", and each example is
+#
+#     string function  string skeleton  long numberOfTrials
+#     { long kind  string trial  [bytes sample] }*
+#
+# The skeleton is the example with "trials": null, and a trial has "sample": null with the
+# sample in bytes if kind is 0, or its original sample and no bytes if kind is 1.
+
+binaryVersion = 1
+
+def writeLong(out, n):
+    if n >= 0:
+        n = n << 1
+    else:
+        n = (-n << 1) - 1
+    chars = []
+    while n > 0x7f:
+        chars.append(chr((n & 0x7f) | 0x80))
+        n >>= 7
+    chars.append(chr(n))
+    out.append("".join(chars))
+
+def readLong(data, pos):
+    b = ord(data[pos])
+    if b < 0x80:
+        return (b >> 1) ^ -(b & 1), pos + 1
+    pos += 1
+    n = b & 0x7f
+    shift = 7
+    while b & 0x80:
+        b = ord(data[pos])
+        pos += 1
+        n |= (b & 0x7f) << shift
+        shift += 7
+    # like json, return a long only if it doesn't fit in an int
+    return int((n >> 1) ^ -(n & 1)), pos
+
+def writeBytes(out, data):
+    writeLong(out, len(data))
+    out.append(data)
+
+def readBytes(data, pos):
+    size, pos = readLong(data, pos)
+    end = pos + size
+    if size < 0 or end > len(data):
+        raise ValueError("truncated binary data")
+    return data[pos:end], end
+
+def readString(data, pos):
+    x, pos = readBytes(data, pos)
+    return x.decode("utf-8"), pos
+
+specialFloats = {"inf": float("inf"), "-inf": float("-inf"), "nan": float("nan")}
+
+def formatFloat(x):
+    # the inverse of specialFloats, for the JSON form
+    if x != x:
+        return u"nan"
+    elif x == float("inf"):
+        return u"inf"
+    elif x == float("-inf"):
+        return u"-inf"
+    else:
+        return x
+
+# Encoders take samples in their JSON form and append to a list of strings; decoders take a
+# string and a position and return a value and the next position.  Decoders produce either the
+# form that convertIn would have produced (asJson=False) or the original JSON form, with its
+# members in order (asJson=True).  Named types are resolved on first use.
+
+def buildEncoder(t, typeNames, named):
+    if t == "null":
+        def encode(x, out):
+            if x is not None:
+                raise ValueError
+    elif t == "boolean":
+        def encode(x, out):
+            if x is True:
+                out.append("\x01")
+            elif x is False:
+                out.append("\x00")
+            else:
+                raise ValueError
+    elif t == "int" or t == "long":
+        def encode(x, out):
+            if isinstance(x, bool) or not isinstance(x, (int, long)):
+                raise ValueError
+            writeLong(out, x)
+    elif t == "float" or t == "double":
+        format = "<f" if t == "float" else "<d"
+        def encode(x, out):
+            if isinstance(x, basestring):
+                x = specialFloats[x]
+            elif isinstance(x, bool) or not isinstance(x, (int, long, float)):
+                raise ValueError
+            out.append(struct.pack(format, x))
+    elif t == "string":
+        def encode(x, out):
+            if not isinstance(x, unicode):
+                raise ValueError
+            writeBytes(out, x.encode("utf-8"))
+    elif t == "bytes":
+        def encode(x, out):
+            writeBytes(out, base64.b64decode(x))
+
+    elif isinstance(t, basestring):
+        def encode(x, out):
+            if t not in named:
+                named[t] = buildEncoder(typeNames[t], typeNames, named)
+            named[t](x, out)
+
+    elif isinstance(t, dict) and t["type"] == "fixed":
+        size = t["size"]
+        def encode(x, out):
+            data = base64.b64decode(x)
+            if len(data) != size:
+                raise ValueError
+            out.append(data)
+    elif isinstance(t, dict) and t["type"] == "enum":
+        symbols = t["symbols"]
+        def encode(x, out):
+            writeLong(out, symbols.index(x))
+    elif isinstance(t, dict) and t["type"] == "array":
+        items = buildEncoder(t["items"], typeNames, named)
+        def encode(x, out):
+            if not isinstance(x, list):
+                raise ValueError
+            if len(x) > 0:
+                writeLong(out, len(x))
+                for v in x:
+                    items(v, out)
+            out.append("\x00")
+    elif isinstance(t, dict) and t["type"] == "map":
+        values = buildEncoder(t["values"], typeNames, named)
+        def encode(x, out):
+            if not isinstance(x, dict):
+                raise ValueError
+            if len(x) > 0:
+                writeLong(out, len(x))
+                for k, v in x.items():
+                    writeBytes(out, k.encode("utf-8"))
+                    values(v, out)
+            out.append("\x00")
+    elif isinstance(t, dict) and t["type"] == "record":
+        fields = [(f["name"], buildEncoder(f["type"], typeNames, named)) for f in t["fields"]]
+        def encode(x, out):
+            if not isinstance(x, dict) or len(x) != len(fields):
+                raise ValueError
+            for name, field in fields:
+                field(x[name], out)
+
+    elif isinstance(t, list):
+        # tagged values go to the first branch with that tag, as in convertIn
+        indexes = {}
+        for i, ti in enumerate(t):
+            indexes.setdefault(unionTag(ti), i)
+        branches = [buildEncoder(ti, typeNames, named) for ti in t]
+        def encode(x, out):
+            if x is None:
+                i = indexes["null"]
+            elif isinstance(x, dict) and len(x) == 1:
+                tag, x = x.items()[0]
+                i = indexes[tag]
+            else:
+                raise ValueError
+            writeLong(out, i)
+            branches[i](x, out)
+
+    else:
+        raise ValueError("cannot encode type " + json.dumps(t))
+
+    return encode
+
+def buildDecoder(t, typeNames, named, asJson):
+    mapping = OrderedDict if asJson else dict
+
+    if t == "null":
+        def decode(data, pos):
+            return None, pos
+    elif t == "boolean":
+        def decode(data, pos):
+            return data[pos] != "\x00", pos + 1
+    elif t == "int" or t == "long":
+        decode = readLong
+    elif t == "float" or t == "double":
+        format = struct.Struct("<f" if t == "float" else "<d")
+        unpack = format.unpack_from
+        size = format.size
+        if asJson:
+            def decode(data, pos):
+                return formatFloat(unpack(data, pos)[0]), pos + size
+        else:
+            def decode(data, pos):
+                return unpack(data, pos)[0], pos + size
+    elif t == "string":
+        decode = readString
+    elif t == "bytes":
+        if asJson:
+            def decode(data, pos):
+                x, pos = readBytes(data, pos)
+                return unicode(base64.b64encode(x)), pos
+        else:
+            decode = readBytes
+
+    elif isinstance(t, basestring):
+        def decode(data, pos):
+            if t not in named:
+                named[t] = buildDecoder(typeNames[t], typeNames, named, asJson)
+            return named[t](data, pos)
+
+    elif isinstance(t, dict) and t["type"] == "fixed":
+        size = t["size"]
+        if asJson:
+            def decode(data, pos):
+                return unicode(base64.b64encode(data[pos:pos + size])), pos + size
+        else:
+            def decode(data, pos):
+                return data[pos:pos + size], pos + size
+    elif isinstance(t, dict) and t["type"] == "enum":
+        symbols = t["symbols"]
+        def decode(data, pos):
+            i, pos = readLong(data, pos)
+            return symbols[i], pos
+    elif isinstance(t, dict) and t["type"] == "array":
+        items = buildDecoder(t["items"], typeNames, named, asJson)
+        # arrays of numbers are unpacked in one step
+        packed = None
+        if not asJson and t["items"] in ("float", "double"):
+            packed = "<%d" + ("f" if t["items"] == "float" else "d")
+        def decode(data, pos):
+            out = []
+            count, pos = readLong(data, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    size, pos = readLong(data, pos)
+                if packed is not None:
+                    format = packed % count
+                    out.extend(struct.unpack_from(format, data, pos))
+                    pos += struct.calcsize(format)
+                else:
+                    for i in xrange(count):
+                        x, pos = items(data, pos)
+                        out.append(x)
+                count, pos = readLong(data, pos)
+            return out, pos
+    elif isinstance(t, dict) and t["type"] == "map":
+        values = buildDecoder(t["values"], typeNames, named, asJson)
+        def decode(data, pos):
+            out = []
+            count, pos = readLong(data, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    size, pos = readLong(data, pos)
+                for i in xrange(count):
+                    k, pos = readString(data, pos)
+                    v, pos = values(data, pos)
+                    out.append((k, v))
+                count, pos = readLong(data, pos)
+            return mapping(out), pos
+    elif isinstance(t, dict) and t["type"] == "record":
+        fields = [(f["name"], buildDecoder(f["type"], typeNames, named, asJson)) for f in t["fields"]]
+        def decode(data, pos):
+            out = []
+            for name, field in fields:
+                x, pos = field(data, pos)
+                out.append((name, x))
+            return mapping(out), pos
+
+    elif isinstance(t, list):
+        branches = []
+        for ti in t:
+            if ti == "null":
+                branches.append(None)
+            else:
+                branches.append((unionTag(ti), buildDecoder(ti, typeNames, named, asJson)))
+        def decode(data, pos):
+            i, pos = readLong(data, pos)
+            if branches[i] is None:
+                return None, pos
+            tag, branch = branches[i]
+            x, pos = branch(data, pos)
+            return mapping([(tag, x)]), pos
+
+    else:
+        raise ValueError("cannot decode type " + json.dumps(t))
+
+    return decode
+
+encoderCache = {}
+def compileEncoder(t, typeNames):
+    key = canonicalHash([t, typeNames])
+    if key not in encoderCache:
+        encoderCache[key] = buildEncoder(t, typeNames, {})
+    return encoderCache[key]
+
+decoderCache = {}
+def compileDecoder(t, typeNames, asJson=False):
+    key = canonicalHash([t, typeNames]), asJson
+    if key not in decoderCache:
+        decoderCache[key] = buildDecoder(t, typeNames, {}, asJson)
+    return decoderCache[key]
+
+def identical(one, two):
+    # stricter than ==: types must agree (even int and long, which differ in repr) and so must
+    # the order of members, which determines how a sample is printed
+    if isinstance(one, dict):
+        return isinstance(two, dict) and len(one) == len(two) and all(identical(k1, k2) and identical(v1, v2) for (k1, v1), (k2, v2) in zip(one.items(), two.items()))
+    elif isinstance(one, list):
+        return isinstance(two, list) and len(one) == len(two) and all(identical(x1, x2) for x1, x2 in zip(one, two))
+    elif isinstance(one, bool) or one is None:
+        return one is two
+    elif isinstance(one, float):
+        return isinstance(two, float) and (one == two and repr(one) == repr(two) or (one != one and two != two))
+    else:
+        return type(one) == type(two) and one == two
+
+def encodeExample(text):
+    # returns the block of one example, given as JSON text, and the number of samples kept as JSON
+    example = json.loads(text, object_pairs_hook=OrderedDict)
+    if not isinstance(example, dict) or "function" not in example or not isinstance(example.get("trials"), list):
+        raise ValueError("not a PFA test example: " + text[:100])
+
+    # the form that the runners see, to check the round trip against
+    plain = json.loads(text)
+    try:
+        inputType = plain["engine"]["input"]
+        typeNames = getExampleTypeNames(plain)
+        convert = compileConvertIn(inputType)
+        check = compileCheckInputType(inputType, typeNames)
+        encode = compileEncoder(inputType, typeNames)
+        decode = compileDecoder(inputType, typeNames)
+        decodeJson = compileDecoder(inputType, typeNames, asJson=True)
+    except Exception:
+        encode = None
+
+    out = []
+    writeBytes(out, example["function"].encode("utf-8"))
+    writeBytes(out, json.dumps(OrderedDict((k, None if k == "trials" else v) for k, v in example.items()), separators=(",", ":")))
+    writeLong(out, len(example["trials"]))
+
+    keptAsJson = 0
+    for trial, plainTrial in zip(example["trials"], plain["trials"]):
+        sample = None
+        if encode is not None and isinstance(trial, dict) and "sample" in trial:
+            try:
+                encoded = []
+                encode(trial["sample"], encoded)
+                encoded = "".join(encoded)
+                asJson, end1 = decodeJson(encoded, 0)
+                asNative, end2 = decode(encoded, 0)
+                if end1 == end2 == len(encoded) and identical(asJson, trial["sample"]) and identical(asNative, check(convert(plainTrial["sample"]))):
+                    sample = encoded
+            except Exception:
+                pass
+
+        if sample is not None:
+            writeLong(out, 0)
+            writeBytes(out, json.dumps(OrderedDict((k, None if k == "sample" else v) for k, v in trial.items()), separators=(",", ":")))
+            writeBytes(out, sample)
+        else:
+            keptAsJson += 1
+            writeLong(out, 1)
+            writeBytes(out, json.dumps(trial, separators=(",", ":")))
+
+    return "".join(out), keptAsJson
+
+def decodeExample(block, asJson=False):
+    # returns an example as getExamples would (with samples converted as by convertInput) or,
+    # with asJson, in its original JSON form
+    function, pos = readBytes(block, 0)
+    skeleton, pos = readBytes(block, pos)
+    if asJson:
+        example = json.loads(skeleton, object_pairs_hook=OrderedDict)
+    else:
+        example = json.loads(skeleton)
+    numberOfTrials, pos = readLong(block, pos)
+
+    decode = None
+    convert = None
+    trials = []
+    for i in xrange(numberOfTrials):
+        kind, pos = readLong(block, pos)
+        text, pos = readBytes(block, pos)
+        if asJson:
+            trial = json.loads(text, object_pairs_hook=OrderedDict)
+        else:
+            trial = json.loads(text)
+
+        if kind == 0:
+            sample, pos = readBytes(block, pos)
+            if decode is None:
+                decode = compileDecoder(example["engine"]["input"], getExampleTypeNames(example), asJson)
+            value, end = decode(sample, 0)
+            if asJson:
+                trial["sample"] = value
+            else:
+                trial = dict(trial, sample=value)
+
+        elif not asJson:
+            if convert is None:
+                inputType = example["engine"]["input"]
+                convert = compileConvertIn(inputType)
+                check = compileCheckInputType(inputType, getExampleTypeNames(example))
+            try:
+                trial = dict(trial, sample=check(convert(trial["sample"])))
+            except TypeError:
+                print example["function"] + "\t" + json.dumps(example["engine"])
+                raise
+
+        trials.append(trial)
+
+    if asJson:
+        example["trials"] = trials
+        return example
+    else:
+        return dict(example, trials=trials)
+
+class BinaryScanner(object):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = ""
+        self.position = 0
+        self.offset = 0
+
+    def need(self, size):
+        # makes at least size bytes available at position, unless the file ends first
+        if self.position + size <= len(self.buffer):
+            return True
+        got = [self.buffer[self.position:]]
+        have = len(got[0])
+        self.offset += self.position
+        self.position = 0
+        while have < size:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                break
+            got.append(chunk)
+            have += len(chunk)
+        self.buffer = "".join(got)
+        return have >= size
+
+    def readLong(self):
+        # a long is at most 10 bytes; near the end of the file, fewer may be left
+        self.need(10)
+        try:
+            x, self.position = readLong(self.buffer, self.position)
+        except IndexError:
+            raise ValueError("truncated binary test file at byte %d" % (self.offset + self.position))
+        return x
+
+    def readBytes(self, size):
+        if size < 0 or not self.need(size):
+            raise ValueError("truncated binary test file at byte %d" % (self.offset + self.position))
+        start = self.position
+        self.position += size
+        return self.offset + start, self.buffer[start:self.position]
+
+def scanBinary(chunks, header=None, trailer=None):
+    # yields (byte offset, block, function name) for each example; the members of the header and
+    # trailer are appended to those lists, if given, as (key, value) pairs
+    scanner = BinaryScanner(chunks)
+    offset, magic = scanner.readBytes(len(binaryMagic))
+    if magic != binaryMagic:
+        raise ValueError("not a binary PFA test file")
+    version = scanner.readLong()
+    if version != binaryVersion:
+        raise ValueError("unsupported binary PFA test file version %d" % version)
+
+    offset, text = scanner.readBytes(scanner.readLong())
+    if header is not None:
+        header.extend(json.loads(text, object_pairs_hook=OrderedDict).items())
+
+    while True:
+        size = scanner.readLong()
+        if size == 0:
+            break
+        offset, block = scanner.readBytes(size)
+        function, pos = readString(block, 0)
+        yield offset, block, function
+
+    offset, text = scanner.readBytes(scanner.readLong())
+    if trailer is not None:
+        trailer.extend(json.loads(text, object_pairs_hook=OrderedDict).items())
+
+def jsonToBinary(openFile, outputFile):
+    # returns the number of examples, trials and samples kept as JSON
+    header = []
+    headerWritten = [False]
+    def writeHeader():
+        if not headerWritten[0]:
+            out = [binaryMagic]
+            writeLong(out, binaryVersion)
+            writeBytes(out, json.dumps(OrderedDict(header)))
+            outputFile.write("".join(out))
+            headerWritten[0] = True
+            return len(header)
+
+    numberOfExamples = numberOfTrials = keptAsJson = 0
+    inHeader = 0
+    for offset, text, example in scanJson(readChunks(openFile), header):
+        if not headerWritten[0]:
+            inHeader = writeHeader()
+        block, kept = encodeExample(text)
+        out = []
+        writeBytes(out, block)
+        outputFile.write("".join(out))
+        numberOfExamples += 1
+        numberOfTrials += len(example["trials"])
+        keptAsJson += kept
+
+    if not headerWritten[0]:
+        inHeader = writeHeader()
+    out = []
+    writeLong(out, 0)
+    writeBytes(out, json.dumps(OrderedDict(header[inHeader:])))
+    outputFile.write("".join(out))
+    return numberOfExamples, numberOfTrials, keptAsJson
+
+def formatExample(example):
+    members = []
+    for key, value in example.items():
+        if key == "trials":
+            members.append('"trials": [\n' + ",\n".join("          " + json.dumps(x) for x in value) + "\n      ]")
+        else:
+            members.append(json.dumps(key) + ": " + json.dumps(value))
+    return "     {" + ",\n      ".join(members) + "}"
+
+def binaryToJson(openFile, outputFile):
+    # returns the number of examples and trials; the layout is that of generateTestTemplate.py
+    binary, chunks = sniffChunks(openFile)
+    if not binary:
+        raise ValueError("not a binary PFA test file")
+
+    header = []
+    trailer = []
+    def writeHeader():
+        outputFile.write("{" + "".join(json.dumps(k) + ": " + json.dumps(v) + ",\n " for k, v in header) + '"pfa-tests": [\n')
+
+    numberOfExamples = numberOfTrials = 0
+    for offset, block, function in scanBinary(chunks, header, trailer):
+        example = decodeExample(block, asJson=True)
+        if numberOfExamples == 0:
+            writeHeader()
+        else:
+            outputFile.write(",\n")
+        outputFile.write(formatExample(example))
+        numberOfExamples += 1
+        numberOfTrials += len(example["trials"])
+
+    if numberOfExamples == 0:
+        writeHeader()
+    outputFile.write("\n ]" + "".join(",\n " + json.dumps(k) + ": " + json.dumps(v) for k, v in trailer) + "}")
+    return numberOfExamples, numberOfTrials
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert a PFA test suite from JSON to the binary format or back; the direction is determined by the input.")
+    parser.add_argument("inputFile", help="test suite to convert, such as pfa-tests.json (possibly gzipped) or pfa-tests.bin")
+    parser.add_argument("outputFile", help="converted test suite")
+    args = parser.parse_args()
+
+    binary, chunks = sniffChunks(open(args.inputFile, "rb"))
+    outputFile = open(args.outputFile, "wb")
+    if binary:
+        numberOfExamples, numberOfTrials = binaryToJson(open(args.inputFile, "rb"), outputFile)
+        print >>sys.stderr, "wrote %d examples with %d trials as JSON" % (numberOfExamples, numberOfTrials)
+    else:
+        numberOfExamples, numberOfTrials, keptAsJson = jsonToBinary(open(args.inputFile, "rb"), outputFile)
+        print >>sys.stderr, "wrote %d examples with %d trials in binary (%d samples kept as JSON)" % (numberOfExamples, numberOfTrials, keptAsJson)
+    outputFile.close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import json
+import math
+import sys
+from collections import OrderedDict
+
+from runTest import functionGroup
+
+# Compares two benchmark files written by runTestTitus.py or runTestHadrian.py --benchmark (two
+# implementations, or two versions of one, on the same test suite).  For each function, the ratio
+# is the candidate's latency over the baseline's, so a ratio above 1 means the candidate is slower;
+# ratios beyond 1 + threshold are flagged as regressions.  Each library family (libfcns.xml prefix)
+# is summarized by the geometric mean of its ratios.
+
+def latency(entry, phase, metric):
+    if phase in entry and entry[phase][metric] > 0.0:
+        return entry[phase][metric]
+    else:
+        return None
+
+def geometricMean(ratios):
+    return math.exp(sum(math.log(x) for x in ratios) / len(ratios))
+
+def compareBenchmarks(baseline, candidate, phase="action", metric="p50", threshold=0.1):
+    # returns OrderedDict of group -> OrderedDict of function -> (baseline, candidate, ratio,
+    # regressed), with None for what one of the files lacks
+    functions = sorted(set(baseline["functions"]) | set(candidate["functions"]))
+    out = OrderedDict()
+    for function in functions:
+        one = baseline["functions"].get(function)
+        two = candidate["functions"].get(function)
+        one = latency(one, phase, metric) if one is not None else None
+        two = latency(two, phase, metric) if two is not None else None
+        if one is not None and two is not None:
+            ratio = two / one
+            regressed = ratio > 1.0 + threshold
+        else:
+            ratio = None
+            regressed = False
+        out.setdefault(functionGroup(function), OrderedDict())[function] = (one, two, ratio, regressed)
+    return OrderedDict((group, out[group]) for group in sorted(out))
+
+def formatLatency(x):
+    if x is None:
+        return "%12s" % "-"
+    else:
+        return "%12.2f" % (1e6 * x)
+
+def formatReport(comparison, baselineName, candidateName, phase, metric, threshold):
+    lines = ["%s %s latency (us) of %s vs %s; ratio > %g flagged" % (phase, metric, candidateName, baselineName, 1.0 + threshold), ""]
+    lines.append("%-40s %12s %12s %8s" % ("function", "baseline", "candidate", "ratio"))
+    regressions = []
+    for group, functions in comparison.items():
+        ratios = [ratio for one, two, ratio, regressed in functions.values() if ratio is not None]
+        lines.append("")
+        if len(ratios) > 0:
+            lines.append("[%s]  %d functions, geometric mean ratio %.3f" % (group if group != "" else "core", len(functions), geometricMean(ratios)))
+        else:
+            lines.append("[%s]  %d functions" % (group if group != "" else "core", len(functions)))
+        # largest ratios first, then functions that only one side has
+        for function, (one, two, ratio, regressed) in sorted(functions.items(), key=lambda x: (x[1][2] is None, -(x[1][2] or 0.0), x[0])):
+            if ratio is None:
+                lines.append("%-40s %s %s %8s" % (function, formatLatency(one), formatLatency(two), "-"))
+            else:
+                lines.append("%-40s %s %s %8.3f%s" % (function, formatLatency(one), formatLatency(two), ratio, "  REGRESSION" if regressed else ""))
+            if regressed:
+                regressions.append(function)
+
+    allRatios = [ratio for functions in comparison.values() for one, two, ratio, regressed in functions.values() if ratio is not None]
+    lines.append("")
+    if len(allRatios) > 0:
+        lines.append("overall: %d functions compared, geometric mean ratio %.3f, %d regressions" % (len(allRatios), geometricMean(allRatios), len(regressions)))
+    else:
+        lines.append("overall: no functions in common")
+    return "\n".join(lines), regressions
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare the per-function latencies of two --benchmark outputs of runTestTitus.py or runTestHadrian.py. Exits with status 1 if any function regressed.")
+    parser.add_argument("baseline", help="benchmark JSON of the reference implementation or version")
+    parser.add_argument("candidate", help="benchmark JSON to compare with it")
+    parser.add_argument("--metric", choices=("p50", "p95", "p99", "max"), default="p50", help="latency percentile to compare (default p50)")
+    parser.add_argument("--phase", choices=("action", "build"), default="action", help="compare the engine actions (default) or the engine builds")
+    parser.add_argument("--threshold", type=float, default=0.1, help="flag functions whose candidate/baseline ratio exceeds 1 + this (default 0.1)")
+    parser.add_argument("--json", metavar="FILE", default=None, help="also write the comparison to FILE as JSON")
+    args = parser.parse_args()
+
+    baseline = json.load(open(args.baseline))
+    candidate = json.load(open(args.candidate))
+    comparison = compareBenchmarks(baseline, candidate, args.phase, args.metric, args.threshold)
+
+    report, regressions = formatReport(comparison, baseline.get("implementation") or args.baseline, candidate.get("implementation") or args.candidate, args.phase, args.metric, args.threshold)
+    print report
+
+    if args.json is not None:
+        out = OrderedDict([("baseline", baseline.get("implementation")), ("candidate", candidate.get("implementation")), ("phase", args.phase), ("metric", args.metric), ("threshold", args.threshold), ("groups", OrderedDict())])
+        for group, functions in comparison.items():
+            out["groups"][group] = OrderedDict((function, OrderedDict([("baseline", one), ("candidate", two), ("ratio", ratio), ("regression", regressed)])) for function, (one, two, ratio, regressed) in functions.items())
+        json.dump(out, open(args.json, "w"), indent=2)
+
+    if len(regressions) > 0:
+        sys.exit(1)
@@ -1,39 +1,97 @@
 #!/usr/bin/env python
 
-import math
 import json
-import xml.etree.ElementTree
 import re
 from collections import OrderedDict as odict
 import codecs
 import sys
 import base64
+import copy
+import gzip
+import hashlib
+import itertools
+import os
+
+from signatureCatalog import Parameter, Pattern, Primitive, Any, Ref, Array, Map, Record, Field, Enum, Fixed, Union, Function, loadCatalog
+
+# Avro types are hash-consed: each distinct type (compared as JSON, ignoring the order of keys) gets
+# a number the first time it is seen, and resolve builds each one only once, so types are compared
+# and hashed by number and serialized to JSON once.  They remain ordinary odicts, lists and strings,
+# shared between signatures, and must not be modified.
+
+class TypeInterner(object):
+    def __init__(self):
+        self.numbers = {}     # structural key -> number
+        self.instances = {}   # number -> the shared instance built by resolve
+        self.objects = {}     # id of a container seen -> [the container, its number, its JSON or None]
+
+    def key(self, t):
+        if isinstance(t, (dict, odict)):
+            return ("dict",) + tuple(sorted((k, self.number(v)) for k, v in t.items()))
+        elif isinstance(t, (list, tuple)):
+            return ("list",) + tuple(self.number(x) for x in t)
+        elif isinstance(t, Function):
+            return ("fcn", self.number(t.parameters), self.number(t.ret))
+        elif isinstance(t, (basestring, int, long, float)) or t is None:
+            return t
+        else:
+            raise Exception("%s %s" % (repr(t), repr(type(t))))
+
+    def number(self, t):
+        # containers are remembered (and kept alive, so that their ids are not reused)
+        seen = self.objects.get(id(t))
+        if seen is not None:
+            return seen[1]
+        number = self.numbers.setdefault(self.key(t), len(self.numbers))
+        if isinstance(t, (dict, odict, list, tuple, Function)):
+            self.objects[id(t)] = [t, number, None]
+        return number
+
+    def canonical(self, t):
+        # the shared instance equal to t, which is discarded if one already exists; its
+        # components must already be shared instances
+        number = self.numbers.setdefault(self.key(t), len(self.numbers))
+        out = self.instances.get(number)
+        if out is None:
+            out = self.instances[number] = t
+            self.objects[id(t)] = [t, number, None]
+        return out
+
+    def same(self, one, two):
+        return one is two or self.number(one) == self.number(two)
+
+    def json(self, t):
+        seen = self.objects.get(id(t))
+        if seen is None:
+            return json.dumps(t)
+        if seen[2] is None:
+            seen[2] = json.dumps(t)
+        return seen[2]
+
+internedTypes = TypeInterner()
 
 class Signature(object):
     def __init__(self, sig):
-        self.parameters = [Parameter(x) for x in sig.findall("./par")]
-        self.ret = pattern(sig.find("./ret"))
+        # a copy of a signature of the catalog, since names are assigned to its patterns in place
+        self.parameters = copy.deepcopy(sig.parameters)
+        self.ret = copy.deepcopy(sig.ret)
     def __repr__(self):
         return "Signature([" + ", ".join(repr(x) for x in self.parameters) + "], " + repr(self.ret) + ")"
 
-    def generateNormal(self, considered, fcnName, valueOverrides, nondeterministic):
+    def concreteSignatures(self):
+        # yields (nameLookup, types, output) for each assignment of types to the labels
         labels = odict()
         for x in self.parameters:
             x.getlabels(labels)
         self.ret.getlabels(labels)
 
-        pfas = []
         if len(labels) == 0:
             nameLookup = {}
             types = odict()
             for x in self.parameters:
                 types[x.name] = self.resolve(x.pattern, {}, nameLookup)
             output = self.resolve(self.ret, {}, nameLookup)
-
-            signature = tuple([(k, self.makeHashable(v)) for k, v in types.items()] + [(None, self.makeHashable(output))])
-            if signature not in considered:
-                pfas.append(self.renderAsPFA(fcnName, valueOverrides, nameLookup, types, output, nondeterministic))
-                considered.add(signature)
+            yield nameLookup, types, output
 
         else:
             for assignment in self.assignments(labels):
@@ -51,16 +109,50 @@ class Signature(object):
                 for x in self.parameters:
                     types[x.name] = self.resolve(x.pattern, assignment, nameLookup)
                 output = self.resolve(self.ret, assignment, nameLookup)
+                yield nameLookup, types, output
 
-                signature = tuple([(k, self.makeHashable(v)) for k, v in types.items()] + [(None, self.makeHashable(output))])
-                if signature not in considered:
-                    pfas.append(self.renderAsPFA(fcnName, valueOverrides, nameLookup, types, output, nondeterministic))
-                    considered.add(signature)
-
+    def generateNormal(self, considered, fcnName, valueOverrides, nondeterministic):
+        pfas = []
+        for nameLookup, types, output in self.concreteSignatures():
+            signature = self.signatureKey(types, output)
+            if signature not in considered:
+                pfas.append(self.renderAsPFA(fcnName, valueOverrides, nameLookup, types, output, nondeterministic))
+                considered.add(signature)
         return pfas
 
+    # Value domains are memoized by type (with the records its names refer to) and the function's
+    # valueOverrides, since the same types recur in many signatures and functions; the lists of
+    # values are shared tuples, and the values in them must not be modified.
+    valueDomains = {}
+    valueDomainCounts = [0, 0]   # [built, reused]
+
+    @staticmethod
+    def valueDomainKey(kind, t, fcnName, valueOverrides, nameLookup):
+        names = tuple(sorted((k, internedTypes.number(v)) for k, v in nameLookup.items())) if len(nameLookup) > 0 else ()
+        return (kind, internedTypes.number(t), names, id(valueOverrides.get(fcnName)))
+
     @staticmethod
     def generateSafeValue(t, fcnName, valueOverrides, nameLookup):
+        key = Signature.valueDomainKey("safe", t, fcnName, valueOverrides, nameLookup)
+        if key in Signature.valueDomains:
+            Signature.valueDomainCounts[1] += 1
+            return Signature.valueDomains[key]
+        Signature.valueDomainCounts[0] += 1
+        out = Signature.valueDomains[key] = Signature.computeSafeValue(t, fcnName, valueOverrides, nameLookup)
+        return out
+
+    @staticmethod
+    def generateValue(t, fcnName, valueOverrides, nameLookup):
+        key = Signature.valueDomainKey("values", t, fcnName, valueOverrides, nameLookup)
+        if key in Signature.valueDomains:
+            Signature.valueDomainCounts[1] += 1
+            return Signature.valueDomains[key]
+        Signature.valueDomainCounts[0] += 1
+        out = Signature.valueDomains[key] = tuple(Signature.computeValue(t, fcnName, valueOverrides, nameLookup))
+        return out
+
+    @staticmethod
+    def computeSafeValue(t, fcnName, valueOverrides, nameLookup):
         if isinstance(t, basestring) and t.startswith("Record"):
             t = nameLookup[t]
 
@@ -93,7 +185,7 @@ class Signature(object):
                 done = False
                 if fcnName in valueOverrides and f["name"] in valueOverrides[fcnName]:
                     for vo in valueOverrides[fcnName][f["name"]]:
-                        if vo["type"] is None or vo["type"] == f["type"]:
+                        if vo["type"] is None or internedTypes.same(vo["type"], f["type"]):
                             out[f["name"]] = vo["values"][0]
                             done = True
                 if not done:
@@ -127,7 +219,7 @@ class Signature(object):
             raise Exception
 
     @staticmethod
-    def generateValue(t, fcnName, valueOverrides, nameLookup):
+    def computeValue(t, fcnName, valueOverrides, nameLookup):
         if isinstance(t, basestring) and t.startswith("Record"):
             t = nameLookup[t]
 
@@ -151,9 +243,9 @@ class Signature(object):
         elif isinstance(t, (dict, odict)) and t["type"] == "array":
             sub = Signature.generateValue(t["items"], fcnName, valueOverrides, nameLookup)
             if len(sub) >= 4:
-                return [[], sub[0:1], sub[1:3], [sub[3]] + list(sub[3:]) + [sub[-1]]]
+                return [(), sub[0:1], sub[1:3], (sub[3],) + sub[3:] + (sub[-1],)]
             else:
-                return [[], sub]
+                return [(), sub]
 
         elif isinstance(t, (dict, odict)) and t["type"] == "map":
             sub = Signature.generateValue(t["values"], fcnName, valueOverrides, nameLookup)
@@ -164,7 +256,7 @@ class Signature(object):
 
         elif isinstance(t, (dict, odict)) and t["type"] == "record":
             subtypes = odict((f["name"], f["type"]) for f in t["fields"])
-            return Signature.generateValues(fcnName, valueOverrides, subtypes, nameLookup, None)
+            return list(Signature.generateValues(fcnName, valueOverrides, subtypes, nameLookup, None))
 
         elif isinstance(t, (dict, odict)) and t["type"] == "enum":
             return t["symbols"]
@@ -198,49 +290,160 @@ class Signature(object):
             print t
             raise Exception
 
+    # at most this many samples per signature (more only if needed for every value to appear)
+    maxSamples = 10000
+
     @staticmethod
-    def generateValues(fcnName, valueOverrides, types, nameLookup, errs):
-        if len(types) == 0:
-            return []
+    def selectCombinations(sizes, limit):
+        # yields tuples of indexes into lists of the given sizes, in lexicographic order: the whole
+        # cartesian product if it has no more than limit elements, otherwise a stratified sample of
+        # it, evenly spaced by position, plus its diagonal (index r % size in every list, for each
+        # r) so that every value of every list appears at least once; the combinations that aren't
+        # selected are never generated
+        if len(sizes) == 0 or 0 in sizes:
+            return
+
+        total = 1
+        for size in sizes:
+            total *= size
+
+        if total <= limit:
+            for indexes in itertools.product(*[xrange(size) for size in sizes]):
+                yield indexes
+            return
+
+        def position(indexes):
+            out = 0
+            for index, size in zip(indexes, sizes):
+                out = out * size + index
+            return out
 
-        thispar, thistype = types.items()[0]
+        def combination(position):
+            out = []
+            for size in reversed(sizes):
+                position, index = divmod(position, size)
+                out.append(index)
+            return tuple(reversed(out))
 
-        done = False
-        if fcnName in valueOverrides and thispar in valueOverrides[fcnName]:
-            for vo in valueOverrides[fcnName][thispar]:
-                if vo["type"] is None or vo["type"] == thistype:
-                    these = vo["values"]
-                    done = True
-        if not done:
-            these = Signature.generateValue(thistype, fcnName, valueOverrides, nameLookup)
+        selected = set(position([r % size for size in sizes]) for r in xrange(max(sizes)))
+        spaced = limit - len(selected)
+        for j in xrange(spaced):
+            selected.add(j * total // spaced)
 
-        others = Signature.generateValues(fcnName, valueOverrides, odict(types.items()[1:]), nameLookup, errs)
+        for x in sorted(selected):
+            yield combination(x)
 
-        if len(these) * len(others) > 10000:
-            targetLenHalf = int(math.ceil(10000 / float(len(these) * 2)))
-            others = others[:targetLenHalf] + others[-targetLenHalf:]
+    # with --strength t, samples form a t-wise covering array instead: every combination of values
+    # of any t parameters appears in some sample, though not every combination of all of them
+    strength = None
+    coveringArrays = {}
+    trialCounts = odict()   # function name -> [samples without --strength, samples with it]
 
-        if len(others) == 0:
-            out = []
-            for thischoice in these:
-                item = odict()
-                item[thispar] = thischoice
-                out.append(item)
-            return out
-        else:
-            out = []
-            for thischoice in these:
-                for other in others:
-                    item = odict()
-                    item[thispar] = thischoice
-                    for thatpar, thatchoice in other.items():
-                        item[thatpar] = thatchoice
-                    out.append(item)
-            return out
+    @staticmethod
+    def coveringArray(sizes, strength):
+        # tuples of indexes into lists of the given sizes, by in-parameter-order generation: the
+        # full product of the first t lists, then one list at a time, a value for each sample that
+        # covers the most new t-way combinations and new samples for the combinations left over
+        # (with unconstrained indexes filled in round-robin); deterministic, and cached by sizes
+        key = (tuple(sizes), strength)
+        if key in Signature.coveringArrays:
+            return Signature.coveringArrays[key]
+
+        rows = [list(x) for x in itertools.product(*[xrange(size) for size in sizes[:strength]])]
+        for k in xrange(strength, len(sizes)):
+            others = list(itertools.combinations(xrange(k), strength - 1))
+            uncovered = set()
+            for columns in others:
+                for values in itertools.product(*[xrange(sizes[c]) for c in columns + (k,)]):
+                    uncovered.add((columns, values))
+
+            for row in rows:
+                best = None
+                for value in xrange(sizes[k]):
+                    count = 0
+                    for columns in others:
+                        values = tuple(row[c] for c in columns) + (value,)
+                        if (columns, values) in uncovered:
+                            count += 1
+                    if best is None or count > best[0]:
+                        best = (count, value)
+                row.append(best[1])
+                for columns in others:
+                    uncovered.discard((columns, tuple(row[c] for c in columns) + (best[1],)))
+
+            added = []
+            for columns, values in sorted(uncovered):
+                for row in added:
+                    if row[k] == values[-1] and all(row[c] is None or row[c] == v for c, v in zip(columns, values)):
+                        break
+                else:
+                    row = [None] * k + [values[-1]]
+                    added.append(row)
+                    rows.append(row)
+                for c, v in zip(columns, values):
+                    row[c] = v
+
+        for i, row in enumerate(rows):
+            for c in xrange(len(row)):
+                if row[c] is None:
+                    row[c] = i % sizes[c]
+
+        out = sorted(set(tuple(row) for row in rows))
+        Signature.coveringArrays[key] = out
+        return out
+
+    @staticmethod
+    def generateValues(fcnName, valueOverrides, types, nameLookup, errs, counts=None, select=None):
+        # yields the samples (odicts of parameter name to value) lazily, first parameter varying
+        # slowest; parameters after one with no values are left out of them.  With --strength, the
+        # numbers of samples without and with it are added to counts, if given.  select, if given,
+        # filters the samples by their indexes into the lists of values, before any is built
+        names = []
+        lists = []
+        for thispar, thistype in types.items():
+            done = False
+            if fcnName in valueOverrides and thispar in valueOverrides[fcnName]:
+                for vo in valueOverrides[fcnName][thispar]:
+                    if vo["type"] is None or internedTypes.same(vo["type"], thistype):
+                        these = vo["values"]
+                        done = True
+            if not done:
+                these = Signature.generateValue(thistype, fcnName, valueOverrides, nameLookup)
+            if len(these) == 0:
+                break
+            names.append(thispar)
+            lists.append(these)
+
+        sizes = [len(x) for x in lists]
+        combinations = Signature.selectCombinations(sizes, Signature.maxSamples)
+        if Signature.strength is not None:
+            full = sum(1 for x in Signature.selectCombinations(sizes, Signature.maxSamples))
+            # a covering array has at least as many samples as the product of the t largest lists
+            bound = 1
+            for size in sorted(sizes)[-Signature.strength:]:
+                bound *= size
+            generated = full
+            if len(sizes) > Signature.strength and bound < full:
+                covering = Signature.coveringArray(sizes, Signature.strength)
+                if len(covering) < full:
+                    combinations = covering
+                    generated = len(covering)
+            if counts is not None:
+                counts[0] += full
+                counts[1] += generated
+
+        if select is not None:
+            combinations = select(lists, combinations)
+
+        for indexes in combinations:
+            item = odict()
+            for name, values, index in zip(names, lists, indexes):
+                item[name] = values[index]
+            yield item
 
     unknownCounter = 0
     @staticmethod
-    def generateTrials(fcnName, valueOverrides, types, nameLookup, nondeterministic, errs=None, hint=None):
+    def generateTrials(fcnName, valueOverrides, types, nameLookup, nondeterministic, errs=None, hint=None, output=None):
         out = []
 
         # generate samples that are specifically crafted to produce error conditions
@@ -250,36 +453,34 @@ class Signature(object):
                 done = False
                 if fcnName in valueOverrides and n in valueOverrides[fcnName]:
                     for vo in valueOverrides[fcnName][n]:
-                        if vo["type"] is None or vo["type"] == t:
+                        if vo["type"] is None or internedTypes.same(vo["type"], t):
                             base[n] = vo["values"][0]
                             done = True
                 if not done:
                     base[n] = Signature.generateSafeValue(t, fcnName, valueOverrides, nameLookup)
 
-            signature = json.loads(json.dumps(types))  # to drop odicts and break any references
-            signature[None] = json.loads(json.dumps(output))
+            signature = set((k, internedTypes.number(v)) for k, v in types.items())
+            signature.add((None, internedTypes.number(output)))
 
             for code, conditions in errs.items():
                 for condition in conditions:
-                    if odict((k, v) for k, v in condition["type"].items() if not (isinstance(v, (dict, odict)) and "params" in v)) == signature:
+                    if set((k, internedTypes.number(v)) for k, v in condition["type"].items() if not (isinstance(v, (dict, odict)) and "params" in v)) == signature:
                         sample = odict(base, **condition["value"])
                         # we already know what the result of this sample should be: an error
                         out.append("          " + json.dumps(odict([("sample", sample), ("error", code)])))
 
         # generate samples whose result is not known yet
-        samples = Signature.generateValues(fcnName, valueOverrides, types, nameLookup, errs)
-        if "zipmap" in fcnName and len(samples) > 50:
-            resamples = []
-            for sample in samples:
-                if len(set(map(len, sample.values()))) == 1:
-                    resamples.append(sample)
-            samples = resamples
+        select = None
+        if "zipmap" in fcnName:
+            def select(lists, combinations):
+                # if there are many, only the samples whose arrays (or maps) all have the same length
+                combinations = list(combinations)
+                if len(combinations) > 50:
+                    combinations = [indexes for indexes in combinations if len(set(len(values[index]) for values, index in zip(lists, indexes))) == 1]
+                return combinations
+        samples = Signature.generateValues(fcnName, valueOverrides, types, nameLookup, errs, Signature.trialCounts.setdefault(fcnName, [0, 0]) if Signature.strength is not None else None, select)
         if fcnName == "a.combinations" or fcnName == "a.permutations":
-            resamples = []
-            for sample in samples:
-                if len(sample["a"]) <= 3:
-                    resamples.append(sample)
-            samples = resamples
+            samples = (sample for sample in samples if len(sample["a"]) <= 3)
 
         for sample in samples:
             if nondeterministic is not None:
@@ -316,8 +517,8 @@ class Signature(object):
                {"%s": [
 %s
                ]}
-          }''' % (",\n".join('''                    {"name": "%s", "type": %s}''' % (n, json.dumps(t)) for n, t in types.items() if not isinstance(t, Function)),
-                  json.dumps(output),
+          }''' % (",\n".join('''                    {"name": "%s", "type": %s}''' % (n, internedTypes.json(t)) for n, t in types.items() if not isinstance(t, Function)),
+                  internedTypes.json(output),
                   fcnName,
                   ",\n".join("                   " + x for x in arguments))
 
@@ -349,7 +550,7 @@ class Signature(object):
                                           odict([(k, v) for k, v in types.items() if not isinstance(v, Function)]),
                                           nameLookup,
                                           nondeterministic,
-                                          errs, hint=hint)
+                                          errs, hint=hint, output=output)
 
         return Signature.formatPFA(types, output, fcnName, arguments, trials)
     
@@ -372,17 +573,8 @@ class Signature(object):
                 Signature.findNames(t, nameLookup)
 
     @staticmethod
-    def makeHashable(x):
-        if isinstance(x, (dict, odict)):
-            return tuple([(k, Signature.makeHashable(x[k])) for k in sorted(x)])
-        elif isinstance(x, (list, tuple)):
-            return tuple(Signature.makeHashable(xi) for xi in x)
-        elif isinstance(x, (basestring, int, long, float)) or x in (None, True, False):
-            return x
-        elif isinstance(x, Function):
-            return ("fcn", Signature.makeHashable(x.parameters), Signature.makeHashable(x.ret))
-        else:
-            raise Exception("%s %s" % (repr(x), repr(type(x))))
+    def signatureKey(types, output):
+        return tuple([(k, internedTypes.number(v)) for k, v in types.items()] + [(None, internedTypes.number(output))])
 
     @staticmethod
     def createNumber(n, t, nameLookup):
@@ -678,16 +870,17 @@ class Signature(object):
                 return Signature.resolve(assignment[pattern.label], assignment, nameLookup)
 
         elif isinstance(pattern, Array):
-            return odict([("type", "array"), ("items", Signature.resolve(pattern.items, assignment, nameLookup))])
+            return internedTypes.canonical(odict([("type", "array"), ("items", Signature.resolve(pattern.items, assignment, nameLookup))]))
 
         elif isinstance(pattern, Map):
-            return odict([("type", "map"), ("values", Signature.resolve(pattern.values, assignment, nameLookup))])
+            return internedTypes.canonical(odict([("type", "map"), ("values", Signature.resolve(pattern.values, assignment, nameLookup))]))
 
         elif isinstance(pattern, Record):
             if pattern.name in nameLookup:
                 return pattern.name
             else:
-                out = odict([("type", "record"), ("name", pattern.name), ("fields", [odict([("name", x.name), ("type", Signature.resolve(x.type, assignment, nameLookup))]) for x in pattern.fields])])
+                fields = internedTypes.canonical([internedTypes.canonical(odict([("name", x.name), ("type", Signature.resolve(x.type, assignment, nameLookup))])) for x in pattern.fields])
+                out = internedTypes.canonical(odict([("type", "record"), ("name", pattern.name), ("fields", fields)]))
                 nameLookup[out["name"]] = out
                 return out
 
@@ -695,11 +888,11 @@ class Signature(object):
             if pattern.name in nameLookup:
                 return pattern.name
             elif pattern.ofRecord is not None:
-                out = odict([("type", "enum"), ("name", pattern.name), ("symbols", [x.name for x in assignment[pattern.ofRecord].fields])])
+                out = internedTypes.canonical(odict([("type", "enum"), ("name", pattern.name), ("symbols", internedTypes.canonical([x.name for x in assignment[pattern.ofRecord].fields]))]))
                 nameLookup[out["name"]] = out
                 return out
             else:
-                out = odict([("type", "enum"), ("name", pattern.name), ("symbols", pattern.symbols)])
+                out = internedTypes.canonical(odict([("type", "enum"), ("name", pattern.name), ("symbols", internedTypes.canonical(list(pattern.symbols)))]))
                 nameLookup[out["name"]] = out
                 return out
 
@@ -707,7 +900,7 @@ class Signature(object):
             if pattern.name in nameLookup:
                 return pattern.name
             else:
-                out = odict([("type", "fixed"), ("name", pattern.name), ("size", pattern.size)])
+                out = internedTypes.canonical(odict([("type", "fixed"), ("name", pattern.name), ("size", pattern.size)]))
                 nameLookup[out["name"]] = out
                 return out
 
@@ -722,12 +915,12 @@ class Signature(object):
                 else:
                     if x not in out:
                         out.append(x)
-            return out
+            return internedTypes.canonical(out)
 
         elif isinstance(pattern, Function):
-            parameters = [Signature.resolve(x, assignment, nameLookup) for x in pattern.parameters]
+            parameters = internedTypes.canonical([Signature.resolve(x, assignment, nameLookup) for x in pattern.parameters])
             ret = Signature.resolve(pattern.ret, assignment, nameLookup)
-            return Function(parameters, ret)
+            return internedTypes.canonical(Function(parameters, ret))
 
         else:
             raise Exception
@@ -784,203 +977,6 @@ class Signature(object):
                         out.append(item)
                 return out
 
-class Parameter(object):
-    def __init__(self, par):
-        self.name = par.attrib["name"]
-        self.pattern = pattern(par)
-    def __repr__(self):
-        return "Parameter(" + repr(self.name) + ", " + repr(self.pattern) + ")"
-    def getlabels(self, labels):
-        self.pattern.getlabels(labels)
-
-class Pattern(object):
-    def getlabels(self, labels):
-        pass
-    def assignNames(self, nameCounters):
-        pass
-
-class Primitive(Pattern):
-    def __init__(self, name):
-        self.name = name
-    def __repr__(self):
-        return "Primitive(" + repr(self.name) + ")"
-
-class Any(Pattern):
-    def __init__(self, label, of):
-        self.label = label
-        if of is None:
-            self.of = []
-        else:
-            self.of = [Primitive(x) for x in of.split(", ")]
-    def __repr__(self):
-        return "Label(" + repr(self.label) + ", [" + ", ".join(repr(x) for x in self.of) + "])"
-    def getlabels(self, labels):
-        if self.label in labels:
-            raise Exception
-        else:
-            labels[self.label] = self.of
-
-class Ref(Pattern):
-    def __init__(self, label):
-        self.label = label
-    def __repr__(self):
-        return "Ref(" + repr(self.label) + ")"
-    def getlabels(self, labels):
-        if self.label not in labels:
-            raise Exception
-
-class Array(Pattern):
-    def __init__(self, items):
-        self.items = items
-    def __repr__(self):
-        return "Array(" + repr(self.items) + ")"
-    def getlabels(self, labels):
-        self.items.getlabels(labels)
-    def assignNames(self, nameCounters):
-        self.items.assignNames(nameCounters)
-
-class Map(Pattern):
-    def __init__(self, values):
-        self.values = values
-    def __repr__(self):
-        return "Map(" + repr(self.values) + ")"
-    def getlabels(self, labels):
-        self.values.getlabels(labels)
-    def assignNames(self, nameCounters):
-        self.values.assignNames(nameCounters)
-
-class Record(Pattern):
-    def __init__(self, label, fields, name=None):
-        self.label = label
-        self.fields = fields
-        self.name = name
-    def __repr__(self):
-        return "Record(" + repr(self.label) + ", [" + ", ".join(repr(x) for x in self.fields) + "])"
-    def getlabels(self, labels):
-        if self.label in labels:
-            raise Exception
-        else:
-            labels[self.label] = ["record", self.fields]
-            for x in self.fields:
-                x.getlabels(labels)
-    def assignNames(self, nameCounters):
-        if self.label is None:
-            self.name = "Record" + str(nameCounters["record"])
-            nameCounters["record"] += 1
-        for x in self.fields:
-            x.type.assignNames(nameCounters)
-
-class Field(Pattern):
-    def __init__(self, name, type):
-        self.name = name
-        self.type = type
-    def __repr__(self):
-        return "Field(" + repr(self.name) + ", " + repr(self.type) + ")"
-    def getlabels(self, labels):
-        self.type.getlabels(labels)
-
-class Enum(Pattern):
-    def __init__(self, label, ofRecord, name=None, symbols=None):
-        self.label = label
-        self.ofRecord = ofRecord
-        self.name = name
-        self.symbols = symbols
-    def __repr__(self):
-        return "Enum(" + repr(self.label) + ", " + repr(self.ofRecord) + ")"
-    def getlabels(self, labels):
-        if self.label in labels:
-            raise Exception
-        else:
-            if self.ofRecord is None:
-                labels[self.label] = ["enum"]
-            else:
-                labels[self.label] = ["enum", self.ofRecord]
-    def assignNames(self, nameCounters):
-        if self.label is None:
-            self.name = "Enum" + str(nameCounters["enum"])
-            nameCounters["enum"] += 1
-
-class Fixed(Pattern):
-    def __init__(self, label, name=None, size=None):
-        self.label = label
-        self.name = name
-        self.size = size
-    def __repr__(self):
-        return "Fixed(" + repr(self.label) + ")"
-    def getlabels(self, labels):
-        if self.label in labels:
-            raise Exception
-        else:
-            labels[self.label] = ["fixed"]
-    def assignNames(self, nameCounters):
-        if self.label is None:
-            self.name = "Fixed" + str(nameCounters["fixed"])
-            nameCounters["fixed"] += 1
-
-class Union(Pattern):
-    def __init__(self, types):
-        self.types = types
-    def __repr__(self):
-        return "Union([" + ", ".join(repr(x) for x in self.types) + "])"
-    def getlabels(self, labels):
-        for x in self.types:
-            x.getlabels(labels)
-    def assignNames(self, nameCounters):
-        for x in self.types:
-            x.assignNames(nameCounters)
-
-class Function(Pattern):
-    def __init__(self, parameters, ret):
-        self.parameters = parameters
-        self.ret = ret
-    def __repr__(self):
-        return "Function([" + ", ".join(repr(x) for x in self.parameters) + "], " + repr(self.ret) + ")"
-    def getlabels(self, labels):
-        for x in self.parameters:
-            x.getlabels(labels)
-        self.ret.getlabels(labels)
-    def assignNames(self, nameCounters):
-        for x in self.parameters:
-            x.assignNames(nameCounters)
-        self.ret.assignNames(nameCounters)
-
-def pattern(par):
-    children = par.getchildren()
-
-    if len(children) == 0:
-        return Primitive(par.text)
-
-    elif len(children) == 1 and children[0].tag == "any":
-        return Any(children[0].attrib["label"], children[0].attrib.get("of", None))
-
-    elif len(children) == 1 and children[0].tag == "ref":
-        return Ref(children[0].attrib["label"])
-
-    elif len(children) == 1 and children[0].tag == "array":
-        return Array(pattern(children[0]))
-
-    elif len(children) == 1 and children[0].tag == "map":
-        return Map(pattern(children[0]))
-
-    elif len(children) == 1 and children[0].tag == "record":
-        return Record(children[0].attrib["label"],
-                      [Field(x.attrib["name"], pattern(x)) for x in children[0].findall("./field")])
-
-    elif len(children) == 1 and children[0].tag == "enum":
-        return Enum(children[0].attrib["label"], children[0].attrib.get("ofRecord", None))
-
-    elif len(children) == 1 and children[0].tag == "fixed":
-        return Fixed(children[0].attrib["label"])
-
-    elif all(x.tag == "union" for x in children):
-        return Union([pattern(x) for x in children])
-
-    elif len(children) == 1 and children[0].tag == "function":
-        return Function([pattern(x) for x in children[0].findall("./par")], pattern(children[0].find("./ret")))
-
-    else:
-        raise Exception
-
 # def patternToType(x):
 #     if isinstance(x, Primitive):
 #         return x.name
@@ -2071,192 +2067,437 @@ def skipThese(pfa):
     else:
         return False
 
-if __name__ == "__main__":
-    outputFileName, = sys.argv[1:]   # "pfa-tests.json"
+def generateFunction(fcn, versionToTest):
+    # the examples (as text) of one function of the signature catalog, numbering their results
+    # from Signature.unknownCounter
+    def okaySig(sig):
+        return sig.availableIn(versionToTest)
 
-    libfcns = xml.etree.ElementTree.parse(open("../libfcns.xml"))
+    pfas = []
+    fcnName = fcn.name
+    nondeterministic = fcn.nondeterministic
+    considered = set()
+
+    nameOrders = []
+    for sig in fcn.signatures:
+        if okaySig(sig):
+            nameOrders.append([x.name for x in sig.parameters])
+            
+    if any(okaySig(sig) for sig in fcn.signatures):
+        errs = {}
+        for code in fcn.errorCodes:
+            if code in errorConditions:
+                errs[code] = errorConditions[code]
+
+        for errorCode, errorCases in errs.items():
+            for errorCase in errorCases:
+                names = set(errorCase["type"].keys()) - set([None])
+                nameOrder = None
+                for x in nameOrders:
+                    if set(x) == names:
+                        nameOrder = x
+                        break
+
+                if nameOrder is None:
+                    print fcnName
+                    print names
+                    print "\n".join(map(repr, nameOrders))
+                    raise Exception
 
-    versionToTest = map(int, libfcns.find("./version").text.split("."))
-    def okaySig(sig):
-        return map(int, sig.attrib.get("birth", "0.0.0").split(".")) <= versionToTest and map(int, sig.attrib.get("deprecation", "999999.999999.999999").split(".")) > versionToTest
+                types = odict()
+                for n in nameOrder:
+                    t = errorCase["type"][n]
+                    if isinstance(t, (dict, odict)) and "params" in t:
+                        types[n] = Function(t["params"], t["ret"])
+                    else:
+                        types[n] = t
 
-    go = False
+                output = errorCase["type"][None]
 
-    pfas = []
-    for fcn in libfcns.findall("libfcns/fcn"):
-        fcnName = fcn.attrib["name"]
-        nondeterministic = None
-        for x in fcn.findall("./doc/nondeterministic"):
-            nondeterministic = x.attrib["type"]
-        considered = set()
-
-        nameOrders = []
-        for sig in fcn.findall("./sig"):
-            if okaySig(sig):
-                nameOrders.append([x.attrib["name"] for x in sig.findall("./par")])
-                
-        if any(okaySig(sig) for sig in fcn.findall("./sig")):
-            errors = fcn.findall("./doc/error")
-            errs = {}
-            for x in errors:
-                code = int(x.attrib["code"])
-                if code in errorConditions:
-                    errs[code] = errorConditions[code]
-
-            for errorCode, errorCases in errs.items():
-                for errorCase in errorCases:
-                    names = set(errorCase["type"].keys()) - set([None])
-                    nameOrder = None
-                    for x in nameOrders:
-                        if set(x) == names:
-                            nameOrder = x
-                            break
-
-                    if nameOrder is None:
-                        print fcnName
-                        print names
-                        print "\n".join(map(repr, nameOrders))
-                        raise Exception
+                nameLookup = {}
+                for t in types.values(): 
+                    Signature.findNames(t, nameLookup)
 
+                signature = Signature.signatureKey(types, output)
+                if signature not in considered:
+                    pfa = Signature.renderAsPFA(fcnName, valueOverrides, nameLookup, types, output, nondeterministic, errs, hint=errorCode)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+                        considered.add(signature)
+
+    for sig in fcn.signatures:
+        if okaySig(sig):
+            pat = Signature(sig)
+            if fcnName == "model.tree.simpleWalk":
+                for datumType, treeType, scoreType, treeValue, testFunction in generateSimpleWalk():
                     types = odict()
-                    for n in nameOrder:
-                        t = errorCase["type"][n]
-                        if isinstance(t, (dict, odict)) and "params" in t:
-                            types[n] = Function(t["params"], t["ret"])
-                        else:
-                            types[n] = t
-
-                    output = errorCase["type"][None]
-
-                    nameLookup = {}
-                    for t in types.values(): 
-                        Signature.findNames(t, nameLookup)
-
-                    signature = tuple([(k, Signature.makeHashable(v)) for k, v in types.items()] + [(None, Signature.makeHashable(output))])
-                    if signature not in considered:
-                        pfa = Signature.renderAsPFA(fcnName, valueOverrides, nameLookup, types, output, nondeterministic, errs, hint=errorCode)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-                            considered.add(signature)
-
-        for sig in fcn.findall("./sig"):
-            if okaySig(sig):
-                pat = Signature(sig)
-                if fcnName == "model.tree.simpleWalk":
-                    for datumType, treeType, scoreType, treeValue, testFunction in generateSimpleWalk():
-                        types = odict()
-                        types["datum"] = datumType
-                        types["treeNode"] = treeType
-                        output = scoreType
-
-                        trials = []
-                        for sample in Signature.generateValues(fcnName, {}, {"datum": datumType}, {}, {}):
-                            trials.append("          " + json.dumps(odict([("sample", odict(sample, treeNode=treeValue)), ("result", "UNKNOWN_%07d" % Signature.unknownCounter)])))
-                            Signature.unknownCounter += 1
+                    types["datum"] = datumType
+                    types["treeNode"] = treeType
+                    output = scoreType
 
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.datum"', '"input.treeNode"', json.dumps(testFunction)], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-
-                elif fcnName == "model.tree.missingWalk":
-                    for datumType, treeType, scoreType, treeValue, testFunction in generateMissingWalk():
-                        types = odict()
-                        types["datum"] = datumType
-                        types["treeNode"] = treeType
-                        output = scoreType
-
-                        trials = []
-                        for sample in Signature.generateValues(fcnName, {}, {"datum": datumType}, {}, {}):
-                            trials.append("          " + json.dumps(odict([("sample", odict(sample, treeNode=treeValue)), ("result", "UNKNOWN_%07d" % Signature.unknownCounter)])))
-                            Signature.unknownCounter += 1
+                    trials = []
+                    for sample in Signature.generateValues(fcnName, {}, {"datum": datumType}, {}, {}):
+                        trials.append("          " + json.dumps(odict([("sample", odict(sample, treeNode=treeValue)), ("result", "UNKNOWN_%07d" % Signature.unknownCounter)])))
+                        Signature.unknownCounter += 1
 
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.datum"', '"input.treeNode"', json.dumps(testFunction)], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-
-                elif fcnName == "model.tree.simpleTree":
-                    for datumType, treeType, scoreType, treeValue in generateSimpleTree():
-                        types = odict()
-                        types["datum"] = datumType
-                        types["treeNode"] = treeType
-                        output = scoreType
-
-                        trials = []
-                        for sample in Signature.generateValues(fcnName, {}, {"datum": datumType}, {}, {}):
-                            trials.append("          " + json.dumps(odict([("sample", odict(sample, treeNode=treeValue)), ("result", "UNKNOWN_%07d" % Signature.unknownCounter)])))
-                            Signature.unknownCounter += 1
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.datum"', '"input.treeNode"', json.dumps(testFunction)], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+            elif fcnName == "model.tree.missingWalk":
+                for datumType, treeType, scoreType, treeValue, testFunction in generateMissingWalk():
+                    types = odict()
+                    types["datum"] = datumType
+                    types["treeNode"] = treeType
+                    output = scoreType
+
+                    trials = []
+                    for sample in Signature.generateValues(fcnName, {}, {"datum": datumType}, {}, {}):
+                        trials.append("          " + json.dumps(odict([("sample", odict(sample, treeNode=treeValue)), ("result", "UNKNOWN_%07d" % Signature.unknownCounter)])))
+                        Signature.unknownCounter += 1
 
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.datum"', '"input.treeNode"'], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-
-                elif fcnName == "model.reg.gaussianProcess":
-                    if isinstance(pat.parameters[0].pattern, Primitive) and pat.parameters[0].pattern.name == "double" and isinstance(pat.ret, Primitive) and pat.ret.name == "double":
-                        types = odict([("x", "double"), ("krigingWeight", ["null", "double"])])
-                        output = "double"
-                        trials = []
-                        for x in [-100, 35, 60, 95, 100]:
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.datum"', '"input.treeNode"', json.dumps(testFunction)], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+            elif fcnName == "model.tree.simpleTree":
+                for datumType, treeType, scoreType, treeValue in generateSimpleTree():
+                    types = odict()
+                    types["datum"] = datumType
+                    types["treeNode"] = treeType
+                    output = scoreType
+
+                    trials = []
+                    for sample in Signature.generateValues(fcnName, {}, {"datum": datumType}, {}, {}):
+                        trials.append("          " + json.dumps(odict([("sample", odict(sample, treeNode=treeValue)), ("result", "UNKNOWN_%07d" % Signature.unknownCounter)])))
+                        Signature.unknownCounter += 1
+
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.datum"', '"input.treeNode"'], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+            elif fcnName == "model.reg.gaussianProcess":
+                if isinstance(pat.parameters[0].pattern, Primitive) and pat.parameters[0].pattern.name == "double" and isinstance(pat.ret, Primitive) and pat.ret.name == "double":
+                    types = odict([("x", "double"), ("krigingWeight", ["null", "double"])])
+                    output = "double"
+                    trials = []
+                    for x in [-100, 35, 60, 95, 100]:
+                        for krigingWeight in [None, {"double": 0.5}]:
+                            trials.append("          " + json.dumps(odict([("sample", odict([("x", x), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
+                            Signature.unknownCounter += 1
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": "double"}, {"name": "to", "type": "double"}, {"name": "sigma", "type": "double"}]}}, "value": [{"x":   0, "to": -0.3346332030, "sigma": 0.2}, {"x":  10, "to": -0.0343383864, "sigma": 0.2}, {"x":  20, "to": -0.0276927905, "sigma": 0.2}, {"x":  30, "to": 0.05708694575, "sigma": 0.2}, {"x":  40, "to": 0.66909595875, "sigma": 0.2}, {"x":  50, "to": 0.57458517677, "sigma": 0.2}, {"x":  60, "to": 0.63100196978, "sigma": 0.2}, {"x":  70, "to": 0.91841243688, "sigma": 0.2}, {"x":  80, "to": 0.65081764341, "sigma": 0.2}, {"x":  90, "to": 0.71978591756, "sigma": 0.2}, {"x": 100, "to": 0.93481331323, "sigma": 0.2}, {"x": 110, "to": 0.84831977376, "sigma": 0.2}, {"x": 120, "to": 0.73970609648, "sigma": 0.2}, {"x": 130, "to": 0.78029917594, "sigma": 0.2}, {"x": 140, "to": 0.65909346778, "sigma": 0.2}, {"x": 150, "to": 0.47746829475, "sigma": 0.2}, {"x": 160, "to": 0.15788020690, "sigma": 0.2}, {"x": 170, "to": -0.0417263190, "sigma": 0.2}, {"x": 180, "to": 0.03949032925, "sigma": 0.2}, {"x": 190, "to": -0.3433432642, "sigma": 0.2}, {"x": 200, "to": -0.0254098681, "sigma": 0.2}, {"x": 210, "to": -0.6289059981, "sigma": 0.2}, {"x": 220, "to": -0.7431731071, "sigma": 0.2}, {"x": 230, "to": -0.4354207032, "sigma": 0.2}, {"x": 240, "to": -1.0959618089, "sigma": 0.2}, {"x": 250, "to": -0.6671072982, "sigma": 0.2}, {"x": 260, "to": -0.9050596147, "sigma": 0.2}, {"x": 270, "to": -1.2019606762, "sigma": 0.2}, {"x": 280, "to": -1.1191287449, "sigma": 0.2}, {"x": 290, "to": -1.1299689439, "sigma": 0.2}, {"x": 300, "to": -0.5776687178, "sigma": 0.2}, {"x": 310, "to": -1.0480428012, "sigma": 0.2}, {"x": 320, "to": -0.6461742204, "sigma": 0.2}, {"x": 330, "to": -0.5866474699, "sigma": 0.2}, {"x": 340, "to": -0.3117119198, "sigma": 0.2}, {"x": 350, "to": -0.2478194617, "sigma": 0.2}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+                elif isinstance(pat.parameters[0].pattern, Primitive) and pat.parameters[0].pattern.name == "double" and isinstance(pat.ret, Array):
+                    types = odict([("x", "double"), ("krigingWeight", ["null", "double"])])
+                    output = odict([("type", "array"), ("items", "double")])
+                    trials = []
+                    for x in [-100, 35, 60, 95, 100]:
+                        for krigingWeight in [None, {"double": 0.5}]:
+                            trials.append("          " + json.dumps(odict([("sample", odict([("x", x), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
+                            Signature.unknownCounter += 1
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": "double"}, {"name": "to", "type": {"type": "array", "items": "double"}}, {"name": "sigma", "type": {"type": "array", "items": "double"}}]}}, "value": [{"x":   0, "to": [-0.0275638306327, 1.6436104074682], "sigma": [0.2, 0.2]}, {"x":  10, "to": [-0.0550590156488, 1.1279026778761], "sigma": [0.2, 0.2]}, {"x":  20, "to": [0.27665811014276, 1.2884952019673], "sigma": [0.2, 0.2]}, {"x":  30, "to": [0.32564933012538, 0.6975167314472], "sigma": [0.2, 0.2]}, {"x":  40, "to": [0.50951585410170, 0.5366404828626], "sigma": [0.2, 0.2]}, {"x":  50, "to": [0.78970794409845, 0.5753573687864], "sigma": [0.2, 0.2]}, {"x":  60, "to": [0.79560759832648, 0.8669490726924], "sigma": [0.2, 0.2]}, {"x":  70, "to": [1.11012632091040, 0.2893283390564], "sigma": [0.2, 0.2]}, {"x":  80, "to": [1.01101991793607, 0.1168159075340], "sigma": [0.2, 0.2]}, {"x":  90, "to": [0.89167196367050, 0.2336483742367], "sigma": [0.2, 0.2]}, {"x": 100, "to": [0.79669701754334, -0.262415331320], "sigma": [0.2, 0.2]}, {"x": 110, "to": [0.73478042254427, -0.269257044570], "sigma": [0.2, 0.2]}, {"x": 120, "to": [0.54225961573755, -0.528524392539], "sigma": [0.2, 0.2]}, {"x": 130, "to": [0.63387009124588, -0.550031870271], "sigma": [0.2, 0.2]}, {"x": 140, "to": [0.53868855884699, -0.756608403729], "sigma": [0.2, 0.2]}, {"x": 150, "to": [0.52440311808591, -0.764908616789], "sigma": [0.2, 0.2]}, {"x": 160, "to": [0.38234791058889, -0.755332319548], "sigma": [0.2, 0.2]}, {"x": 170, "to": [0.06408032993876, -1.208343893027], "sigma": [0.2, 0.2]}, {"x": 180, "to": [-0.1251140497492, -1.008797566375], "sigma": [0.2, 0.2]}, {"x": 190, "to": [-0.6622773320724, -0.735977078508], "sigma": [0.2, 0.2]}, {"x": 200, "to": [-0.5060071246967, -1.131959607514], "sigma": [0.2, 0.2]}, {"x": 210, "to": [-0.7506697169187, -0.933266228609], "sigma": [0.2, 0.2]}, {"x": 220, "to": [-0.6114675918420, -1.115429627986], "sigma": [0.2, 0.2]}, {"x": 230, "to": [-0.7393428452701, -0.644829102596], "sigma": [0.2, 0.2]}, {"x": 240, "to": [-1.1005820484414, -0.602487247649], "sigma": [0.2, 0.2]}, {"x": 250, "to": [-0.9199172336156, -0.445415709796], "sigma": [0.2, 0.2]}, {"x": 260, "to": [-0.5548384390502, -0.130872144887], "sigma": [0.2, 0.2]}, {"x": 270, "to": [-1.1663758959153, 0.0403022656204], "sigma": [0.2, 0.2]}, {"x": 280, "to": [-1.3683792108867, -0.055259795527], "sigma": [0.2, 0.2]}, {"x": 290, "to": [-1.0373014259785, 0.1923335805121], "sigma": [0.2, 0.2]}, {"x": 300, "to": [-0.8539507289822, 0.6473186579626], "sigma": [0.2, 0.2]}, {"x": 310, "to": [-1.1658738130819, 0.7019580213786], "sigma": [0.2, 0.2]}, {"x": 320, "to": [-0.3248586082577, 0.5924413605916], "sigma": [0.2, 0.2]}, {"x": 330, "to": [-0.4246629811006, 0.7436475098601], "sigma": [0.2, 0.2]}, {"x": 340, "to": [-0.2888893157821, 0.9129729112785], "sigma": [0.2, 0.2]}, {"x": 350, "to": [0.16414946814559, 1.1171102512988], "sigma": [0.2, 0.2]}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+                elif isinstance(pat.parameters[0].pattern, Array) and isinstance(pat.ret, Primitive) and pat.ret.name == "double":
+                    types = odict([("x", odict([("type", "array"), ("items", "double")])), ("krigingWeight", ["null", "double"])])
+                    output = "double"
+                    trials = []
+                    for x1 in [-100, 35, 60, 95, 100]:
+                        for x2 in [-100, 35, 60, 95, 100]:
                             for krigingWeight in [None, {"double": 0.5}]:
-                                trials.append("          " + json.dumps(odict([("sample", odict([("x", x), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
+                                trials.append("          " + json.dumps(odict([("sample", odict([("x", [x1, x2]), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
                                 Signature.unknownCounter += 1
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": "double"}, {"name": "to", "type": "double"}, {"name": "sigma", "type": "double"}]}}, "value": [{"x":   0, "to": -0.3346332030, "sigma": 0.2}, {"x":  10, "to": -0.0343383864, "sigma": 0.2}, {"x":  20, "to": -0.0276927905, "sigma": 0.2}, {"x":  30, "to": 0.05708694575, "sigma": 0.2}, {"x":  40, "to": 0.66909595875, "sigma": 0.2}, {"x":  50, "to": 0.57458517677, "sigma": 0.2}, {"x":  60, "to": 0.63100196978, "sigma": 0.2}, {"x":  70, "to": 0.91841243688, "sigma": 0.2}, {"x":  80, "to": 0.65081764341, "sigma": 0.2}, {"x":  90, "to": 0.71978591756, "sigma": 0.2}, {"x": 100, "to": 0.93481331323, "sigma": 0.2}, {"x": 110, "to": 0.84831977376, "sigma": 0.2}, {"x": 120, "to": 0.73970609648, "sigma": 0.2}, {"x": 130, "to": 0.78029917594, "sigma": 0.2}, {"x": 140, "to": 0.65909346778, "sigma": 0.2}, {"x": 150, "to": 0.47746829475, "sigma": 0.2}, {"x": 160, "to": 0.15788020690, "sigma": 0.2}, {"x": 170, "to": -0.0417263190, "sigma": 0.2}, {"x": 180, "to": 0.03949032925, "sigma": 0.2}, {"x": 190, "to": -0.3433432642, "sigma": 0.2}, {"x": 200, "to": -0.0254098681, "sigma": 0.2}, {"x": 210, "to": -0.6289059981, "sigma": 0.2}, {"x": 220, "to": -0.7431731071, "sigma": 0.2}, {"x": 230, "to": -0.4354207032, "sigma": 0.2}, {"x": 240, "to": -1.0959618089, "sigma": 0.2}, {"x": 250, "to": -0.6671072982, "sigma": 0.2}, {"x": 260, "to": -0.9050596147, "sigma": 0.2}, {"x": 270, "to": -1.2019606762, "sigma": 0.2}, {"x": 280, "to": -1.1191287449, "sigma": 0.2}, {"x": 290, "to": -1.1299689439, "sigma": 0.2}, {"x": 300, "to": -0.5776687178, "sigma": 0.2}, {"x": 310, "to": -1.0480428012, "sigma": 0.2}, {"x": 320, "to": -0.6461742204, "sigma": 0.2}, {"x": 330, "to": -0.5866474699, "sigma": 0.2}, {"x": 340, "to": -0.3117119198, "sigma": 0.2}, {"x": 350, "to": -0.2478194617, "sigma": 0.2}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-
-                    elif isinstance(pat.parameters[0].pattern, Primitive) and pat.parameters[0].pattern.name == "double" and isinstance(pat.ret, Array):
-                        types = odict([("x", "double"), ("krigingWeight", ["null", "double"])])
-                        output = odict([("type", "array"), ("items", "double")])
-                        trials = []
-                        for x in [-100, 35, 60, 95, 100]:
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": {"type": "array", "items": "double"}}, {"name": "to", "type": "double"}, {"name": "sigma", "type": "double"}]}}, "value": [{"x": [  0,   0], "to": 0.82118528, "sigma": 0.2}, {"x": [  0,  36], "to": 0.63603407, "sigma": 0.2}, {"x": [  0,  72], "to": 0.43135014, "sigma": 0.2}, {"x": [  0, 108], "to": -0.5271264, "sigma": 0.2}, {"x": [  0, 144], "to": -0.7426378, "sigma": 0.2}, {"x": [  0, 180], "to": -1.1869050, "sigma": 0.2}, {"x": [  0, 216], "to": -0.7996154, "sigma": 0.2}, {"x": [  0, 252], "to": -0.4564504, "sigma": 0.2}, {"x": [  0, 288], "to": 0.08426291, "sigma": 0.2}, {"x": [  0, 324], "to": 0.80768845, "sigma": 0.2}, {"x": [ 36,   0], "to": 1.35803374, "sigma": 0.2}, {"x": [ 36,  36], "to": 1.52769845, "sigma": 0.2}, {"x": [ 36,  72], "to": 1.08079765, "sigma": 0.2}, {"x": [ 36, 108], "to": 0.31241499, "sigma": 0.2}, {"x": [ 36, 144], "to": -0.2676979, "sigma": 0.2}, {"x": [ 36, 180], "to": -0.7164726, "sigma": 0.2}, {"x": [ 36, 216], "to": -0.3338313, "sigma": 0.2}, {"x": [ 36, 252], "to": 0.08139820, "sigma": 0.2}, {"x": [ 36, 288], "to": 0.71689790, "sigma": 0.2}, {"x": [ 36, 324], "to": 1.13835037, "sigma": 0.2}, {"x": [ 72,   0], "to": 1.83512995, "sigma": 0.2}, {"x": [ 72,  36], "to": 1.61494407, "sigma": 0.2}, {"x": [ 72,  72], "to": 1.50290190, "sigma": 0.2}, {"x": [ 72, 108], "to": 0.75406155, "sigma": 0.2}, {"x": [ 72, 144], "to": 0.03405990, "sigma": 0.2}, {"x": [ 72, 180], "to": 0.14337997, "sigma": 0.2}, {"x": [ 72, 216], "to": 0.38604138, "sigma": 0.2}, {"x": [ 72, 252], "to": 0.36514719, "sigma": 0.2}, {"x": [ 72, 288], "to": 1.31043893, "sigma": 0.2}, {"x": [ 72, 324], "to": 1.63925281, "sigma": 0.2}, {"x": [108,   0], "to": 2.18498629, "sigma": 0.2}, {"x": [108,  36], "to": 1.36922627, "sigma": 0.2}, {"x": [108,  72], "to": 1.41108233, "sigma": 0.2}, {"x": [108, 108], "to": 0.80950036, "sigma": 0.2}, {"x": [108, 144], "to": 0.07678710, "sigma": 0.2}, {"x": [108, 180], "to": 0.03666408, "sigma": 0.2}, {"x": [108, 216], "to": -0.2375061, "sigma": 0.2}, {"x": [108, 252], "to": 0.57171030, "sigma": 0.2}, {"x": [108, 288], "to": 1.35875134, "sigma": 0.2}, {"x": [108, 324], "to": 1.64114251, "sigma": 0.2}, {"x": [144,   0], "to": 1.81406684, "sigma": 0.2}, {"x": [144,  36], "to": 1.36598027, "sigma": 0.2}, {"x": [144,  72], "to": 0.87335695, "sigma": 0.2}, {"x": [144, 108], "to": 0.28625228, "sigma": 0.2}, {"x": [144, 144], "to": -0.1884535, "sigma": 0.2}, {"x": [144, 180], "to": -0.7475230, "sigma": 0.2}, {"x": [144, 216], "to": 0.05916590, "sigma": 0.2}, {"x": [144, 252], "to": 0.20589299, "sigma": 0.2}, {"x": [144, 288], "to": 1.49434570, "sigma": 0.2}, {"x": [144, 324], "to": 1.04382638, "sigma": 0.2}, {"x": [180,   0], "to": 0.95695423, "sigma": 0.2}, {"x": [180,  36], "to": 0.99368592, "sigma": 0.2}, {"x": [180,  72], "to": 0.03288738, "sigma": 0.2}, {"x": [180, 108], "to": -0.6079039, "sigma": 0.2}, {"x": [180, 144], "to": -0.3848322, "sigma": 0.2}, {"x": [180, 180], "to": -1.0155591, "sigma": 0.2}, {"x": [180, 216], "to": -0.5555413, "sigma": 0.2}, {"x": [180, 252], "to": -0.0581398, "sigma": 0.2}, {"x": [180, 288], "to": 0.33743708, "sigma": 0.2}, {"x": [180, 324], "to": 0.83556571, "sigma": 0.2}, {"x": [216,   0], "to": 0.20588985, "sigma": 0.2}, {"x": [216,  36], "to": 0.44298549, "sigma": 0.2}, {"x": [216,  72], "to": -0.5446849, "sigma": 0.2}, {"x": [216, 108], "to": -1.0020396, "sigma": 0.2}, {"x": [216, 144], "to": -1.8021995, "sigma": 0.2}, {"x": [216, 180], "to": -1.5844545, "sigma": 0.2}, {"x": [216, 216], "to": -1.7084132, "sigma": 0.2}, {"x": [216, 252], "to": -0.9891052, "sigma": 0.2}, {"x": [216, 288], "to": -0.6297273, "sigma": 0.2}, {"x": [216, 324], "to": 0.26628269, "sigma": 0.2}, {"x": [252,   0], "to": 0.10807076, "sigma": 0.2}, {"x": [252,  36], "to": -0.4890686, "sigma": 0.2}, {"x": [252,  72], "to": -0.5842210, "sigma": 0.2}, {"x": [252, 108], "to": -1.2321703, "sigma": 0.2}, {"x": [252, 144], "to": -1.8977512, "sigma": 0.2}, {"x": [252, 180], "to": -2.1240163, "sigma": 0.2}, {"x": [252, 216], "to": -1.9555430, "sigma": 0.2}, {"x": [252, 252], "to": -1.5510880, "sigma": 0.2}, {"x": [252, 288], "to": -0.6289043, "sigma": 0.2}, {"x": [252, 324], "to": -0.2906448, "sigma": 0.2}, {"x": [288,   0], "to": 0.04032433, "sigma": 0.2}, {"x": [288,  36], "to": -0.0974952, "sigma": 0.2}, {"x": [288,  72], "to": -0.6059362, "sigma": 0.2}, {"x": [288, 108], "to": -1.4171517, "sigma": 0.2}, {"x": [288, 144], "to": -1.7699124, "sigma": 0.2}, {"x": [288, 180], "to": -2.1935099, "sigma": 0.2}, {"x": [288, 216], "to": -1.9860432, "sigma": 0.2}, {"x": [288, 252], "to": -1.1616088, "sigma": 0.2}, {"x": [288, 288], "to": -0.8162288, "sigma": 0.2}, {"x": [288, 324], "to": 0.16975848, "sigma": 0.2}, {"x": [324,   0], "to": 0.34328957, "sigma": 0.2}, {"x": [324,  36], "to": 0.26405396, "sigma": 0.2}, {"x": [324,  72], "to": -0.3641890, "sigma": 0.2}, {"x": [324, 108], "to": -0.9854455, "sigma": 0.2}, {"x": [324, 144], "to": -1.3019051, "sigma": 0.2}, {"x": [324, 180], "to": -1.6919030, "sigma": 0.2}, {"x": [324, 216], "to": -1.1601112, "sigma": 0.2}, {"x": [324, 252], "to": -0.9362727, "sigma": 0.2}, {"x": [324, 288], "to": -0.4371584, "sigma": 0.2}, {"x": [324, 324], "to": 0.17624777, "sigma": 0.2}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+                elif isinstance(pat.parameters[0].pattern, Array) and isinstance(pat.ret, Array):
+                    types = odict([("x", odict([("type", "array"), ("items", "double")])), ("krigingWeight", ["null", "double"])])
+                    output = odict([("type", "array"), ("items", "double")])
+                    trials = []
+                    for x1 in [-100, 35, 60, 95, 100]:
+                        for x2 in [-100, 35, 60, 95, 100]:
                             for krigingWeight in [None, {"double": 0.5}]:
-                                trials.append("          " + json.dumps(odict([("sample", odict([("x", x), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
+                                trials.append("          " + json.dumps(odict([("sample", odict([("x", [x1, x2]), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
                                 Signature.unknownCounter += 1
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": "double"}, {"name": "to", "type": {"type": "array", "items": "double"}}, {"name": "sigma", "type": {"type": "array", "items": "double"}}]}}, "value": [{"x":   0, "to": [-0.0275638306327, 1.6436104074682], "sigma": [0.2, 0.2]}, {"x":  10, "to": [-0.0550590156488, 1.1279026778761], "sigma": [0.2, 0.2]}, {"x":  20, "to": [0.27665811014276, 1.2884952019673], "sigma": [0.2, 0.2]}, {"x":  30, "to": [0.32564933012538, 0.6975167314472], "sigma": [0.2, 0.2]}, {"x":  40, "to": [0.50951585410170, 0.5366404828626], "sigma": [0.2, 0.2]}, {"x":  50, "to": [0.78970794409845, 0.5753573687864], "sigma": [0.2, 0.2]}, {"x":  60, "to": [0.79560759832648, 0.8669490726924], "sigma": [0.2, 0.2]}, {"x":  70, "to": [1.11012632091040, 0.2893283390564], "sigma": [0.2, 0.2]}, {"x":  80, "to": [1.01101991793607, 0.1168159075340], "sigma": [0.2, 0.2]}, {"x":  90, "to": [0.89167196367050, 0.2336483742367], "sigma": [0.2, 0.2]}, {"x": 100, "to": [0.79669701754334, -0.262415331320], "sigma": [0.2, 0.2]}, {"x": 110, "to": [0.73478042254427, -0.269257044570], "sigma": [0.2, 0.2]}, {"x": 120, "to": [0.54225961573755, -0.528524392539], "sigma": [0.2, 0.2]}, {"x": 130, "to": [0.63387009124588, -0.550031870271], "sigma": [0.2, 0.2]}, {"x": 140, "to": [0.53868855884699, -0.756608403729], "sigma": [0.2, 0.2]}, {"x": 150, "to": [0.52440311808591, -0.764908616789], "sigma": [0.2, 0.2]}, {"x": 160, "to": [0.38234791058889, -0.755332319548], "sigma": [0.2, 0.2]}, {"x": 170, "to": [0.06408032993876, -1.208343893027], "sigma": [0.2, 0.2]}, {"x": 180, "to": [-0.1251140497492, -1.008797566375], "sigma": [0.2, 0.2]}, {"x": 190, "to": [-0.6622773320724, -0.735977078508], "sigma": [0.2, 0.2]}, {"x": 200, "to": [-0.5060071246967, -1.131959607514], "sigma": [0.2, 0.2]}, {"x": 210, "to": [-0.7506697169187, -0.933266228609], "sigma": [0.2, 0.2]}, {"x": 220, "to": [-0.6114675918420, -1.115429627986], "sigma": [0.2, 0.2]}, {"x": 230, "to": [-0.7393428452701, -0.644829102596], "sigma": [0.2, 0.2]}, {"x": 240, "to": [-1.1005820484414, -0.602487247649], "sigma": [0.2, 0.2]}, {"x": 250, "to": [-0.9199172336156, -0.445415709796], "sigma": [0.2, 0.2]}, {"x": 260, "to": [-0.5548384390502, -0.130872144887], "sigma": [0.2, 0.2]}, {"x": 270, "to": [-1.1663758959153, 0.0403022656204], "sigma": [0.2, 0.2]}, {"x": 280, "to": [-1.3683792108867, -0.055259795527], "sigma": [0.2, 0.2]}, {"x": 290, "to": [-1.0373014259785, 0.1923335805121], "sigma": [0.2, 0.2]}, {"x": 300, "to": [-0.8539507289822, 0.6473186579626], "sigma": [0.2, 0.2]}, {"x": 310, "to": [-1.1658738130819, 0.7019580213786], "sigma": [0.2, 0.2]}, {"x": 320, "to": [-0.3248586082577, 0.5924413605916], "sigma": [0.2, 0.2]}, {"x": 330, "to": [-0.4246629811006, 0.7436475098601], "sigma": [0.2, 0.2]}, {"x": 340, "to": [-0.2888893157821, 0.9129729112785], "sigma": [0.2, 0.2]}, {"x": 350, "to": [0.16414946814559, 1.1171102512988], "sigma": [0.2, 0.2]}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-
-                    elif isinstance(pat.parameters[0].pattern, Array) and isinstance(pat.ret, Primitive) and pat.ret.name == "double":
-                        types = odict([("x", odict([("type", "array"), ("items", "double")])), ("krigingWeight", ["null", "double"])])
-                        output = "double"
-                        trials = []
-                        for x1 in [-100, 35, 60, 95, 100]:
-                            for x2 in [-100, 35, 60, 95, 100]:
-                                for krigingWeight in [None, {"double": 0.5}]:
-                                    trials.append("          " + json.dumps(odict([("sample", odict([("x", [x1, x2]), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
-                                    Signature.unknownCounter += 1
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": {"type": "array", "items": "double"}}, {"name": "to", "type": "double"}, {"name": "sigma", "type": "double"}]}}, "value": [{"x": [  0,   0], "to": 0.82118528, "sigma": 0.2}, {"x": [  0,  36], "to": 0.63603407, "sigma": 0.2}, {"x": [  0,  72], "to": 0.43135014, "sigma": 0.2}, {"x": [  0, 108], "to": -0.5271264, "sigma": 0.2}, {"x": [  0, 144], "to": -0.7426378, "sigma": 0.2}, {"x": [  0, 180], "to": -1.1869050, "sigma": 0.2}, {"x": [  0, 216], "to": -0.7996154, "sigma": 0.2}, {"x": [  0, 252], "to": -0.4564504, "sigma": 0.2}, {"x": [  0, 288], "to": 0.08426291, "sigma": 0.2}, {"x": [  0, 324], "to": 0.80768845, "sigma": 0.2}, {"x": [ 36,   0], "to": 1.35803374, "sigma": 0.2}, {"x": [ 36,  36], "to": 1.52769845, "sigma": 0.2}, {"x": [ 36,  72], "to": 1.08079765, "sigma": 0.2}, {"x": [ 36, 108], "to": 0.31241499, "sigma": 0.2}, {"x": [ 36, 144], "to": -0.2676979, "sigma": 0.2}, {"x": [ 36, 180], "to": -0.7164726, "sigma": 0.2}, {"x": [ 36, 216], "to": -0.3338313, "sigma": 0.2}, {"x": [ 36, 252], "to": 0.08139820, "sigma": 0.2}, {"x": [ 36, 288], "to": 0.71689790, "sigma": 0.2}, {"x": [ 36, 324], "to": 1.13835037, "sigma": 0.2}, {"x": [ 72,   0], "to": 1.83512995, "sigma": 0.2}, {"x": [ 72,  36], "to": 1.61494407, "sigma": 0.2}, {"x": [ 72,  72], "to": 1.50290190, "sigma": 0.2}, {"x": [ 72, 108], "to": 0.75406155, "sigma": 0.2}, {"x": [ 72, 144], "to": 0.03405990, "sigma": 0.2}, {"x": [ 72, 180], "to": 0.14337997, "sigma": 0.2}, {"x": [ 72, 216], "to": 0.38604138, "sigma": 0.2}, {"x": [ 72, 252], "to": 0.36514719, "sigma": 0.2}, {"x": [ 72, 288], "to": 1.31043893, "sigma": 0.2}, {"x": [ 72, 324], "to": 1.63925281, "sigma": 0.2}, {"x": [108,   0], "to": 2.18498629, "sigma": 0.2}, {"x": [108,  36], "to": 1.36922627, "sigma": 0.2}, {"x": [108,  72], "to": 1.41108233, "sigma": 0.2}, {"x": [108, 108], "to": 0.80950036, "sigma": 0.2}, {"x": [108, 144], "to": 0.07678710, "sigma": 0.2}, {"x": [108, 180], "to": 0.03666408, "sigma": 0.2}, {"x": [108, 216], "to": -0.2375061, "sigma": 0.2}, {"x": [108, 252], "to": 0.57171030, "sigma": 0.2}, {"x": [108, 288], "to": 1.35875134, "sigma": 0.2}, {"x": [108, 324], "to": 1.64114251, "sigma": 0.2}, {"x": [144,   0], "to": 1.81406684, "sigma": 0.2}, {"x": [144,  36], "to": 1.36598027, "sigma": 0.2}, {"x": [144,  72], "to": 0.87335695, "sigma": 0.2}, {"x": [144, 108], "to": 0.28625228, "sigma": 0.2}, {"x": [144, 144], "to": -0.1884535, "sigma": 0.2}, {"x": [144, 180], "to": -0.7475230, "sigma": 0.2}, {"x": [144, 216], "to": 0.05916590, "sigma": 0.2}, {"x": [144, 252], "to": 0.20589299, "sigma": 0.2}, {"x": [144, 288], "to": 1.49434570, "sigma": 0.2}, {"x": [144, 324], "to": 1.04382638, "sigma": 0.2}, {"x": [180,   0], "to": 0.95695423, "sigma": 0.2}, {"x": [180,  36], "to": 0.99368592, "sigma": 0.2}, {"x": [180,  72], "to": 0.03288738, "sigma": 0.2}, {"x": [180, 108], "to": -0.6079039, "sigma": 0.2}, {"x": [180, 144], "to": -0.3848322, "sigma": 0.2}, {"x": [180, 180], "to": -1.0155591, "sigma": 0.2}, {"x": [180, 216], "to": -0.5555413, "sigma": 0.2}, {"x": [180, 252], "to": -0.0581398, "sigma": 0.2}, {"x": [180, 288], "to": 0.33743708, "sigma": 0.2}, {"x": [180, 324], "to": 0.83556571, "sigma": 0.2}, {"x": [216,   0], "to": 0.20588985, "sigma": 0.2}, {"x": [216,  36], "to": 0.44298549, "sigma": 0.2}, {"x": [216,  72], "to": -0.5446849, "sigma": 0.2}, {"x": [216, 108], "to": -1.0020396, "sigma": 0.2}, {"x": [216, 144], "to": -1.8021995, "sigma": 0.2}, {"x": [216, 180], "to": -1.5844545, "sigma": 0.2}, {"x": [216, 216], "to": -1.7084132, "sigma": 0.2}, {"x": [216, 252], "to": -0.9891052, "sigma": 0.2}, {"x": [216, 288], "to": -0.6297273, "sigma": 0.2}, {"x": [216, 324], "to": 0.26628269, "sigma": 0.2}, {"x": [252,   0], "to": 0.10807076, "sigma": 0.2}, {"x": [252,  36], "to": -0.4890686, "sigma": 0.2}, {"x": [252,  72], "to": -0.5842210, "sigma": 0.2}, {"x": [252, 108], "to": -1.2321703, "sigma": 0.2}, {"x": [252, 144], "to": -1.8977512, "sigma": 0.2}, {"x": [252, 180], "to": -2.1240163, "sigma": 0.2}, {"x": [252, 216], "to": -1.9555430, "sigma": 0.2}, {"x": [252, 252], "to": -1.5510880, "sigma": 0.2}, {"x": [252, 288], "to": -0.6289043, "sigma": 0.2}, {"x": [252, 324], "to": -0.2906448, "sigma": 0.2}, {"x": [288,   0], "to": 0.04032433, "sigma": 0.2}, {"x": [288,  36], "to": -0.0974952, "sigma": 0.2}, {"x": [288,  72], "to": -0.6059362, "sigma": 0.2}, {"x": [288, 108], "to": -1.4171517, "sigma": 0.2}, {"x": [288, 144], "to": -1.7699124, "sigma": 0.2}, {"x": [288, 180], "to": -2.1935099, "sigma": 0.2}, {"x": [288, 216], "to": -1.9860432, "sigma": 0.2}, {"x": [288, 252], "to": -1.1616088, "sigma": 0.2}, {"x": [288, 288], "to": -0.8162288, "sigma": 0.2}, {"x": [288, 324], "to": 0.16975848, "sigma": 0.2}, {"x": [324,   0], "to": 0.34328957, "sigma": 0.2}, {"x": [324,  36], "to": 0.26405396, "sigma": 0.2}, {"x": [324,  72], "to": -0.3641890, "sigma": 0.2}, {"x": [324, 108], "to": -0.9854455, "sigma": 0.2}, {"x": [324, 144], "to": -1.3019051, "sigma": 0.2}, {"x": [324, 180], "to": -1.6919030, "sigma": 0.2}, {"x": [324, 216], "to": -1.1601112, "sigma": 0.2}, {"x": [324, 252], "to": -0.9362727, "sigma": 0.2}, {"x": [324, 288], "to": -0.4371584, "sigma": 0.2}, {"x": [324, 324], "to": 0.17624777, "sigma": 0.2}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
-
-                    elif isinstance(pat.parameters[0].pattern, Array) and isinstance(pat.ret, Array):
-                        types = odict([("x", odict([("type", "array"), ("items", "double")])), ("krigingWeight", ["null", "double"])])
-                        output = odict([("type", "array"), ("items", "double")])
-                        trials = []
-                        for x1 in [-100, 35, 60, 95, 100]:
-                            for x2 in [-100, 35, 60, 95, 100]:
-                                for krigingWeight in [None, {"double": 0.5}]:
-                                    trials.append("          " + json.dumps(odict([("sample", odict([("x", [x1, x2]), ("krigingWeight", krigingWeight)])), ("result", "UNKNOWN_%07d" % Signature.unknownCounter), ("nondeterministic", nondeterministic)])))
-                                    Signature.unknownCounter += 1
-                        pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": {"type": "array", "items": "double"}}, {"name": "to", "type": {"type": "array", "items": "double"}}, {"name": "sigma", "type": {"type": "array", "items": "double"}}]}}, "value": [{"x": [  0,   0], "to": [0.01870587, 0.96812508], "sigma": [0.2, 0.2]}, {"x": [  0,  36], "to": [0.00242101, 0.95369720], "sigma": [0.2, 0.2]}, {"x": [  0,  72], "to": [0.13131668, 0.53822666], "sigma": [0.2, 0.2]}, {"x": [  0, 108], "to": [-0.0984303, -0.3743950], "sigma": [0.2, 0.2]}, {"x": [  0, 144], "to": [0.15985766, -0.6027780], "sigma": [0.2, 0.2]}, {"x": [  0, 180], "to": [-0.2417438, -1.0968682], "sigma": [0.2, 0.2]}, {"x": [  0, 216], "to": [0.05190623, -0.9102348], "sigma": [0.2, 0.2]}, {"x": [  0, 252], "to": [0.27249439, -0.4792263], "sigma": [0.2, 0.2]}, {"x": [  0, 288], "to": [0.07282733, 0.48063363], "sigma": [0.2, 0.2]}, {"x": [  0, 324], "to": [-0.0842266, 0.57112860], "sigma": [0.2, 0.2]}, {"x": [ 36,   0], "to": [0.47755174, 1.13094388], "sigma": [0.2, 0.2]}, {"x": [ 36,  36], "to": [0.41956515, 0.90267757], "sigma": [0.2, 0.2]}, {"x": [ 36,  72], "to": [0.59136153, 0.41456807], "sigma": [0.2, 0.2]}, {"x": [ 36, 108], "to": [0.60570628, -0.2181357], "sigma": [0.2, 0.2]}, {"x": [ 36, 144], "to": [0.59105899, -0.5619968], "sigma": [0.2, 0.2]}, {"x": [ 36, 180], "to": [0.57772703, -0.8929270], "sigma": [0.2, 0.2]}, {"x": [ 36, 216], "to": [0.23902551, -0.8220304], "sigma": [0.2, 0.2]}, {"x": [ 36, 252], "to": [0.61153563, -0.0519713], "sigma": [0.2, 0.2]}, {"x": [ 36, 288], "to": [0.64443777, 0.48040414], "sigma": [0.2, 0.2]}, {"x": [ 36, 324], "to": [0.48667517, 0.71326465], "sigma": [0.2, 0.2]}, {"x": [ 72,   0], "to": [1.09232448, 0.93827725], "sigma": [0.2, 0.2]}, {"x": [ 72,  36], "to": [0.81049592, 1.11762190], "sigma": [0.2, 0.2]}, {"x": [ 72,  72], "to": [0.71568727, 0.06369347], "sigma": [0.2, 0.2]}, {"x": [ 72, 108], "to": [0.72942906, -0.5640199], "sigma": [0.2, 0.2]}, {"x": [ 72, 144], "to": [1.06713767, -0.4772772], "sigma": [0.2, 0.2]}, {"x": [ 72, 180], "to": [1.38277511, -0.9363026], "sigma": [0.2, 0.2]}, {"x": [ 72, 216], "to": [0.61698083, -0.8860234], "sigma": [0.2, 0.2]}, {"x": [ 72, 252], "to": [0.82624676, -0.1171322], "sigma": [0.2, 0.2]}, {"x": [ 72, 288], "to": [0.83217277, 0.30132193], "sigma": [0.2, 0.2]}, {"x": [ 72, 324], "to": [0.74893667, 0.80824628], "sigma": [0.2, 0.2]}, {"x": [108,   0], "to": [0.66284547, 0.85288292], "sigma": [0.2, 0.2]}, {"x": [108,  36], "to": [0.59724043, 0.88159718], "sigma": [0.2, 0.2]}, {"x": [108,  72], "to": [0.28727426, 0.20407304], "sigma": [0.2, 0.2]}, {"x": [108, 108], "to": [0.90503697, -0.5979697], "sigma": [0.2, 0.2]}, {"x": [108, 144], "to": [1.05726502, -0.8156704], "sigma": [0.2, 0.2]}, {"x": [108, 180], "to": [0.55263541, -1.1994934], "sigma": [0.2, 0.2]}, {"x": [108, 216], "to": [0.50777742, -0.7713018], "sigma": [0.2, 0.2]}, {"x": [108, 252], "to": [0.60347324, -0.2211189], "sigma": [0.2, 0.2]}, {"x": [108, 288], "to": [1.16101443, -0.1406493], "sigma": [0.2, 0.2]}, {"x": [108, 324], "to": [0.92295182, 0.51506096], "sigma": [0.2, 0.2]}, {"x": [144,   0], "to": [0.80924121, 0.83038461], "sigma": [0.2, 0.2]}, {"x": [144,  36], "to": [0.80043759, 0.57306896], "sigma": [0.2, 0.2]}, {"x": [144,  72], "to": [0.74865899, 0.12507470], "sigma": [0.2, 0.2]}, {"x": [144, 108], "to": [0.54867424, -0.2083665], "sigma": [0.2, 0.2]}, {"x": [144, 144], "to": [0.58431995, -0.7811933], "sigma": [0.2, 0.2]}, {"x": [144, 180], "to": [0.71950969, -0.9713840], "sigma": [0.2, 0.2]}, {"x": [144, 216], "to": [0.52307948, -0.8731280], "sigma": [0.2, 0.2]}, {"x": [144, 252], "to": [0.36976490, -0.3895379], "sigma": [0.2, 0.2]}, {"x": [144, 288], "to": [0.37565453, 0.21778435], "sigma": [0.2, 0.2]}, {"x": [144, 324], "to": [0.45793731, 0.85264234], "sigma": [0.2, 0.2]}, {"x": [180,   0], "to": [-0.0441948, 1.09297816], "sigma": [0.2, 0.2]}, {"x": [180,  36], "to": [-0.2817155, 0.69222421], "sigma": [0.2, 0.2]}, {"x": [180,  72], "to": [0.12103868, 0.25006600], "sigma": [0.2, 0.2]}, {"x": [180, 108], "to": [0.11426250, -0.5415858], "sigma": [0.2, 0.2]}, {"x": [180, 144], "to": [0.10181024, -0.8848316], "sigma": [0.2, 0.2]}, {"x": [180, 180], "to": [-0.1477347, -1.1392833], "sigma": [0.2, 0.2]}, {"x": [180, 216], "to": [0.35044408, -0.9500126], "sigma": [0.2, 0.2]}, {"x": [180, 252], "to": [0.18675249, -0.4131455], "sigma": [0.2, 0.2]}, {"x": [180, 288], "to": [0.24436046, 0.35884024], "sigma": [0.2, 0.2]}, {"x": [180, 324], "to": [0.07432997, 1.02698144], "sigma": [0.2, 0.2]}, {"x": [216,   0], "to": [-0.6591356, 0.94999291], "sigma": [0.2, 0.2]}, {"x": [216,  36], "to": [-0.4494247, 0.69657926], "sigma": [0.2, 0.2]}, {"x": [216,  72], "to": [-0.4270339, 0.15420512], "sigma": [0.2, 0.2]}, {"x": [216, 108], "to": [-0.5964852, -0.4521517], "sigma": [0.2, 0.2]}, {"x": [216, 144], "to": [-0.3799727, -0.9904939], "sigma": [0.2, 0.2]}, {"x": [216, 180], "to": [-0.5694217, -1.0015548], "sigma": [0.2, 0.2]}, {"x": [216, 216], "to": [-0.6918730, -0.5267317], "sigma": [0.2, 0.2]}, {"x": [216, 252], "to": [-0.5838720, -0.4841855], "sigma": [0.2, 0.2]}, {"x": [216, 288], "to": [-0.5693374, -0.0133151], "sigma": [0.2, 0.2]}, {"x": [216, 324], "to": [-0.4903301, 1.03380154], "sigma": [0.2, 0.2]}, {"x": [252,   0], "to": [-1.3293399, 0.71483260], "sigma": [0.2, 0.2]}, {"x": [252,  36], "to": [-1.3110310, 0.72705720], "sigma": [0.2, 0.2]}, {"x": [252,  72], "to": [-1.0671501, 0.24425863], "sigma": [0.2, 0.2]}, {"x": [252, 108], "to": [-0.8844714, -0.2823489], "sigma": [0.2, 0.2]}, {"x": [252, 144], "to": [-0.9533401, -1.1736452], "sigma": [0.2, 0.2]}, {"x": [252, 180], "to": [-0.5345838, -1.2210451], "sigma": [0.2, 0.2]}, {"x": [252, 216], "to": [-1.0862084, -0.7348636], "sigma": [0.2, 0.2]}, {"x": [252, 252], "to": [-0.7549718, -0.1849688], "sigma": [0.2, 0.2]}, {"x": [252, 288], "to": [-1.2390564, 0.54575855], "sigma": [0.2, 0.2]}, {"x": [252, 324], "to": [-1.0288154, 0.84115420], "sigma": [0.2, 0.2]}, {"x": [288,   0], "to": [-0.5410771, 1.10696790], "sigma": [0.2, 0.2]}, {"x": [288,  36], "to": [-0.8322681, 0.44386847], "sigma": [0.2, 0.2]}, {"x": [288,  72], "to": [-0.9040048, 0.00519231], "sigma": [0.2, 0.2]}, {"x": [288, 108], "to": [-0.6676514, -0.4833115], "sigma": [0.2, 0.2]}, {"x": [288, 144], "to": [-1.0580007, -1.2009009], "sigma": [0.2, 0.2]}, {"x": [288, 180], "to": [-0.8102370, -1.2521135], "sigma": [0.2, 0.2]}, {"x": [288, 216], "to": [-1.2759558, -0.7864478], "sigma": [0.2, 0.2]}, {"x": [288, 252], "to": [-0.5628566, 0.13344358], "sigma": [0.2, 0.2]}, {"x": [288, 288], "to": [-0.9149276, 0.22418075], "sigma": [0.2, 0.2]}, {"x": [288, 324], "to": [-0.5648838, 0.75833374], "sigma": [0.2, 0.2]}, {"x": [324,   0], "to": [-0.6311144, 0.83818280], "sigma": [0.2, 0.2]}, {"x": [324,  36], "to": [-0.5527385, 0.84973376], "sigma": [0.2, 0.2]}, {"x": [324,  72], "to": [-0.3039325, -0.2189731], "sigma": [0.2, 0.2]}, {"x": [324, 108], "to": [-0.4498324, 0.07328764], "sigma": [0.2, 0.2]}, {"x": [324, 144], "to": [-0.7415195, -0.6128136], "sigma": [0.2, 0.2]}, {"x": [324, 180], "to": [-0.7918942, -1.2435311], "sigma": [0.2, 0.2]}, {"x": [324, 216], "to": [-0.6853270, -0.5134147], "sigma": [0.2, 0.2]}, {"x": [324, 252], "to": [-0.7581712, -0.7304523], "sigma": [0.2, 0.2]}, {"x": [324, 288], "to": [-0.4803783, 0.12660344], "sigma": [0.2, 0.2]}, {"x": [324, 324], "to": [-0.6815587, 0.82271760], "sigma": [0.2, 0.2]}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
+                    pfa = Signature.formatPFA(types, output, fcnName, ['"input.x"', '{"type": {"type": "array", "items": {"type": "record", "name": "Record1", "fields": [{"name": "x", "type": {"type": "array", "items": "double"}}, {"name": "to", "type": {"type": "array", "items": "double"}}, {"name": "sigma", "type": {"type": "array", "items": "double"}}]}}, "value": [{"x": [  0,   0], "to": [0.01870587, 0.96812508], "sigma": [0.2, 0.2]}, {"x": [  0,  36], "to": [0.00242101, 0.95369720], "sigma": [0.2, 0.2]}, {"x": [  0,  72], "to": [0.13131668, 0.53822666], "sigma": [0.2, 0.2]}, {"x": [  0, 108], "to": [-0.0984303, -0.3743950], "sigma": [0.2, 0.2]}, {"x": [  0, 144], "to": [0.15985766, -0.6027780], "sigma": [0.2, 0.2]}, {"x": [  0, 180], "to": [-0.2417438, -1.0968682], "sigma": [0.2, 0.2]}, {"x": [  0, 216], "to": [0.05190623, -0.9102348], "sigma": [0.2, 0.2]}, {"x": [  0, 252], "to": [0.27249439, -0.4792263], "sigma": [0.2, 0.2]}, {"x": [  0, 288], "to": [0.07282733, 0.48063363], "sigma": [0.2, 0.2]}, {"x": [  0, 324], "to": [-0.0842266, 0.57112860], "sigma": [0.2, 0.2]}, {"x": [ 36,   0], "to": [0.47755174, 1.13094388], "sigma": [0.2, 0.2]}, {"x": [ 36,  36], "to": [0.41956515, 0.90267757], "sigma": [0.2, 0.2]}, {"x": [ 36,  72], "to": [0.59136153, 0.41456807], "sigma": [0.2, 0.2]}, {"x": [ 36, 108], "to": [0.60570628, -0.2181357], "sigma": [0.2, 0.2]}, {"x": [ 36, 144], "to": [0.59105899, -0.5619968], "sigma": [0.2, 0.2]}, {"x": [ 36, 180], "to": [0.57772703, -0.8929270], "sigma": [0.2, 0.2]}, {"x": [ 36, 216], "to": [0.23902551, -0.8220304], "sigma": [0.2, 0.2]}, {"x": [ 36, 252], "to": [0.61153563, -0.0519713], "sigma": [0.2, 0.2]}, {"x": [ 36, 288], "to": [0.64443777, 0.48040414], "sigma": [0.2, 0.2]}, {"x": [ 36, 324], "to": [0.48667517, 0.71326465], "sigma": [0.2, 0.2]}, {"x": [ 72,   0], "to": [1.09232448, 0.93827725], "sigma": [0.2, 0.2]}, {"x": [ 72,  36], "to": [0.81049592, 1.11762190], "sigma": [0.2, 0.2]}, {"x": [ 72,  72], "to": [0.71568727, 0.06369347], "sigma": [0.2, 0.2]}, {"x": [ 72, 108], "to": [0.72942906, -0.5640199], "sigma": [0.2, 0.2]}, {"x": [ 72, 144], "to": [1.06713767, -0.4772772], "sigma": [0.2, 0.2]}, {"x": [ 72, 180], "to": [1.38277511, -0.9363026], "sigma": [0.2, 0.2]}, {"x": [ 72, 216], "to": [0.61698083, -0.8860234], "sigma": [0.2, 0.2]}, {"x": [ 72, 252], "to": [0.82624676, -0.1171322], "sigma": [0.2, 0.2]}, {"x": [ 72, 288], "to": [0.83217277, 0.30132193], "sigma": [0.2, 0.2]}, {"x": [ 72, 324], "to": [0.74893667, 0.80824628], "sigma": [0.2, 0.2]}, {"x": [108,   0], "to": [0.66284547, 0.85288292], "sigma": [0.2, 0.2]}, {"x": [108,  36], "to": [0.59724043, 0.88159718], "sigma": [0.2, 0.2]}, {"x": [108,  72], "to": [0.28727426, 0.20407304], "sigma": [0.2, 0.2]}, {"x": [108, 108], "to": [0.90503697, -0.5979697], "sigma": [0.2, 0.2]}, {"x": [108, 144], "to": [1.05726502, -0.8156704], "sigma": [0.2, 0.2]}, {"x": [108, 180], "to": [0.55263541, -1.1994934], "sigma": [0.2, 0.2]}, {"x": [108, 216], "to": [0.50777742, -0.7713018], "sigma": [0.2, 0.2]}, {"x": [108, 252], "to": [0.60347324, -0.2211189], "sigma": [0.2, 0.2]}, {"x": [108, 288], "to": [1.16101443, -0.1406493], "sigma": [0.2, 0.2]}, {"x": [108, 324], "to": [0.92295182, 0.51506096], "sigma": [0.2, 0.2]}, {"x": [144,   0], "to": [0.80924121, 0.83038461], "sigma": [0.2, 0.2]}, {"x": [144,  36], "to": [0.80043759, 0.57306896], "sigma": [0.2, 0.2]}, {"x": [144,  72], "to": [0.74865899, 0.12507470], "sigma": [0.2, 0.2]}, {"x": [144, 108], "to": [0.54867424, -0.2083665], "sigma": [0.2, 0.2]}, {"x": [144, 144], "to": [0.58431995, -0.7811933], "sigma": [0.2, 0.2]}, {"x": [144, 180], "to": [0.71950969, -0.9713840], "sigma": [0.2, 0.2]}, {"x": [144, 216], "to": [0.52307948, -0.8731280], "sigma": [0.2, 0.2]}, {"x": [144, 252], "to": [0.36976490, -0.3895379], "sigma": [0.2, 0.2]}, {"x": [144, 288], "to": [0.37565453, 0.21778435], "sigma": [0.2, 0.2]}, {"x": [144, 324], "to": [0.45793731, 0.85264234], "sigma": [0.2, 0.2]}, {"x": [180,   0], "to": [-0.0441948, 1.09297816], "sigma": [0.2, 0.2]}, {"x": [180,  36], "to": [-0.2817155, 0.69222421], "sigma": [0.2, 0.2]}, {"x": [180,  72], "to": [0.12103868, 0.25006600], "sigma": [0.2, 0.2]}, {"x": [180, 108], "to": [0.11426250, -0.5415858], "sigma": [0.2, 0.2]}, {"x": [180, 144], "to": [0.10181024, -0.8848316], "sigma": [0.2, 0.2]}, {"x": [180, 180], "to": [-0.1477347, -1.1392833], "sigma": [0.2, 0.2]}, {"x": [180, 216], "to": [0.35044408, -0.9500126], "sigma": [0.2, 0.2]}, {"x": [180, 252], "to": [0.18675249, -0.4131455], "sigma": [0.2, 0.2]}, {"x": [180, 288], "to": [0.24436046, 0.35884024], "sigma": [0.2, 0.2]}, {"x": [180, 324], "to": [0.07432997, 1.02698144], "sigma": [0.2, 0.2]}, {"x": [216,   0], "to": [-0.6591356, 0.94999291], "sigma": [0.2, 0.2]}, {"x": [216,  36], "to": [-0.4494247, 0.69657926], "sigma": [0.2, 0.2]}, {"x": [216,  72], "to": [-0.4270339, 0.15420512], "sigma": [0.2, 0.2]}, {"x": [216, 108], "to": [-0.5964852, -0.4521517], "sigma": [0.2, 0.2]}, {"x": [216, 144], "to": [-0.3799727, -0.9904939], "sigma": [0.2, 0.2]}, {"x": [216, 180], "to": [-0.5694217, -1.0015548], "sigma": [0.2, 0.2]}, {"x": [216, 216], "to": [-0.6918730, -0.5267317], "sigma": [0.2, 0.2]}, {"x": [216, 252], "to": [-0.5838720, -0.4841855], "sigma": [0.2, 0.2]}, {"x": [216, 288], "to": [-0.5693374, -0.0133151], "sigma": [0.2, 0.2]}, {"x": [216, 324], "to": [-0.4903301, 1.03380154], "sigma": [0.2, 0.2]}, {"x": [252,   0], "to": [-1.3293399, 0.71483260], "sigma": [0.2, 0.2]}, {"x": [252,  36], "to": [-1.3110310, 0.72705720], "sigma": [0.2, 0.2]}, {"x": [252,  72], "to": [-1.0671501, 0.24425863], "sigma": [0.2, 0.2]}, {"x": [252, 108], "to": [-0.8844714, -0.2823489], "sigma": [0.2, 0.2]}, {"x": [252, 144], "to": [-0.9533401, -1.1736452], "sigma": [0.2, 0.2]}, {"x": [252, 180], "to": [-0.5345838, -1.2210451], "sigma": [0.2, 0.2]}, {"x": [252, 216], "to": [-1.0862084, -0.7348636], "sigma": [0.2, 0.2]}, {"x": [252, 252], "to": [-0.7549718, -0.1849688], "sigma": [0.2, 0.2]}, {"x": [252, 288], "to": [-1.2390564, 0.54575855], "sigma": [0.2, 0.2]}, {"x": [252, 324], "to": [-1.0288154, 0.84115420], "sigma": [0.2, 0.2]}, {"x": [288,   0], "to": [-0.5410771, 1.10696790], "sigma": [0.2, 0.2]}, {"x": [288,  36], "to": [-0.8322681, 0.44386847], "sigma": [0.2, 0.2]}, {"x": [288,  72], "to": [-0.9040048, 0.00519231], "sigma": [0.2, 0.2]}, {"x": [288, 108], "to": [-0.6676514, -0.4833115], "sigma": [0.2, 0.2]}, {"x": [288, 144], "to": [-1.0580007, -1.2009009], "sigma": [0.2, 0.2]}, {"x": [288, 180], "to": [-0.8102370, -1.2521135], "sigma": [0.2, 0.2]}, {"x": [288, 216], "to": [-1.2759558, -0.7864478], "sigma": [0.2, 0.2]}, {"x": [288, 252], "to": [-0.5628566, 0.13344358], "sigma": [0.2, 0.2]}, {"x": [288, 288], "to": [-0.9149276, 0.22418075], "sigma": [0.2, 0.2]}, {"x": [288, 324], "to": [-0.5648838, 0.75833374], "sigma": [0.2, 0.2]}, {"x": [324,   0], "to": [-0.6311144, 0.83818280], "sigma": [0.2, 0.2]}, {"x": [324,  36], "to": [-0.5527385, 0.84973376], "sigma": [0.2, 0.2]}, {"x": [324,  72], "to": [-0.3039325, -0.2189731], "sigma": [0.2, 0.2]}, {"x": [324, 108], "to": [-0.4498324, 0.07328764], "sigma": [0.2, 0.2]}, {"x": [324, 144], "to": [-0.7415195, -0.6128136], "sigma": [0.2, 0.2]}, {"x": [324, 180], "to": [-0.7918942, -1.2435311], "sigma": [0.2, 0.2]}, {"x": [324, 216], "to": [-0.6853270, -0.5134147], "sigma": [0.2, 0.2]}, {"x": [324, 252], "to": [-0.7581712, -0.7304523], "sigma": [0.2, 0.2]}, {"x": [324, 288], "to": [-0.4803783, 0.12660344], "sigma": [0.2, 0.2]}, {"x": [324, 324], "to": [-0.6815587, 0.82271760], "sigma": [0.2, 0.2]}]}', '"input.krigingWeight"', '{"fcn": "m.kernel.rbf", "fill": {"gamma": 2.0}}'], trials)
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+            else:
+                for pfa in pat.generateNormal(considered, fcnName, valueOverrides, nondeterministic):
+                    if not skipThese(pfa):
+                        pfas.append(pfa)
+
+    return pfas
+
+# With --jobs, functions are generated by worker processes, each numbering the results of a function
+# from zero, and renumbered in order as they are merged, so that the template is the same as that of
+# a serial run.
+
+libfcnsFunctions = []   # the functions of the catalog, set before the workers are forked
+
+unknownPattern = re.compile("UNKNOWN_([0-9]+)")
+
+def generateInWorker(args):
+    index, versionToTest = args
+    Signature.unknownCounter = 0
+    Signature.trialCounts = odict()
+    Signature.valueDomainCounts = [0, 0]
+    pfas = generateFunction(libfcnsFunctions[index], versionToTest)
+    return pfas, Signature.unknownCounter, Signature.trialCounts.items(), Signature.valueDomainCounts
+
+def generateFunctions(indexes, versionToTest, jobs):
+    # yields the examples of each of the functions at these indexes in libfcnsFunctions, in order,
+    # numbered on from Signature.unknownCounter at the time each is taken, as by a serial run
+    if jobs <= 1:
+        for i in indexes:
+            yield generateFunction(libfcnsFunctions[i], versionToTest)
+        return
+
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for pfas, numUnknowns, trialCounts, valueDomainCounts in pool.imap(generateInWorker, [(i, versionToTest) for i in indexes]):
+            pfas = [renumberUnknowns(pfa, Signature.unknownCounter) for pfa in pfas]
+            Signature.unknownCounter += numUnknowns
+            for fcnName, (full, covering) in trialCounts:
+                counts = Signature.trialCounts.setdefault(fcnName, [0, 0])
+                counts[0] += full
+                counts[1] += covering
+            Signature.valueDomainCounts[0] += valueDomainCounts[0]
+            Signature.valueDomainCounts[1] += valueDomainCounts[1]
+            yield pfas
+    finally:
+        pool.terminate()
+        pool.join()
+
+def renumberUnknowns(pfa, offset):
+    if offset == 0:
+        return pfa
+    return unknownPattern.sub(lambda m: "UNKNOWN_%07d" % (offset + int(m.group(1))), pfa)
+
+# Each run also writes a manifest next to the template: a header identifying the options that affect
+# every function, then the name, content hash, number of UNKNOWN_ results and place in the template
+# of each function's examples.  The hash covers the function's <fcn> element and its entries in
+# valueOverrides and errorConditions, so with --incremental, only functions whose hash changed are
+# generated again; the others are copied from the previous template (renumbered), which gives the
+# same template as a full run.  Changes to the generator's code are not detected: run without
+# --incremental after them.
+
+manifestVersion = "pfa-template-manifest 2"
+
+def manifestFileName(fileName):
+    return fileName + ".manifest"
+
+def manifestHeader(versionToTest):
+    return "%s\t%s\t%s\t%d" % (manifestVersion, ".".join(map(str, versionToTest)), Signature.strength, Signature.maxSamples)
+
+def hashableCode(x):
+    # error conditions may hold functions, which are hashed by their code
+    code = getattr(x, "__code__", None)
+    if code is None:
+        raise TypeError(repr(x) + " can't be hashed")
+    return [code.co_code.encode("hex"), code.co_names, [repr(c) for c in code.co_consts if not hasattr(c, "co_code")]]
+
+def functionHash(fcn):
+    fcnName = fcn.name
+    codes = sorted(fcn.errorCodes)
+    digest = hashlib.sha1()
+    digest.update(fcn.digest)
+    digest.update(json.dumps(valueOverrides.get(fcnName), sort_keys=True, default=hashableCode))
+    digest.update(json.dumps([(code, errorConditions.get(code)) for code in codes], sort_keys=True, default=hashableCode))
+    return digest.hexdigest()
+
+def writeManifest(fileName, header, manifest):
+    out = open(fileName, "w")
+    out.write(header + "\n")
+    for fcnName, digest, numUnknowns, position, length in manifest:
+        out.write("%s\t%s\t%d\t%d\t%d\n" % (fcnName, digest, numUnknowns, position, length))
+    out.close()
+
+def readManifest(fileName, header):
+    # returns OrderedDict of function name -> (hash, first UNKNOWN_ number, number of them, byte
+    # position and length of its examples in the template), or None if there is no manifest or it
+    # is for other options
+    try:
+        openFile = open(fileName)
+    except IOError:
+        return None
+    if openFile.readline().rstrip("\n") != header:
+        return None
+    out = odict()
+    offset = 0
+    for line in openFile:
+        fcnName, digest, numUnknowns, position, length = line.rstrip("\n").split("\t")
+        out[fcnName] = (digest, offset, int(numUnknowns), int(position), int(length))
+        offset += int(numUnknowns)
+    return out
+
+# The template is written as it is generated, one function's examples at a time, so that only one
+# function's examples are ever held in memory.  A name ending in ".gz" gives a gzip-compressed
+# template (which the runTest*.py scripts read directly); positions are always counted in the
+# uncompressed text.
 
+def openTemplate(fileName):
+    if fileName.endswith(".gz"):
+        return gzip.open(fileName, "rb")
+    else:
+        return open(fileName, "rb")
+
+class TemplateWriter(object):
+    def __init__(self, fileName, versionToTest):
+        # written aside, because the previous template may still be in use
+        self.fileName = fileName
+        self.rawFile = open(fileName + ".tmp", "wb")
+        if fileName.endswith(".gz"):
+            # no file name or time stamp in the gzip header, so that runs are reproducible
+            self.out = gzip.GzipFile("", "wb", 6, self.rawFile, 0)
+        else:
+            self.out = self.rawFile
+        self.position = 0
+        self.first = True
+        self.write('''{"pfa-version": "%s",\n "pfa-tests": [\n''' % ".".join(map(str, versionToTest)))
+
+    def write(self, text):
+        self.out.write(text)
+        self.position += len(text)
+
+    def writeBlock(self, texts):
+        # returns the position and length of the block, for the manifest
+        if len(texts) > 0 and not self.first:
+            self.write(",\n")
+        position = self.position
+        for i, text in enumerate(texts):
+            if i > 0:
+                self.write(",\n")
+            self.write(text)
+            self.first = False
+        return position, self.position - position
+
+    def close(self):
+        self.write("\n ]}")
+        if self.out is not self.rawFile:
+            self.out.close()
+        self.rawFile.close()
+        os.rename(self.fileName + ".tmp", self.fileName)
+
+def readFunctionTexts(fileName):
+    # function name -> raw texts of its examples in a test file, through its index
+    from runTest import readIndex, buildIndex
+    index = readIndex(fileName)
+    if index is None:
+        index = buildIndex(fileName)
+    openFile = open(fileName, "rb")
+    out = {}
+    for offset, length, function in index:
+        openFile.seek(offset)
+        out.setdefault(function, []).append(openFile.read(length))
+    openFile.close()
+    return out
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a PFA test template (results to be filled in by runTestHadrian.py) from ../libfcns.xml.")
+    parser.add_argument("outputFileName", help="template to write, such as pfa-tests.json (gzip-compressed if the name ends in .gz)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes to generate functions in (default 1: serially); the template is the same either way")
+    parser.add_argument("--incremental", action="store_true", help="only generate the functions that changed (in libfcns.xml, valueOverrides or errorConditions) since the run that wrote the existing output file and its " + manifestFileName("<outputFileName>") + ", copying the rest")
+    parser.add_argument("--filled", metavar="FILE", default=None, help="with --incremental, also replace the examples of the changed functions in FILE, a test suite filled in from the previous template, with their new (unfilled) examples; fill it in again with runTestHadrian.py, whose result store skips the unchanged trials")
+    parser.add_argument("--strength", type=int, default=None, metavar="T", help="instead of the cartesian product of each signature's parameter values, generate a T-wise covering array of them (2 for pairwise), for a smaller suite in which every combination of values of any T parameters still appears; the shrinkage of each function is reported on stderr")
+    parser.add_argument("--verbose", action="store_true", help="also print each example to standard output as it is generated")
+    args = parser.parse_args()
+    outputFileName = args.outputFileName
+    if args.strength is not None and args.strength < 1:
+        parser.error("--strength must be at least 1")
+    if args.filled is not None and not args.incremental:
+        parser.error("--filled requires --incremental")
+    Signature.strength = args.strength
+
+    catalog = loadCatalog("../libfcns.xml")
+
+    versionToTest = catalog.version
+    libfcnsFunctions = list(catalog)
+
+    header = manifestHeader(versionToTest)
+    previous = None
+    if args.incremental:
+        previous = readManifest(manifestFileName(outputFileName), header)
+        if previous is None or not os.path.exists(outputFileName):
+            print >>sys.stderr, "no manifest of a previous run with these options: generating every function"
+            previous = None
+
+    def echo(pfas):
+        if args.verbose:
+            for pfa in pfas:
+                print pfa
+
+    manifest = []   # (function name, hash, number of UNKNOWN_ results, position, length)
+    template = TemplateWriter(outputFileName, versionToTest)
+    if previous is not None:
+        oldTemplate = openTemplate(outputFileName)
+        digests = [functionHash(fcn) for fcn in libfcnsFunctions]
+        fresh = generateFunctions([i for i, fcn in enumerate(libfcnsFunctions) if fcn.name not in previous or previous[fcn.name][0] != digests[i]], versionToTest, args.jobs)
+        changed = {}   # function name -> its new examples
+        for fcn, digest in zip(libfcnsFunctions, digests):
+            fcnName = fcn.name
+            offset = Signature.unknownCounter
+            if fcnName in previous and previous[fcnName][0] == digest:
+                oldDigest, oldOffset, numUnknowns, position, length = previous[fcnName]
+                oldTemplate.seek(position)
+                texts = [renumberUnknowns(oldTemplate.read(length), offset - oldOffset)] if length > 0 else []
+                Signature.unknownCounter += numUnknowns
+            else:
+                texts = changed[fcnName] = next(fresh)
+                echo(texts)
+            manifest.append((fcnName, digest, Signature.unknownCounter - offset) + template.writeBlock(texts))
+        fresh.close()
+        oldTemplate.close()
+        print >>sys.stderr, "generated %d changed functions: %s" % (len(changed), ", ".join(sorted(changed)))
+
+        if args.filled is not None:
+            filledTexts = readFunctionTexts(args.filled)
+            out = open(args.filled + ".tmp", "w")
+            out.write('''{"pfa-version": "%s",\n "pfa-tests": [\n''' % ".".join(map(str, versionToTest)))
+            first = True
+            for fcnName, digest, numUnknowns, position, length in manifest:
+                if fcnName in changed:
+                    texts = changed[fcnName]
                 else:
-                    for pfa in pat.generateNormal(considered, fcnName, valueOverrides, nondeterministic):
-                        if not skipThese(pfa):
-                            print pfa
-                            pfas.append(pfa)
+                    texts = ["     " + text for text in filledTexts.get(fcnName, [])]
+                for text in texts:
+                    if not first:
+                        out.write(",\n")
+                    out.write(text)
+                    first = False
+            out.write("\n ]}")
+            out.close()
+            os.rename(args.filled + ".tmp", args.filled)
 
-    open(outputFileName, "w").write('''{"pfa-version": "%s",
- "pfa-tests": [
-%s
- ]}''' % (".".join(map(str, versionToTest)),
-             ",\n".join(pfas)))
+    else:
+        fresh = generateFunctions(xrange(len(libfcnsFunctions)), versionToTest, args.jobs)
+        for fcn in libfcnsFunctions:
+            offset = Signature.unknownCounter
+            fcnPfas = next(fresh)
+            echo(fcnPfas)
+            manifest.append((fcn.name, functionHash(fcn), Signature.unknownCounter - offset) + template.writeBlock(fcnPfas))
+        fresh.close()
+
+    if Signature.strength is not None:
+        # with --incremental, of the functions generated again only
+        print >>sys.stderr, "%-40s %9s %9s %7s" % ("function", "product", "%d-wise" % Signature.strength, "shrink")
+        for fcnName, (full, covering) in Signature.trialCounts.items():
+            if full > 0:
+                print >>sys.stderr, "%-40s %9d %9d %6.1f%%" % (fcnName, full, covering, 100.0 * (full - covering) / full)
+        full = sum(x[0] for x in Signature.trialCounts.values())
+        covering = sum(x[1] for x in Signature.trialCounts.values())
+        print >>sys.stderr, "%-40s %9d %9d %6.1f%%" % ("total" if previous is None else "total (changed functions)", full, covering, 100.0 * (full - covering) / full if full > 0 else 0.0)
+
+    built, reused = Signature.valueDomainCounts
+    if built + reused > 0:
+        print >>sys.stderr, "value domains: %d built, %d reused (%.1f%% hit rate)" % (built, reused, 100.0 * reused / (built + reused))
+
+    template.close()
+    writeManifest(manifestFileName(outputFileName), header, manifest)
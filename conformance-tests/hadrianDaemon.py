@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import socket
+import sys
+import threading
+import traceback
+
+from runTest import *
+
+import java.lang.Exception
+
+from com.opendatagroup.hadrian.errors import PFARuntimeException
+from com.opendatagroup.antinous.pfainterface import PFAEngineFactory
+
+from runTestHadrian import hadrianImplementation
+
+# A long-lived Hadrian that scores trials for runTestHadrianClient.py, so that the harness runs in
+# CPython and only the engines run in Jython.  Run it with Jython, like runTestHadrian.py.
+#
+# Each connection starts with a frame (see runTest.writeFrame) from the daemon:
+#
+#     {"implementation": identifier for the result store}
+#
+# after which the client sends requests, as many as it likes without waiting for responses,
+#
+#     {"id": n, "function": name, "engine": document, "samples": [samples as in the test file]}
+#
+# and the daemon answers each, in order, with
+#
+#     {"id": n, "outcomes": [{"success": result} or {"fail": error code}, ...]}
+#  or {"id": n, "error": traceback}
+#
+# Connections are served by threads of their own, each with its own PFAEngineFactory and engine
+# cache.  The daemon listens on the loopback interface only; Jython has no Unix-domain sockets.
+
+def score(pef, engines, request):
+    example = convertInput({"function": request["function"], "engine": request["engine"], "trials": [{"sample": x} for x in request["samples"]]})
+    engine = engines.get(example["engine"])
+    convertResult = compileConvertOut(json.loads(engine.outputType().toString()), dobase64=False)
+    outcomes = []
+    for trial in example["trials"]:
+        try:
+            outcomes.append({"success": convertResult(pef.action(engine, trial["sample"]))})
+        except PFARuntimeException as err:
+            outcomes.append({"fail": err.code()})
+    return outcomes
+
+def serve(connection, implementation, engineCacheSize):
+    pef = PFAEngineFactory()
+    pef.setDebug(False)
+    engines = EngineCache(lambda document: pef.engineFromJson(json.dumps(document)), engineCacheSize)
+    inputFile = connection.makefile("rb")
+    outputFile = connection.makefile("wb")
+    try:
+        writeFrame(outputFile, {"implementation": implementation})
+        outputFile.flush()
+        while True:
+            request = readFrame(inputFile)
+            if request is None:
+                break
+            try:
+                response = {"id": request["id"], "outcomes": score(pef, engines, request)}
+            except (Exception, java.lang.Exception):
+                response = {"id": request["id"], "error": traceback.format_exc()}
+            writeFrame(outputFile, response)
+            outputFile.flush()
+    except (IOError, socket.error):
+        pass   # the client went away
+    finally:
+        connection.close()
+        print >>sys.stderr, engines.summary()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Hadrian to runTestHadrianClient.py on a local socket.")
+    parser.add_argument("--port", type=int, default=7438, help="TCP port on the loopback interface (default 7438)")
+    parser.add_argument("--engine-cache", type=int, default=100, help="number of compiled engines to keep for reuse by examples with the same engine document, per connection (default 100; 0 disables)")
+    parser.add_argument("--implementation", default=None, help="identifier of the implementation for clients' result stores (default: derived from the Hadrian and Antinous jars)")
+    args = parser.parse_args()
+
+    if args.implementation is None:
+        args.implementation = hadrianImplementation(PFAEngineFactory())
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", args.port))
+    server.listen(5)
+    print >>sys.stderr, "serving %s on 127.0.0.1:%d" % (args.implementation, args.port)
+
+    while True:
+        connection, address = server.accept()
+        thread = threading.Thread(target=serve, args=(connection, args.implementation, args.engine_cache))
+        thread.daemon = True
+        thread.start()
@@ -2,7 +2,24 @@
 
 import json
 import base64
+import cPickle
+import fnmatch
+import gc
+import hashlib
+import itertools
 import math
+import os
+import re
+import struct
+import threading
+import timeit
+import zlib
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None   # Jython, or not installed: compare uses its pure-Python path
 
 # NOTE: Due to limitations in JSON, the following substitutions must be made.
 #       (JSON can only store finite numbers and legal Unicode strings.)
@@ -15,194 +32,352 @@ import math
 #   When expecting a "bytes" or "fixed":
 #     content must be base64-decoded
 
-def convertIn(x, t):
+# Converters are compiled once per Avro type into a tree of closures that no longer re-examine
+# the type for each value, and are cached by a hash of the canonical form of the type.
+
+def canonicalHash(x):
+    # bytes are hashed by their latin-1 reading, which is lossless
+    return hashlib.sha1(json.dumps(x, sort_keys=True, separators=(",", ":"), encoding="latin-1")).hexdigest()
+
+def identity(x):
+    return x
+
+def unionTag(t):
+    if isinstance(t, dict) and t["type"] in ("record", "enum", "fixed"):
+        return t["name"]
+    elif isinstance(t, dict):
+        return t["type"]
+    elif isinstance(t, basestring):
+        return t
+
+def unionBranches(t, build):
+    # tag -> converter of the first branch with that tag
+    out = {}
+    for ti in t:
+        tag = unionTag(ti)
+        if tag not in out:
+            out[tag] = build(ti)
+    return out
+
+def buildConvertIn(t):
     if t == "float" or t == "double":
-        if x == "inf":
-            return float("inf")
-        elif x == "-inf":
-            return float("-inf")
-        elif x == "nan":
-            return float("nan")
-        else:
-            return x
+        def convert(x):
+            if x == "inf":
+                return float("inf")
+            elif x == "-inf":
+                return float("-inf")
+            elif x == "nan":
+                return float("nan")
+            else:
+                return x
+        return convert
 
     elif t == "bytes" or (isinstance(t, dict) and t["type"] == "fixed"):
-        return base64.b64decode(x)
+        return base64.b64decode
 
     elif isinstance(t, dict) and t["type"] == "array":
-        if not isinstance(x, list): raise Exception
-        return [convertIn(v, t["items"]) for v in x]
+        items = buildConvertIn(t["items"])
+        def convert(x):
+            if not isinstance(x, list): raise Exception
+            if items is identity:
+                return list(x)
+            return [items(v) for v in x]
+        return convert
 
     elif isinstance(t, dict) and t["type"] == "map":
-        if not isinstance(x, dict): raise Exception
-        return dict((k, convertIn(v, t["values"])) for k, v in x.items())
+        values = buildConvertIn(t["values"])
+        def convert(x):
+            if not isinstance(x, dict): raise Exception
+            return dict((k, values(v)) for k, v in x.items())
+        return convert
 
     elif isinstance(t, dict) and t["type"] == "record":
-        if not isinstance(x, dict): raise Exception
-        return dict((f["name"], convertIn(x[f["name"]], f["type"])) for f in t["fields"])
+        fields = [(f["name"], buildConvertIn(f["type"])) for f in t["fields"]]
+        def convert(x):
+            if not isinstance(x, dict): raise Exception
+            return dict((name, field(x[name])) for name, field in fields)
+        return convert
 
     elif isinstance(t, list):
-        if x is None:
-            return x
-        else:
-            tag, value = x.items()[0]
-            for ti in t:
-                if isinstance(ti, dict) and ti["type"] in ("record", "enum", "fixed"):
-                    name = ti["name"]
-                elif isinstance(ti, dict):
-                    name = ti["type"]
-                elif isinstance(ti, basestring):
-                    name = ti
-                if tag == name:
-                    return {tag: convertIn(value, ti)}
+        branches = unionBranches(t, buildConvertIn)
+        def convert(x):
+            if x is None:
+                return x
+            else:
+                tag, value = x.items()[0]
+                branch = branches.get(tag)
+                if branch is not None:
+                    return {tag: branch(value)}
+        return convert
 
     else:
-        return x
+        return identity
 
-def convertOut(x, t, dobase64=True):
-    if x is None and t == "null":
-        return x
+convertInCache = {}
+def compileConvertIn(t):
+    key = canonicalHash(t)
+    if key not in convertInCache:
+        convertInCache[key] = buildConvertIn(t)
+    return convertInCache[key]
 
-    elif x is True or x is False and t == "boolean":
-        return x
+def convertIn(x, t):
+    return compileConvertIn(t)(x)
 
-    elif isinstance(x, (int, long)) and t in ("int", "long"):
-        return x
+def buildConvertOut(t, dobase64):
+    # note that True passes through any type, as it always has
+    if t == "null":
+        def convert(x):
+            if x is None or x is True:
+                return x
+            raise Exception
 
-    elif isinstance(x, (int, long, float)) and t in ("float", "double"):
-        if math.isinf(x):
-            if x > 0.0:
-                return "inf"
-            else:
-                return "-inf"
-        elif math.isnan(x):
-            return "nan"
-        else:
-            return x
+    elif t == "boolean":
+        def convert(x):
+            if x is True or x is False:
+                return x
+            raise Exception
 
-    elif isinstance(x, basestring) and t == "string":
-        return x
+    elif t in ("int", "long"):
+        def convert(x):
+            if x is True or isinstance(x, (int, long)):
+                return x
+            raise Exception
 
-    elif isinstance(x, str) and (t == "bytes" or (isinstance(t, dict) and t["type"] == "fixed")):
-        if dobase64:
-            return base64.b64encode(x)
-        else:
-            return x
+    elif t in ("float", "double"):
+        def convert(x):
+            if x is True:
+                return x
+            elif isinstance(x, (int, long, float)):
+                if math.isinf(x):
+                    if x > 0.0:
+                        return "inf"
+                    else:
+                        return "-inf"
+                elif math.isnan(x):
+                    return "nan"
+                else:
+                    return x
+            raise Exception
 
-    elif isinstance(x, list) and isinstance(t, dict) and t["type"] == "array":
-        return [convertOut(v, t["items"], dobase64) for v in x]
+    elif t == "string":
+        def convert(x):
+            if x is True or isinstance(x, basestring):
+                return x
+            raise Exception
 
-    elif isinstance(x, dict) and isinstance(t, dict) and t["type"] == "map":
-        return dict((k, convertOut(v, t["values"], dobase64)) for k, v in x.items())
+    elif t == "bytes" or (isinstance(t, dict) and t["type"] == "fixed"):
+        def convert(x):
+            if x is True:
+                return x
+            elif isinstance(x, str):
+                if dobase64:
+                    return base64.b64encode(x)
+                else:
+                    return x
+            raise Exception
 
-    elif isinstance(x, dict) and isinstance(t, dict) and t["type"] == "record" and set(x.keys()) == set(f["name"] for f in t["fields"]):
-        return dict((f["name"], convertOut(x[f["name"]], f["type"], dobase64)) for f in t["fields"])
+    elif isinstance(t, dict) and t["type"] == "array":
+        items = buildConvertOut(t["items"], dobase64)
+        def convert(x):
+            if x is True:
+                return x
+            elif isinstance(x, list):
+                return [items(v) for v in x]
+            raise Exception
+
+    elif isinstance(t, dict) and t["type"] == "map":
+        values = buildConvertOut(t["values"], dobase64)
+        def convert(x):
+            if x is True:
+                return x
+            elif isinstance(x, dict):
+                return dict((k, values(v)) for k, v in x.items())
+            raise Exception
+
+    elif isinstance(t, dict) and t["type"] == "record":
+        fields = [(f["name"], buildConvertOut(f["type"], dobase64)) for f in t["fields"]]
+        names = set(name for name, field in fields)
+        def convert(x):
+            if x is True:
+                return x
+            elif isinstance(x, dict) and set(x.keys()) == names:
+                return dict((name, field(x[name])) for name, field in fields)
+            raise Exception
 
     elif isinstance(t, list):
-        if x is None:
-            if "null" in t:
+        nullable = "null" in t
+        branches = unionBranches(t, lambda ti: buildConvertOut(ti, dobase64))
+        # untagged values are tried against each branch in order and tagged with its full name
+        # (null and named references can never succeed here)
+        untagged = []
+        for ti in t:
+            if isinstance(ti, dict) and ti["type"] in ("record", "enum", "fixed"):
+                if "namespace" in ti:
+                    name = ti["namespace"] + "." + ti["name"]
+                else:
+                    name = ti["name"]
+            elif isinstance(ti, dict):
+                name = ti["type"]
+            elif ti in ("boolean", "int", "long", "float", "double", "string", "bytes"):
+                name = ti
+            else:
+                continue
+            untagged.append((name, buildConvertOut(ti, dobase64)))
+
+        def convert(x):
+            if x is True:
                 return x
+            elif x is None:
+                if nullable:
+                    return x
+                else:
+                    raise Exception
+            elif isinstance(x, dict) and len(x) == 1:
+                tag, value = x.items()[0]
+                branch = branches.get(tag)
+                if branch is not None:
+                    return {tag: branch(value)}
             else:
+                for name, branch in untagged:
+                    try:
+                        out = branch(x)
+                    except:
+                        pass
+                    else:
+                        return {name: out}
                 raise Exception
-        elif isinstance(x, dict) and len(x) == 1:
-            tag, value = x.items()[0]
-            for ti in t:
-                if isinstance(ti, dict) and ti["type"] in ("record", "enum", "fixed"):
-                    name = ti["name"]
-                elif isinstance(ti, dict):
-                    name = ti["type"]
-                elif isinstance(ti, basestring):
-                    name = ti
-                if tag == name:
-                    return {tag: convertOut(value, ti, dobase64)}
-        else:
-            for ti in t:
-                try:
-                    out = convertOut(x, ti, dobase64)
-                except:
-                    pass
-                else:
-                    if isinstance(ti, dict) and ti["type"] in ("record", "enum", "fixed"):
-                        if "namespace" in ti:
-                            name = ti["namespace"] + "." + ti["name"]
-                        else:
-                            name = ti["name"]
-                    elif isinstance(ti, dict):
-                        name = ti["type"]
-                    elif ti in ("boolean", "int", "long", "float", "double", "string", "bytes"):
-                        name = ti
-                    return {name: out}
-            raise Exception
 
     else:
-        raise Exception
+        def convert(x):
+            if x is True:
+                return x
+            raise Exception
 
-def checkInputType(x, t, typeNames):
+    return convert
+
+convertOutCache = {}
+def compileConvertOut(t, dobase64=True):
+    key = canonicalHash(t), dobase64
+    if key not in convertOutCache:
+        convertOutCache[key] = buildConvertOut(t, dobase64)
+    return convertOutCache[key]
+
+def convertOut(x, t, dobase64=True):
+    return compileConvertOut(t, dobase64)(x)
+
+def incorrect(x, t):
+    raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+
+def buildCheckInputType(t, typeNames, named):
     if t == "null":
-        if x is not None:
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if x is not None:
+                incorrect(x, t)
+            return x
     elif t == "boolean":
-        if x is not True and x is not False:
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if x is not True and x is not False:
+                incorrect(x, t)
+            return x
     elif t == "int" or t == "long":
-        if not isinstance(x, (int, long)):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if not isinstance(x, (int, long)):
+                incorrect(x, t)
+            return x
     elif t == "float" or t == "double":
-        if not isinstance(x, (int, long, float)):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if not isinstance(x, (int, long, float)):
+                incorrect(x, t)
+            return x
     elif t == "string":
-        if not isinstance(x, unicode):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if not isinstance(x, unicode):
+                incorrect(x, t)
+            return x
     elif t == "bytes":
-        if not isinstance(x, str):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if not isinstance(x, str):
+                incorrect(x, t)
+            return x
+
     elif isinstance(t, basestring):
-        t = typeNames[t]
-    if isinstance(t, dict) and t["type"] == "array":
-        if not isinstance(x, list):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-        for v in x:
-            checkInputType(v, t["items"], typeNames)
+        # named types are resolved on first use, which also takes care of recursive types
+        def check(x):
+            if t not in named:
+                named[t] = buildCheckInputType(typeNames[t], typeNames, named)
+            return named[t](x)
+
+    elif isinstance(t, dict) and t["type"] == "array":
+        items = buildCheckInputType(t["items"], typeNames, named)
+        def check(x):
+            if not isinstance(x, list):
+                incorrect(x, t)
+            for v in x:
+                items(v)
+            return x
     elif isinstance(t, dict) and t["type"] == "map":
-        if not isinstance(x, dict):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-        for k, v in x.items():
-            checkInputType(v, t["values"], typeNames)
+        values = buildCheckInputType(t["values"], typeNames, named)
+        def check(x):
+            if not isinstance(x, dict):
+                incorrect(x, t)
+            for v in x.values():
+                values(v)
+            return x
     elif isinstance(t, dict) and t["type"] == "record":
-        if not isinstance(x, dict) or set(x.keys()) != set(f["name"] for f in t["fields"]):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-        for f in t["fields"]:
-            checkInputType(x[f["name"]], f["type"], typeNames)
+        fields = [(f["name"], buildCheckInputType(f["type"], typeNames, named)) for f in t["fields"]]
+        names = set(name for name, field in fields)
+        def check(x):
+            if not isinstance(x, dict) or set(x.keys()) != names:
+                incorrect(x, t)
+            for name, field in fields:
+                field(x[name])
+            return x
     elif isinstance(t, dict) and t["type"] == "fixed":
-        if not isinstance(x, str):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if not isinstance(x, str):
+                incorrect(x, t)
+            return x
     elif isinstance(t, dict) and t["type"] == "enum":
-        if not isinstance(x, unicode):
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
+        def check(x):
+            if not isinstance(x, unicode):
+                incorrect(x, t)
+            return x
+
     elif isinstance(t, list):
-        if x is None:
-            if "null" not in t:
-                raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-        elif isinstance(x, dict) and len(x) == 1:
-            tag, value = x.items()[0]
-            found = False
-            for ti in t:
-                if isinstance(ti, dict) and ti["type"] in ("record", "enum", "fixed"):
-                    name = ti["name"]
-                elif isinstance(ti, dict):
-                    name = ti["type"]
-                elif isinstance(ti, basestring):
-                    name = ti
-                if tag == name:
-                    found = True
-                    checkInputType(value, ti, typeNames)
-            if not found:
-                raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-        else:
-            raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-    elif not isinstance(t, basestring):
-        raise TypeError("Input incorrectly prepared: " + repr(x) + " " + json.dumps(t))
-    return x
+        nullable = "null" in t
+        # every branch with a matching tag is checked
+        branches = {}
+        for ti in t:
+            branches.setdefault(unionTag(ti), []).append(buildCheckInputType(ti, typeNames, named))
+        def check(x):
+            if x is None:
+                if not nullable:
+                    incorrect(x, t)
+            elif isinstance(x, dict) and len(x) == 1:
+                tag, value = x.items()[0]
+                if tag not in branches:
+                    incorrect(x, t)
+                for branch in branches[tag]:
+                    branch(value)
+            else:
+                incorrect(x, t)
+            return x
+
+    else:
+        def check(x):
+            incorrect(x, t)
+
+    return check
+
+checkInputTypeCache = {}
+def compileCheckInputType(t, typeNames):
+    key = canonicalHash([t, typeNames])
+    if key not in checkInputTypeCache:
+        checkInputTypeCache[key] = buildCheckInputType(t, typeNames, {})
+    return checkInputTypeCache[key]
+
+def checkInputType(x, t, typeNames):
+    return compileCheckInputType(t, typeNames)(x)
 
 def getNamesFromType(t):
     if isinstance(t, dict) and t["type"] == "array":
@@ -234,31 +409,670 @@ def getNamesFromFunctions(fcns):
         out.update(getNamesFromType(fcn["ret"]))
     return out
 
-def convertInput(example):
+def getExampleTypeNames(example):
     inputType = example["engine"]["input"]
     typeNames = getNamesFromFunctions([x for x in example["engine"]["action"][example["function"]] if isinstance(x, dict) and "params" in x])
     typeNames.update(getNamesFromType(inputType))
+    return typeNames
+
+def convertInput(example):
+    inputType = example["engine"]["input"]
+    typeNames = getExampleTypeNames(example)
+    convert = compileConvertIn(inputType)
+    check = compileCheckInputType(inputType, typeNames)
     try:
-        trials = [dict(x, sample=checkInputType(convertIn(x["sample"], inputType), inputType, typeNames)) for x in example["trials"]]
+        trials = [dict(x, sample=check(convert(x["sample"]))) for x in example["trials"]]
     except TypeError:
         print example["function"] + "\t" + json.dumps(example["engine"])
         raise
     return dict(example, trials=trials)
 
+def readChunks(openFile, chunkSize=1048576):
+    # gzip-compressed test files are recognized by their magic number and decompressed on the fly
+    decompressor = None
+    chunk = openFile.read(chunkSize)
+    if chunk.startswith("\x1f\x8b"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while chunk:
+        if decompressor is None:
+            yield chunk
+        else:
+            out = [decompressor.decompress(chunk)]
+            while decompressor.unused_data:
+                # concatenated gzip members
+                rest = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                out.append(decompressor.decompress(rest))
+            yield "".join(out)
+        chunk = openFile.read(chunkSize)
+
+# Incremental reader of the outer structure of a JSON document: brackets, braces, commas and
+# colons are consumed one at a time and each complete value is decoded by the C-accelerated json
+# decoder, so memory is bounded by the largest single value, not the whole document.  Offsets are
+# byte positions in the (decompressed) stream.
+class JsonScanner(object):
+    whitespace = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = ""
+        self.position = 0
+        self.offset = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read(self):
+        if self.position > len(self.buffer) // 2:
+            self.offset += self.position
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        # a failed attempt to decode a value that spans chunks costs about as much as a successful
+        # one, so grow the unread part geometrically to keep the retries a small fraction of the work
+        want = max(3 * (len(self.buffer) - self.position), 1)
+        got = []
+        while want > 0:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                self.eof = True
+                break
+            got.append(chunk)
+            want -= len(chunk)
+        self.buffer += "".join(got)
+
+    def peek(self):
+        while True:
+            self.position = self.whitespace.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            elif self.eof:
+                return ""
+            else:
+                self.read()
+
+    def expect(self, chars):
+        c = self.peek()
+        if c == "" or c not in chars:
+            raise ValueError("expected %s at byte %d, found %s" % (" or ".join(repr(x) for x in chars), self.offset + self.position, repr(c) if c != "" else "end of file"))
+        self.position += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if self.eof:
+                    raise ValueError("malformed JSON value at byte %d" % (self.offset + self.position))
+            else:
+                # a number that ends at the end of the buffer might continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    start = self.position
+                    self.position = end
+                    return self.offset + start, self.buffer[start:end], obj
+            self.read()
+
+    def elements(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+def scanJson(chunks, header=None):
+    # yields (byte offset, raw text, decoded object) for each example in the "pfa-tests" array,
+    # whatever the layout of the file; a bare array of examples is also accepted.  The other
+    # top-level members are appended to header, if given, as (key, value) pairs.
+    scanner = JsonScanner(chunks)
+    if scanner.peek() == "[":
+        for x in scanner.elements():
+            yield x
+        return
+
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        return
+    while True:
+        offset, text, key = scanner.value()
+        scanner.expect(":")
+        if key == "pfa-tests":
+            for x in scanner.elements():
+                yield x
+        else:
+            offset, text, value = scanner.value()
+            if header is not None:
+                header.append((key, value))
+        if scanner.expect(",}") == "}":
+            return
+
+# Test files may also be in the binary format of binaryCorpus.py, recognized by its magic number.
+
+binaryMagic = "PFATESTS"
+
+def sniffChunks(openFile):
+    # returns whether the file is binary and its chunks (including the one that was examined)
+    chunks = readChunks(openFile)
+    first = next(chunks, "")
+    return first.startswith(binaryMagic), itertools.chain([first], chunks)
+
+def scanExamples(openFile):
+    # yields (byte offset, raw text, function name) for each example, where the raw text of a
+    # binary example is its encoded block
+    binary, chunks = sniffChunks(openFile)
+    if binary:
+        from binaryCorpus import scanBinary
+        for x in scanBinary(chunks):
+            yield x
+    else:
+        for offset, text, example in scanJson(chunks):
+            yield offset, text, example["function"]
+
+def parseExample(text):
+    # an example in JSON starts with "{"; a binary block never does (it starts with the
+    # zig-zag encoded, hence even, length of the function name)
+    if text[:1] == "{":
+        return convertInput(json.loads(text))
+    else:
+        from binaryCorpus import decodeExample
+        return decodeExample(text)
+
+def parseExampleJson(text):
+    # an example as written in the test file, without the conversions of convertInput
+    if text[:1] == "{":
+        return json.loads(text)
+    else:
+        from binaryCorpus import decodeExample
+        return decodeExample(text, asJson=True)
+
+def getExampleTexts(openFile):
+    for offset, text, function in scanExamples(openFile):
+        yield text
+
 def getExamples(openFile):
-    # take advantage of the formatting of the file to find breaks between examples
-    inFunction = False
-    collectedString = []
+    binary, chunks = sniffChunks(openFile)
+    if binary:
+        from binaryCorpus import scanBinary, decodeExample
+        for offset, block, function in scanBinary(chunks):
+            yield decodeExample(block)
+    else:
+        for offset, text, example in scanJson(chunks):
+            yield convertInput(example)
+
+# A sidecar index (fileName + ".idx") records the byte offset, length and function name of every
+# example so that a subset of the suite can be read without parsing the rest.  Its first line
+# identifies the version of the test file it was built from.
+
+indexVersion = "pfa-tests-index 1"
+
+def indexFileName(fileName):
+    return fileName + ".idx"
+
+def indexHeader(fileName):
+    stat = os.stat(fileName)
+    return "%s\t%d\t%r" % (indexVersion, stat.st_size, stat.st_mtime)
+
+def buildIndex(fileName):
+    openFile = open(fileName, "rb")
+    if openFile.read(2) == "\x1f\x8b":
+        raise ValueError("cannot index %s: compressed files can't be read at random offsets" % fileName)
+    openFile.seek(0)
+
+    index = [(offset, len(text), function) for offset, text, function in scanExamples(openFile)]
+    openFile.close()
+
+    try:
+        out = open(indexFileName(fileName) + ".tmp", "w")
+        out.write(indexHeader(fileName) + "\n")
+        for offset, length, function in index:
+            out.write("%d\t%d\t%s\n" % (offset, length, function.encode("utf-8")))
+        out.close()
+        os.rename(indexFileName(fileName) + ".tmp", indexFileName(fileName))
+    except (IOError, OSError):
+        pass   # a read-only location: the index is used for this run only
+    return index
+
+def readIndex(fileName):
+    # returns None if there is no index or it is out of date
+    try:
+        openFile = open(indexFileName(fileName))
+    except IOError:
+        return None
+    if openFile.readline().rstrip("\n") != indexHeader(fileName):
+        return None
+    index = []
     for line in openFile:
-        if line.startswith("""     {"function":"""):
-            inFunction = True
-        elif line == """     },\n""" or line == """     }\n""":
-            inFunction = False
-            collectedString.append("}")
-            yield convertInput(json.loads("".join(collectedString)))
-            collectedString = []
-        if inFunction:
-            collectedString.append(line)
+        offset, length, function = line.rstrip("\n").split("\t", 2)
+        index.append((int(offset), int(length), function.decode("utf-8")))
+    return index
+
+def selectExampleTexts(fileName, patterns):
+    # yields (counter, text) for the examples whose function name matches one of the glob
+    # patterns, where counter is the example's position in the whole file
+    index = readIndex(fileName)
+    if index is None:
+        index = buildIndex(fileName)
+
+    openFile = open(fileName, "rb")
+    try:
+        import mmap
+        data = mmap.mmap(openFile.fileno(), 0, access=mmap.ACCESS_READ)
+    except ImportError:
+        data = None   # no mmap (Jython)
+
+    for counter, (offset, length, function) in enumerate(index):
+        if any(fnmatch.fnmatchcase(function, pattern) for pattern in patterns):
+            if data is not None:
+                yield counter, data[offset:offset + length]
+            else:
+                openFile.seek(offset)
+                yield counter, openFile.read(length)
+
+    if data is not None:
+        data.close()
+    openFile.close()
+
+def selectExamples(fileName, patterns):
+    for counter, text in selectExampleTexts(fileName, patterns):
+        yield counter, parseExample(text)
+
+# Many examples share an engine document (for instance, the error-condition variants of a
+# signature), so compiled engines are kept by the canonical hash of the document, evicting the
+# least recently used.
+class EngineCache(object):
+    def __init__(self, build, size=100):
+        self.build = build
+        self.size = size
+        self.engines = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, document):
+        if self.size <= 0:
+            self.misses += 1
+            return self.build(document)
+
+        key = canonicalHash(document)
+        if key in self.engines:
+            self.hits += 1
+            engine = self.engines.pop(key)
+        else:
+            self.misses += 1
+            engine = self.build(document)
+            if len(self.engines) >= self.size:
+                self.engines.popitem(last=False)
+        self.engines[key] = engine
+        return engine
+
+    def summary(self):
+        return "engine cache: %d hits, %d misses" % (self.hits, self.misses)
+
+# The outcomes of trials ({"success": converted result} or {"fail": error code}) are kept in a
+# local store keyed by the engine document, the sample and the implementation, so that a re-run
+# only executes the trials that are new or whose implementation has changed.  The report is the
+# same either way, because a recorded outcome is compared with the expected result as a fresh
+# one would be.  Each line of the file is "implementation<TAB>key<TAB>outcome", where the outcome is
+# pickled (to keep str and unicode apart, as Hadrian's results need) and base64-encoded; records are
+# appended as they are made and later lines take precedence, so an interrupted run keeps what it
+# has done and at worst leaves an incomplete last line, which is ignored.
+
+resultsVersion = "pfa-test-results 1"
+
+def resultsFileName(fileName):
+    return fileName + ".results"
+
+def implementationStamp(name, paths):
+    # identifies an implementation by name and the sizes and modification times of its files
+    # (directories are walked), so that rebuilding or editing it invalidates its results
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            files = []
+            for directory, subdirectories, fileNames in os.walk(path):
+                subdirectories.sort()
+                files.extend(os.path.join(directory, x) for x in sorted(fileNames) if not x.endswith((".pyc", ".pyo", "$py.class")))
+        else:
+            files = [path]
+        for fileName in files:
+            stat = os.stat(fileName)
+            digest.update("%s\t%d\t%r\n" % (fileName, stat.st_size, stat.st_mtime))
+    return "%s-%s" % (name, digest.hexdigest()[:16])
+
+class ResultStore(object):
+    def __init__(self, fileName, implementation, force=False):
+        # fileName None disables the store; force ignores recorded outcomes but records new ones
+        self.fileName = fileName
+        self.implementation = implementation
+        self.force = force
+        self.outcomes = {}
+        self.pending = []
+        self.lock = threading.Lock()   # for runTestTitus.py --timeout --jobs, which shares it between threads
+        self.fresh = True
+        self.reused = 0
+        self.run = 0
+        if fileName is not None:
+            self.load()
+
+    def load(self):
+        try:
+            openFile = open(self.fileName)
+        except IOError:
+            return
+        if openFile.readline().rstrip("\n") != resultsVersion:
+            return   # the file will be replaced
+        self.fresh = False
+        prefix = self.implementation + "\t"
+        for line in openFile:
+            if line.startswith(prefix) and line.endswith("\n"):
+                implementation, key, outcome = line.rstrip("\n").split("\t", 2)
+                self.outcomes[key] = outcome
+        openFile.close()
+
+    def keys(self, example):
+        # one key per trial, or None for each if the store is disabled
+        if self.fileName is None:
+            return [None] * len(example["trials"])
+        engineHash = canonicalHash(example["engine"])
+        return [canonicalHash([engineHash, trial["sample"]]) for trial in example["trials"]]
+
+    def get(self, key):
+        if key is None or self.force or key not in self.outcomes:
+            return None
+        with self.lock:
+            self.reused += 1
+        return cPickle.loads(base64.b64decode(self.outcomes[key]))
+
+    def put(self, key, outcome):
+        text = base64.b64encode(cPickle.dumps(outcome, 2)) if key is not None else None
+        with self.lock:
+            self.run += 1
+            if key is not None:
+                self.outcomes[key] = text
+                self.pending.append((key, text))
+
+    def takePending(self):
+        with self.lock:
+            out = self.pending
+            self.pending = []
+        return out
+
+    def addPending(self, records):
+        # records made by another process (see runTestTitus.py --jobs)
+        with self.lock:
+            for key, text in records:
+                self.outcomes[key] = text
+            self.pending.extend(records)
+
+    def flush(self):
+        pending = self.takePending()
+        if self.fileName is None or len(pending) == 0:
+            return
+        try:
+            if self.fresh:
+                out = open(self.fileName, "w")
+                out.write(resultsVersion + "\n")
+                self.fresh = False
+            else:
+                out = open(self.fileName, "a")
+            out.write("".join("%s\t%s\t%s\n" % (self.implementation, key, text) for key, text in pending))
+            out.close()
+        except (IOError, OSError):
+            self.fileName = None   # a read-only location: the outcomes are used for this run only
+
+    def summary(self):
+        return "result store: %d trials reused, %d run" % (self.reused, self.run)
+
+# In benchmark mode, the runners time the building of each engine and every call of its action
+# instead of checking the results.  The trials of an example are repeated in rounds until at least
+# minRounds rounds and minCalls calls have been made and the median latency of the function has
+# settled (changed by less than tolerance since the previous round), or maxRounds is reached.
+# Functions are grouped by their libfcns.xml prefix ("a.", "prob.dist.", ...; core functions such
+# as "+" have none).
+
+def functionGroup(function):
+    if "." in function:
+        return function[:function.rindex(".") + 1]
+    else:
+        return ""
+
+def percentile(values, fraction):
+    # nearest rank of sorted values
+    return values[min(max(int(math.ceil(fraction * len(values))) - 1, 0), len(values) - 1)]
+
+def latencies(values):
+    values = sorted(values)
+    return OrderedDict([("p50", percentile(values, 0.50)), ("p95", percentile(values, 0.95)), ("p99", percentile(values, 0.99)), ("max", values[-1])])
+
+class Benchmark(object):
+    def __init__(self, minRounds=3, minCalls=100, maxRounds=100, tolerance=0.05, timer=timeit.default_timer):
+        self.minRounds = minRounds
+        self.minCalls = minCalls
+        self.maxRounds = maxRounds
+        self.tolerance = tolerance
+        self.timer = timer
+        self.functions = {}
+
+    def times(self, function):
+        if function not in self.functions:
+            self.functions[function] = {"examples": 0, "build": [], "action": []}
+        return self.functions[function]
+
+    def build(self, function, build, document):
+        times = self.times(function)
+        times["examples"] += 1
+        start = self.timer()
+        engine = build(document)
+        times["build"].append(self.timer() - start)
+        return engine
+
+    def run(self, function, action, samples):
+        # action should catch the errors that the trials expect
+        times = self.times(function)["action"]
+        if len(samples) == 0:
+            return
+        timer = self.timer
+        previous = None
+        for round in xrange(self.maxRounds):
+            for sample in samples:
+                start = timer()
+                action(sample)
+                times.append(timer() - start)
+            median = percentile(sorted(times), 0.50)
+            if round + 1 >= self.minRounds and (round + 1) * len(samples) >= self.minCalls and previous is not None and abs(median - previous) <= self.tolerance * previous:
+                break
+            previous = median
+
+    def summary(self):
+        out = OrderedDict()
+        for function in sorted(self.functions):
+            times = self.functions[function]
+            entry = OrderedDict([("group", functionGroup(function)), ("examples", times["examples"]), ("calls", len(times["action"]))])
+            if len(times["build"]) > 0:
+                entry["build"] = latencies(times["build"])
+            if len(times["action"]) > 0:
+                entry["action"] = latencies(times["action"])
+                total = sum(times["action"])
+                entry["callsPerSecond"] = len(times["action"]) / total if total > 0.0 else None
+            out[function] = entry
+        return out
+
+    def table(self):
+        # by group, and within each group the slowest (by median) first; times in microseconds
+        summary = self.summary()
+        groups = {}
+        for function, entry in summary.items():
+            groups.setdefault(entry["group"], []).append((function, entry))
+        lines = ["%-40s %9s %11s %11s %11s %13s %14s" % ("function", "calls", "p50 (us)", "p95 (us)", "p99 (us)", "calls/sec", "build p50 (ms)")]
+        for group in sorted(groups):
+            lines.append("")
+            lines.append("[%s]" % (group if group != "" else "core"))
+            for function, entry in sorted(groups[group], key=lambda x: -x[1].get("action", {}).get("p50", 0.0)):
+                action = entry.get("action")
+                if action is None:
+                    lines.append("%-40s %9d" % (function, 0))
+                else:
+                    lines.append("%-40s %9d %11.2f %11.2f %11.2f %13.0f %14.2f" % (function, entry["calls"], 1e6 * action["p50"], 1e6 * action["p95"], 1e6 * action["p99"], entry["callsPerSecond"] or 0.0, 1e3 * entry["build"]["p50"] if "build" in entry else 0.0))
+        return "\n".join(lines)
+
+# In profile mode (runTestTitus.py --profile), the time of each stage of the harness and the
+# number of objects it leaves behind are attributed to the function of the example.  The objects
+# are counted as the growth of the cyclic garbage collector's youngest generation: container
+# objects allocated less those freed, which is not the number of allocations (CPython 2 has no
+# allocation tracer) and can be negative.  A collection resets the count, so automatic collection
+# is disabled while profiling and collect() is called between examples instead.  A disabled
+# StageProfiler (enabled=False) costs a function call per hook.
+
+profileStages = ("getExamples", "convertInput", "build", "action", "convertOut", "compare")
+
+class StageProfiler(object):
+    def __init__(self, enabled=True, timer=timeit.default_timer):
+        self.enabled = enabled
+        self.timer = timer
+        self.totals = {}   # (stage, function) -> [calls, seconds, netObjects]
+        self.collections = 0
+        if enabled:
+            gc.disable()
+
+    def begin(self):
+        if not self.enabled:
+            return None
+        return self.timer(), gc.get_count()[0]
+
+    def end(self, began, stage, function):
+        if began is None:
+            return
+        seconds = self.timer() - began[0]
+        netObjects = gc.get_count()[0] - began[1]
+        entry = self.totals.get((stage, function))
+        if entry is None:
+            entry = self.totals[(stage, function)] = [0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += netObjects
+
+    def collect(self):
+        # the youngest generation after each example and all of them every 100, as the collector
+        # itself would
+        if self.enabled:
+            self.collections += 1
+            gc.collect(2 if self.collections % 100 == 0 else 0)
+
+    def stop(self):
+        if self.enabled:
+            gc.enable()
+
+    def byStage(self):
+        out = OrderedDict((stage, [0, 0.0, 0]) for stage in profileStages)
+        for (stage, function), (calls, seconds, netObjects) in self.totals.items():
+            entry = out.setdefault(stage, [0, 0.0, 0])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += netObjects
+        return out
+
+    def byFunction(self):
+        # function -> stage -> [calls, seconds, netObjects]
+        out = {}
+        for (stage, function), entry in self.totals.items():
+            out.setdefault(function, {})[stage] = entry
+        return out
+
+    def table(self, top=20):
+        # the stages, then the functions that took the most time overall; times in milliseconds
+        stages = self.byStage()
+        total = sum(seconds for calls, seconds, netObjects in stages.values())
+        lines = ["%-40s %9s %12s %7s %14s" % ("stage", "calls", "time (ms)", "%", "net gc objects")]
+        for stage, (calls, seconds, netObjects) in stages.items():
+            lines.append("%-40s %9d %12.1f %6.1f%% %14d" % (stage, calls, 1e3 * seconds, 100.0 * seconds / total if total > 0.0 else 0.0, netObjects))
+        lines.append("")
+        lines.append("%-40s %12s %7s %14s  %s" % ("function", "time (ms)", "%", "net gc objects", "slowest stages"))
+        functions = self.byFunction()
+        ranked = sorted(functions.items(), key=lambda x: -sum(entry[1] for entry in x[1].values()))
+        for function, entries in ranked[:top]:
+            seconds = sum(entry[1] for entry in entries.values())
+            netObjects = sum(entry[2] for entry in entries.values())
+            slowest = sorted(entries.items(), key=lambda x: -x[1][1])[:3]
+            lines.append("%-40s %12.1f %6.1f%% %14d  %s" % (function, 1e3 * seconds, 100.0 * seconds / total if total > 0.0 else 0.0, netObjects, ", ".join("%s %.1f" % (stage, 1e3 * entry[1]) for stage, entry in slowest)))
+        return "\n".join(lines)
+
+    def writeCollapsed(self, out, root="pfa-tests"):
+        # one line per stack, "root;group;function;stage microseconds", for flame-graph tools such
+        # as flamegraph.pl or speedscope
+        for (stage, function), (calls, seconds, netObjects) in sorted(self.totals.items(), key=lambda x: (x[0][1], x[0][0])):
+            group = functionGroup(function).rstrip(".") or "core"
+            out.write("%s;%s;%s;%s %d\n" % (root, group, function.replace(";", ":").replace(" ", "_"), stage, int(round(1e6 * seconds))))
+
+# Before recursing into two lists of the same length, compare screens out the pairs of elements that
+# can't produce a message: pairs of numbers under the tolerance rules below, equal strings, and
+# (recursively) lists of these.  Only the remaining indexes are compared in full, so breadcrumbs
+# are built and generators chained only where there may be a difference.  The screen is
+# conservative: an index it keeps may turn out to match, but one it drops never differs.  Long
+# lists that are all floats or all integers are screened with NumPy, if available.
+
+numberTypes = (int, long, float)
+
+def screenWithNumpy(one, two, zeroTolerance, fractionalTolerance):
+    # returns None if the lists are not homogeneous
+    typesOne = set(map(type, one))
+    typesTwo = set(map(type, two))
+    if typesOne == typesTwo == set([float]):
+        a = numpy.array(one, dtype=float)
+        b = numpy.array(two, dtype=float)
+        with numpy.errstate(all="ignore"):
+            absa = numpy.abs(a)
+            zeroa = absa < zeroTolerance
+            zerob = numpy.abs(b) < zeroTolerance
+            # a zero divisor is kept so that the full comparison raises as it would have
+            ok = (zeroa & zerob) | (~zeroa & ~zerob & (absa != 0.0) & ~(numpy.abs(a - b) / absa > fractionalTolerance))
+        return numpy.flatnonzero(~ok).tolist()
+    elif typesOne.issubset((int, long)) and typesTwo.issubset((int, long)):
+        try:
+            a = numpy.array(one, dtype=numpy.int64)
+            b = numpy.array(two, dtype=numpy.int64)
+        except OverflowError:
+            return None
+        return numpy.flatnonzero(a != b).tolist()
+    else:
+        return None
+
+def screen(one, two, zeroTolerance, fractionalTolerance):
+    # indexes of the equal-length lists one and two that need a full comparison
+    if numpy is not None and len(one) >= 32:
+        out = screenWithNumpy(one, two, zeroTolerance, fractionalTolerance)
+        if out is not None:
+            return out
+
+    out = []
+    for i in xrange(len(one)):
+        x = one[i]
+        y = two[i]
+        typex = type(x)
+        typey = type(y)
+        if typex in numberTypes and typey in numberTypes:
+            if typex is not float and typey is not float:
+                if x == y:
+                    continue
+            else:
+                try:
+                    absx = abs(x)
+                    if absx < zeroTolerance:
+                        if abs(y) < zeroTolerance:
+                            continue
+                    elif not abs(y) < zeroTolerance and absx != 0.0 and not abs(x - y)/absx > fractionalTolerance:
+                        continue
+                except (OverflowError, ZeroDivisionError):
+                    pass
+        elif typex is list and typey is list:
+            if len(x) == len(y) and len(screen(x, y, zeroTolerance, fractionalTolerance)) == 0:
+                continue
+        elif isinstance(x, basestring) and isinstance(y, basestring):
+            if x == y:
+                continue
+        out.append(i)
+    return out
 
 def compare(one, two, zeroTolerance, fractionalTolerance, infinityTolerance, breadcrumbs=None):
     if breadcrumbs is None:
@@ -274,7 +1088,7 @@ def compare(one, two, zeroTolerance, fractionalTolerance, infinityTolerance, bre
         if len(one) != len(two):
             yield "different list lengths: %d vs %d at %s" % (len(one), len(two), " -> ".join(breadcrumbs))
         else:
-            for i in xrange(len(one)):
+            for i in screen(one, two, zeroTolerance, fractionalTolerance):
                 for x in compare(one[i], two[i], zeroTolerance, fractionalTolerance, infinityTolerance, breadcrumbs + [str(i)]):
                     yield x
     elif isinstance(one, basestring) and isinstance(two, basestring):
@@ -315,6 +1129,233 @@ def compare(one, two, zeroTolerance, fractionalTolerance, infinityTolerance, bre
     else:
         yield "different types: %s vs %s at %s" % (type(one).__name__, type(two).__name__, " -> ".join(breadcrumbs))
 
+def compareShape(one, two, breadcrumbs=None):
+    # for nondeterministic results, whose values can't be compared: the same dict keys, list
+    # lengths and kinds of values ("inf", "-inf" and "nan" count as numbers)
+    if breadcrumbs is None:
+        breadcrumbs = ["top"]
+    def isNumber(x):
+        return (isinstance(x, (int, long, float)) and not isinstance(x, bool)) or x in ("inf", "-inf", "nan")
+    if isinstance(one, dict) and isinstance(two, dict):
+        if set(one.keys()) != set(two.keys()):
+            yield "different dict keys: {%s} vs {%s} at %s" % (", ".join(sorted(one.keys())), ", ".join(sorted(two.keys())), " -> ".join(breadcrumbs))
+        else:
+            for k in sorted(one.keys()):
+                for x in compareShape(one[k], two[k], breadcrumbs + [k]):
+                    yield x
+    elif isinstance(one, list) and isinstance(two, list):
+        if len(one) != len(two):
+            yield "different list lengths: %d vs %d at %s" % (len(one), len(two), " -> ".join(breadcrumbs))
+        else:
+            for i in xrange(len(one)):
+                for x in compareShape(one[i], two[i], breadcrumbs + [str(i)]):
+                    yield x
+    elif isinstance(one, basestring) and isinstance(two, basestring):
+        pass
+    elif isinstance(one, bool) and isinstance(two, bool):
+        pass
+    elif isNumber(one) and isNumber(two):
+        pass
+    elif one is None and two is None:
+        pass
+    else:
+        yield "different types: %s vs %s at %s" % (type(one).__name__, type(two).__name__, " -> ".join(breadcrumbs))
+
+# The report of runTestHadrian.py (and runTestHadrianClient.py) for one example, given the outcome
+# of each trial ({"success": result converted without base64} or {"fail": error code}), or, if a
+# TemplateJournal is given, the recording of how to fill in its UNKNOWN_ results.
+
+def checkHadrianExample(counter, example, outcomes, out, journal=None):
+    functionWritten = False
+    def maybeWriteFunction(functionWritten):
+        if not functionWritten:
+            print >>out, "%4d    %-20s%s" % (counter + 1, example["function"], json.dumps(example["engine"]))
+        return True
+
+    for trial, result in zip(example["trials"], outcomes):
+        trialWritten = False
+
+        if "success" in result:
+            actual = json.dumps(result["success"])
+        else:
+            actual = "ERROR CODE " + str(result["fail"])
+
+        def maybeWriteTrial(trialWritten):
+            if not trialWritten:
+                print >>out, "                            input:    " + json.dumps(trial["sample"])
+                print >>out, "                            expected: " + json.dumps(trial["result"])
+                print >>out, "                            actual:   " + actual
+            return True
+
+        if "error" in trial:
+            if trial["error"] != result.get("fail", None):
+                functionWritten = maybeWriteFunction(functionWritten)
+                if not trialWritten:
+                    print >>out, "                            input:    " + json.dumps(trial["sample"])
+                    print >>out, "                            expected: ERROR CODE " + str(trial["error"])
+                    print >>out, "                            actual:   " + actual
+                    trialWritten = True
+
+        elif trial.get("nondeterministic", None) is not None:
+            if journal is not None and trial["result"].startswith("UNKNOWN_"):
+                if "success" in result:
+                    if trial["nondeterministic"] == "pseudorandom":
+                        journal.fill(trial["result"], ', "result": "' + trial["result"] + '"', "")
+                    else:
+                        journal.fill(trial["result"], '"result": "' + trial["result"] + '"', '"result": ' + json.dumps(result["success"]))
+                else:
+                    journal.fill(trial["result"], '"result": "' + trial["result"] + '", "nondeterministic": "' + trial["nondeterministic"] + '"', '"error": ' + json.dumps(result["fail"]))
+            else:
+                if trial["nondeterministic"] == "unordered":
+                    if "success" in result:
+                        for errorMessage in compare(sorted(trial["result"]), sorted(result["success"]), 1e-8, 0.01, 1e80):
+                            functionWritten = maybeWriteFunction(functionWritten)
+                            trialWritten = maybeWriteTrial(trialWritten)
+                            print >>out, "                                " + errorMessage
+                    else:
+                        functionWritten = maybeWriteFunction(functionWritten)
+                        trialWritten = maybeWriteTrial(trialWritten)
+
+        else:
+            if journal is not None and trial["result"].startswith("UNKNOWN_"):
+                if "success" in result:
+                    journal.fill(trial["result"], '"result": "' + trial["result"] + '"', '"result": ' + json.dumps(result["success"]))
+                else:
+                    journal.fill(trial["result"], '"result": "' + trial["result"] + '"', '"error": ' + json.dumps(result["fail"]))
+            else:
+                if "success" in result:
+                    for errorMessage in compare(trial["result"], result["success"], 1e-8, 0.01, 1e80):
+                        functionWritten = maybeWriteFunction(functionWritten)
+                        trialWritten = maybeWriteTrial(trialWritten)
+                        print >>out, "                                " + errorMessage
+                else:
+                    functionWritten = maybeWriteFunction(functionWritten)
+                    trialWritten = maybeWriteTrial(trialWritten)
+
+    if journal is None and not functionWritten:
+        print >>out, "%4d    %s" % (counter + 1, example["function"])
+
+def countTemplateExamples(fileName):
+    return sum(1 for line in open(fileName) if line.startswith('     {"function":'))
+
+# Filling in a template is streamed: as each example is scored, the replacements of its UNKNOWN_
+# results are appended to a journal next to the output file, followed by a line marking the
+# example as done.  If the run is interrupted, the next run with the same template resumes after
+# the last example marked done.  At the end, backfillTemplate merges the journal into the template
+# in one pass, line by line.  Examples are scored in file order, so the journal's UNKNOWN_ results
+# come in the order in which they appear in the template and no lookup is needed.
+
+journalVersion = "pfa-template-journal 1"
+
+def journalFileName(fileName):
+    return fileName + ".journal"
+
+class TemplateJournal(object):
+    def __init__(self, templateFileName, fileName):
+        stat = os.stat(templateFileName)
+        self.header = "%s\t%d\t%r" % (journalVersion, stat.st_size, stat.st_mtime)
+        self.fileName = fileName
+        self.lastDone = -1
+        self.out = self.load()
+
+    def load(self):
+        # keeps what precedes the last example marked done, if the journal is of this template
+        try:
+            openFile = open(self.fileName, "r+b")
+        except IOError:
+            openFile = None
+        if openFile is None or openFile.readline().rstrip("\n") != self.header:
+            out = open(self.fileName, "wb")
+            out.write(self.header + "\n")
+            out.flush()
+            return out
+        end = openFile.tell()
+        while True:
+            line = openFile.readline()
+            if not line.endswith("\n"):
+                break
+            if line.startswith("done\t"):
+                self.lastDone = int(line[5:])
+                end = openFile.tell()
+        openFile.seek(end)
+        openFile.truncate()
+        return openFile
+
+    def fill(self, unknown, old, new):
+        self.out.write(json.dumps([unknown, old, new]) + "\n")
+
+    def done(self, counter):
+        self.out.write("done\t%d\n" % counter)
+        self.out.flush()
+
+    def close(self):
+        self.out.close()
+
+    def entries(self):
+        # (UNKNOWN_ result, old text, new text) of the examples marked done, in order
+        openFile = open(self.fileName, "rb")
+        openFile.readline()
+        entries = []
+        for line in openFile:
+            if line.startswith("done\t"):
+                for x in entries:
+                    yield x
+                entries = []
+            elif line.endswith("\n"):
+                entries.append(tuple(json.loads(line)))
+        openFile.close()
+
+def backfillTemplate(templateFileName, entries, outputFileName):
+    # writes the template with its UNKNOWN_ results replaced to a temporary file and renames it
+    # over outputFileName, so that the output is never partly written
+    entries = iter(entries)
+    head = next(entries, None)
+    out = open(outputFileName + ".tmp", "wb")
+    for line in open(templateFileName, "rb"):
+        while head is not None and '"' + head[0] + '"' in line:
+            line = line.replace(head[1].encode("utf-8"), head[2].encode("utf-8"))
+            head = next(entries, None)
+        out.write(line)
+    out.close()
+    if head is not None:
+        os.remove(outputFileName + ".tmp")
+        raise ValueError("%s is not in %s, or is out of order" % (head[0], templateFileName))
+    os.rename(outputFileName + ".tmp", outputFileName)
+
+# runTestHadrianClient.py talks to hadrianDaemon.py in frames: a 4-byte big-endian length and
+# that many bytes of JSON.  Bytes in results, which Hadrian's runners don't base64-encode, are
+# sent as their latin-1 reading.
+
+def writeFrame(out, obj):
+    data = json.dumps(obj, separators=(",", ":"), encoding="latin-1")
+    out.write(struct.pack(">I", len(data)) + data)
+
+def readFrame(openFile):
+    # returns None at the end of the stream
+    header = openFile.read(4)
+    if len(header) == 0:
+        return None
+    if len(header) < 4:
+        raise IOError("truncated frame")
+    size, = struct.unpack(">I", header)
+    data = openFile.read(size)
+    if len(data) < size:
+        raise IOError("truncated frame")
+    return json.loads(data)
+
 if __name__ == "__main__":
-    for example in getExamples(open("pfa-tests.json")):
-        print json.dumps(example["engine"])
+    import argparse
+    parser = argparse.ArgumentParser(description="Print the engines of a PFA test suite, or index it.")
+    parser.add_argument("inputFile", nargs="?", default="pfa-tests.json", help="test suite (default pfa-tests.json)")
+    parser.add_argument("--function", action="append", help="only examples of functions matching this glob pattern (may be repeated); uses the index, building it if necessary")
+    parser.add_argument("--index", action="store_true", help="(re)build the index " + indexFileName("<inputFile>") + " and exit")
+    args = parser.parse_args()
+
+    if args.index:
+        print "indexed %d examples in %s" % (len(buildIndex(args.inputFile)), indexFileName(args.inputFile))
+    elif args.function:
+        for counter, example in selectExamples(args.inputFile, args.function):
+            print json.dumps(example["engine"])
+    else:
+        for example in getExamples(open(args.inputFile)):
+            print json.dumps(example["engine"])
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import Queue
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from runTest import *
+from runTestTitus import engines, givingUpOn, Watchdog
+from runTestHadrianClient import sendExamples
+
+from titus.errors import PFARuntimeException
+
+# Runs every example on Titus and Hadrian at once and reports only the trials on which they
+# disagree, instead of comparing either with the results in the test file.  Titus runs in a pool
+# of worker processes and Hadrian in a hadrianDaemon.py (started separately, with Jython); each
+# backend works ahead of the comparison by a bounded number of examples, so the run takes about as
+# long as the slower of the two.
+#
+# Trials marked nondeterministic are compared too: "unordered" results are sorted first, and
+# "pseudorandom" and "unstable" results, whose values differ legitimately, must have the same
+# outcome (success or error code) and the same shape (see runTest.compareShape).  The functions
+# that runTestTitus.py gives up on are only run with --timeout, since Titus may not return from
+# them: Titus then runs in threads of this process, each with a Watchdog (see runTestTitus.py), and
+# a trial that exceeds the timeout is reported as a TIMEOUT next to Hadrian's result.  Without
+# --timeout, these examples are listed as skipped.
+
+def crashMessage(text):
+    return text.strip().split("\n")[-1]
+
+def latin1(outcomes):
+    # bytes given their latin-1 reading, as Hadrian's come from the daemon
+    return json.loads(json.dumps(outcomes, encoding="latin-1"))
+
+def runOnTitus(args, watchdog=None):
+    # the outcome of each trial; {"crash": message} for an exception that is not a PFA runtime
+    # error and {"timeout": budget} for a trial that the watchdog gave up on
+    counter, text = args
+    example = parseExample(text)
+    if watchdog is not None:
+        started = time.time()
+        outcomes = []
+        for trial in example["trials"]:
+            outcome = watchdog.run(example["engine"], trial["sample"], started)
+            if "exception" in outcome:
+                outcome = {"crash": crashMessage(outcome["exception"])}
+            outcomes.append(outcome)
+        return counter, latin1(outcomes)
+    if example["function"] in givingUpOn:
+        return counter, None
+    try:
+        engine = engines.get(example["engine"])
+        convertResult = compileConvertOut(engine.outputType.jsonNode(set()), dobase64=False)
+    except Exception:
+        return counter, [{"crash": crashMessage(traceback.format_exc())}] * len(example["trials"])
+    outcomes = []
+    for trial in example["trials"]:
+        try:
+            outcomes.append({"success": convertResult(engine.action(trial["sample"]))})
+        except PFARuntimeException as err:
+            outcomes.append({"fail": err.code})
+        except Exception:
+            outcomes.append({"crash": crashMessage(traceback.format_exc())})
+    return counter, latin1(outcomes)
+
+def describe(outcome):
+    if "success" in outcome:
+        return json.dumps(outcome["success"])
+    elif "fail" in outcome:
+        return "ERROR CODE " + str(outcome["fail"])
+    elif "timeout" in outcome:
+        return "TIMEOUT (" + outcome["timeout"] + ")"
+    else:
+        return "CRASH " + outcome["crash"]
+
+def disagreements(trial, one, two):
+    if "timeout" in one or "timeout" in two:
+        return ["no result within the timeout"]
+    elif "success" in one and "success" in two:
+        left = one["success"]
+        right = two["success"]
+        if trial.get("nondeterministic", None) in ("pseudorandom", "unstable"):
+            return list(compareShape(left, right))
+        if trial.get("nondeterministic", None) == "unordered" and isinstance(left, list) and isinstance(right, list):
+            left = sorted(left)
+            right = sorted(right)
+        return list(compare(left, right, 1e-4, 0.05, 1e80))
+    elif "fail" in one and "fail" in two:
+        if one["fail"] != two["fail"]:
+            return ["different error codes"]
+        return []
+    elif "crash" in one and "crash" in two:
+        return []
+    else:
+        return ["different outcomes"]
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Run the PFA conformance tests on Titus and a hadrianDaemon.py concurrently and report where they disagree.")
+    parser.add_argument("inputFile", help="test suite, such as pfa-tests.json")
+    parser.add_argument("--port", type=int, default=7438, help="port of the daemon on the loopback interface (default 7438)")
+    parser.add_argument("--pipeline", type=int, default=16, help="number of examples each backend may work ahead of the comparison (default 16)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of Titus worker processes (default 1)")
+    parser.add_argument("--timeout", type=float, default=None, help="run Titus's trials in supervised worker processes, reporting a trial that takes longer than this many seconds as a TIMEOUT; functions that are otherwise skipped are run too")
+    parser.add_argument("--function", action="append", help="only run examples of functions matching this glob pattern (may be repeated); reads them through an index next to the input file, building it if necessary")
+    args = parser.parse_args()
+
+    def exampleTexts():
+        # each backend reads the test file for itself
+        if args.function:
+            return selectExampleTexts(args.inputFile, args.function)
+        else:
+            return enumerate(getExampleTexts(open(args.inputFile)))
+
+    connection = socket.create_connection(("127.0.0.1", args.port))
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    inputFile = connection.makefile("rb")
+    outputFile = connection.makefile("wb")
+    hello = readFrame(inputFile)
+    print >>sys.stderr, "comparing Titus with " + hello["implementation"]
+
+    pending = Queue.Queue(max(args.pipeline, 1))
+    sender = threading.Thread(target=sendExamples, args=(exampleTexts(), outputFile, pending, ResultStore(None, None)))
+    sender.daemon = True
+    sender.start()
+
+    # Pool.imap would otherwise read the whole test file ahead of the workers
+    window = threading.BoundedSemaphore(max(args.pipeline, 1))
+    def throttled():
+        for x in exampleTexts():
+            window.acquire()
+            yield x
+
+    if args.timeout is None:
+        pool = multiprocessing.Pool(max(args.jobs, 1))
+        titusResults = pool.imap(runOnTitus, throttled())
+        watchdogs = []
+    else:
+        # a pool's (daemonic) worker processes cannot start a Watchdog's worker, so the examples
+        # are run by threads, each with its own Watchdog
+        from multiprocessing.pool import ThreadPool
+        watchdogs = [Watchdog(args.timeout, None, dobase64=False) for i in xrange(max(args.jobs, 1))]
+        idle = Queue.Queue()
+        for watchdog in watchdogs:
+            idle.put(watchdog)
+        def runWithWatchdog(x):
+            watchdog = idle.get()
+            try:
+                return runOnTitus(x, watchdog)
+            finally:
+                idle.put(watchdog)
+        pool = ThreadPool(len(watchdogs))
+        titusResults = pool.imap(runWithWatchdog, throttled())
+
+    numExamples = 0
+    numSkipped = 0
+    numTrials = 0
+    numDisagreements = 0
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            elif isinstance(item, basestring):
+                sys.stderr.write(item)
+                sys.exit(1)
+            counter, example, keys, hadrianOutcomes, indexes = item
+
+            if len(indexes) > 0:
+                response = readFrame(inputFile)
+                if response is None or response["id"] != counter:
+                    raise IOError("lost track of the daemon's responses")
+                if "error" in response:
+                    message = response["error"].strip().split("\n")[-1]
+                    hadrianOutcomes = [{"crash": message}] * len(example["trials"])
+                else:
+                    hadrianOutcomes = response["outcomes"]
+
+            titusCounter, titusOutcomes = titusResults.next()
+            window.release()
+            if titusCounter != counter:
+                raise IOError("lost track of Titus's results")
+
+            numExamples += 1
+            if titusOutcomes is None:
+                numSkipped += 1
+                print "%4d    %-20s%s" % (counter + 1, example["function"], json.dumps(example["engine"]))
+                print "                            skipped: Titus may not return (run with --timeout)"
+                sys.stdout.flush()
+                continue
+
+            functionWritten = False
+            for trial, one, two in zip(example["trials"], titusOutcomes, hadrianOutcomes):
+                numTrials += 1
+                messages = disagreements(trial, one, two)
+                if len(messages) > 0:
+                    numDisagreements += 1
+                    if not functionWritten:
+                        print "%4d    %-20s%s" % (counter + 1, example["function"], json.dumps(example["engine"]))
+                        functionWritten = True
+                    print "                            input:    " + json.dumps(trial["sample"])
+                    print "                            titus:    " + describe(one)
+                    print "                            hadrian:  " + describe(two)
+                    for message in messages:
+                        print "                                " + message
+            if functionWritten:
+                sys.stdout.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+        for watchdog in watchdogs:
+            watchdog.stop()
+        connection.close()
+
+    print >>sys.stderr, "%d examples (%d skipped), %d trials compared, %d disagreements" % (numExamples, numSkipped, numTrials, numDisagreements)
+    if args.timeout is not None:
+        timeouts = sum(watchdog.timeouts for watchdog in watchdogs)
+        print >>sys.stderr, "watchdog: %d trial%s timed out" % (timeouts, "" if timeouts == 1 else "s")
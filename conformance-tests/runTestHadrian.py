@@ -1,127 +1,119 @@
 #!/usr/bin/env python
 
+import argparse
 import json
 import signal
 import sys
-import re
 
 from runTest import *
 
+import java.lang.Class
 import java.lang.Exception
+import java.lang.System
 
 from com.opendatagroup.hadrian.errors import PFARuntimeException
 from com.opendatagroup.antinous.pfainterface import PFAEngineFactory
 
+def hadrianImplementation(pef):
+    # identifies the Hadrian and Antinous jars, for the result store
+    loader = pef.getClass().getClassLoader()
+    jars = set()
+    for className in ("com.opendatagroup.hadrian.errors.PFARuntimeException", "com.opendatagroup.antinous.pfainterface.PFAEngineFactory"):
+        jars.add(java.lang.Class.forName(className, False, loader).getProtectionDomain().getCodeSource().getLocation().getPath())
+    return implementationStamp("hadrian", sorted(jars))
+
 if __name__ == "__main__":
     pef = PFAEngineFactory()
     pef.setDebug(False)
 
-    if len(sys.argv[1:]) == 1:
-        inputFile, = sys.argv[1:]
-        outputFile = None
-    else:
-        inputFile, outputFile = sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Run the PFA conformance tests against Hadrian, or fill in the UNKNOWN_ results of a test template.")
+    parser.add_argument("inputFile", help="test suite or template, such as pfa-tests.json")
+    parser.add_argument("outputFile", nargs="?", default=None, help="if given, fill in the template's results and write them here; an interrupted run resumes from " + journalFileName("<outputFile>"))
+    parser.add_argument("--function", action="append", help="only run examples of functions matching this glob pattern (may be repeated); reads them through an index next to the input file, building it if necessary")
+    parser.add_argument("--engine-cache", type=int, default=100, help="number of compiled engines to keep for reuse by examples with the same engine document (default 100; 0 disables)")
+    parser.add_argument("--results", default=None, help="store of trial outcomes, so that trials already run by this version of Hadrian are not run again (default " + resultsFileName("<inputFile>") + "; \"\" disables)")
+    parser.add_argument("--implementation", default=None, help="identifier of the implementation in the result store (default: derived from the Hadrian and Antinous jars)")
+    parser.add_argument("--force", action="store_true", help="run every trial, replacing recorded outcomes")
+    parser.add_argument("--benchmark", metavar="FILE", default=None, help="instead of checking results, time the engine builds and actions of each function, writing latency percentiles to FILE as JSON and a table to stdout (without the result store)")
+    args = parser.parse_args()
+
+    inputFile = args.inputFile
+    outputFile = args.outputFile
+    if args.benchmark is not None and outputFile is not None:
+        parser.error("--benchmark does not fill in a template")
+
+    buildEngine = lambda document: pef.engineFromJson(json.dumps(document))
+    engines = EngineCache(buildEngine, args.engine_cache)
+
+    if args.results is None:
+        args.results = resultsFileName(inputFile)
+    if args.implementation is None:
+        args.implementation = hadrianImplementation(pef)
+    results = ResultStore(args.results or None, args.implementation, args.force)
+
+    if args.benchmark is not None:
+        if args.function:
+            examples = selectExamples(inputFile, args.function)
+        else:
+            examples = enumerate(getExamples(open(inputFile)))
+        # time.time has only millisecond resolution in Jython
+        benchmark = Benchmark(timer=lambda: java.lang.System.nanoTime() * 1e-9)
+        for counter, example in examples:
+            engine = benchmark.build(example["function"], buildEngine, example["engine"])
+            def action(sample):
+                try:
+                    pef.action(engine, sample)
+                except PFARuntimeException:
+                    pass
+            benchmark.run(example["function"], action, [trial["sample"] for trial in example["trials"]])
+        json.dump(OrderedDict([("implementation", args.implementation), ("functions", benchmark.summary())]), open(args.benchmark, "w"), indent=2)
+        print benchmark.table()
+        sys.exit(0)
 
     if outputFile is not None:
-        template = dict(enumerate(open(inputFile).readlines()))
-        lookup = {}
-        numFunctions = 0
-        for lineNumber, lineContent in template.items():
-            m = re.search('"(UNKNOWN_[0-9]+)"', lineContent)
-            if m is not None:
-                lookup[m.group(1)] = lineNumber
-            if lineContent.startswith('     {"function":'):
-                numFunctions += 1
+        journal = TemplateJournal(inputFile, journalFileName(outputFile))
+        numFunctions = countTemplateExamples(inputFile)
     else:
-        template = None
-        lookup = None
+        journal = None
         numFunctions = None
 
-    for counter, example in enumerate(getExamples(open(inputFile))):
-        engine = pef.engineFromJson(json.dumps(example["engine"]))
+    if args.function:
+        examples = selectExamples(inputFile, args.function)
+    else:
+        examples = enumerate(getExamples(open(inputFile)))
+
+    for counter, example in examples:
+        if journal is not None and counter <= journal.lastDone:
+            continue   # filled in by an interrupted run
 
         if numFunctions is not None:
             print "%4d/%4d   %-20s" % (counter + 1, numFunctions, example["function"])  # %s -> %s    , json.dumps(example["engine"]["input"]), json.dumps(example["engine"]["output"])
 
-        functionWritten = False
-        def maybeWriteFunction(functionWritten):
-            if not functionWritten:
-                print "%4d    %-20s%s" % (counter + 1, example["function"], json.dumps(example["engine"]))
-            return True
-
-        for trial in example["trials"]:
-            trialWritten = False
-            try:
-                result = {"success": convertOut(pef.action(engine, trial["sample"]), json.loads(engine.outputType().toString()), dobase64=False)}
-            except PFARuntimeException as err:
-                result = {"fail": err.code()}
-
-            if "success" in result:
-                actual = json.dumps(result["success"])
-            else:
-                actual = "ERROR CODE " + str(result["fail"])
-
-            def maybeWriteTrial(trialWritten):
-                if not trialWritten:
-                    print "                            input:    " + json.dumps(trial["sample"])
-                    print "                            expected: " + json.dumps(trial["result"])
-                    print "                            actual:   " + actual
-                return True
-
-            if "error" in trial:
-                if trial["error"] != result.get("fail", None):
-                    functionWritten = maybeWriteFunction(functionWritten)
-                    if not trialWritten:
-                        print "                            input:    " + json.dumps(trial["sample"])
-                        print "                            expected: ERROR CODE " + str(trial["error"])
-                        print "                            actual:   " + actual
-                        trialWritten = True
-
-            elif trial.get("nondeterministic", None) is not None:
-                if outputFile is not None and trial["result"].startswith("UNKNOWN_"):
-                    lineNumber = lookup[trial["result"]]
-                    if "success" in result:
-                        if trial["nondeterministic"] == "pseudorandom":
-                            template[lineNumber] = template[lineNumber].replace(', "result": "' + trial["result"] + '"', "")
-                        else:
-                            template[lineNumber] = template[lineNumber].replace('"result": "' + trial["result"] + '"', '"result": ' + json.dumps(result["success"]))
-                    else:
-                        template[lineNumber] = template[lineNumber].replace('"result": "' + trial["result"] + '", "nondeterministic": "' + trial["nondeterministic"] + '"', '"error": ' + json.dumps(result["fail"]))
-                else:
-                    if trial["nondeterministic"] == "unordered":
-                        if "success" in result:
-                            for errorMessage in compare(sorted(trial["result"]), sorted(result["success"]), 1e-8, 0.01, 1e80):
-                                functionWritten = maybeWriteFunction(functionWritten)
-                                trialWritten = maybeWriteTrial(trialWritten)
-                                print "                                " + errorMessage
-                        else:
-                            functionWritten = maybeWriteFunction(functionWritten)
-                            trialWritten = maybeWriteTrial(trialWritten)
-                            print "                                " + errorMessage
-
-            else:
-                if outputFile is not None and trial["result"].startswith("UNKNOWN_"):
-                    lineNumber = lookup[trial["result"]]
-                    if "success" in result:
-                        template[lineNumber] = template[lineNumber].replace('"result": "' + trial["result"] + '"', '"result": ' + json.dumps(result["success"]))
-                    else:
-                        template[lineNumber] = template[lineNumber].replace('"result": "' + trial["result"] + '"', '"error": ' + json.dumps(result["fail"]))
-                else:
-                    if "success" in result:
-                        for errorMessage in compare(trial["result"], result["success"], 1e-8, 0.01, 1e80):
-                            functionWritten = maybeWriteFunction(functionWritten)
-                            trialWritten = maybeWriteTrial(trialWritten)
-                            print "                                " + errorMessage
-                    else:
-                        functionWritten = maybeWriteFunction(functionWritten)
-                        trialWritten = maybeWriteTrial(trialWritten)
-                        print "                                " + errorMessage
-
-        if outputFile is None and not functionWritten:
-            print "%4d    %s" % (counter + 1, example["function"])
-
-    if outputFile is not None:
-        out = open(outputFile, "w")
-        for lineNumber in xrange(len(template)):
-            out.write(template[lineNumber])
-        out.close()
+        # the engine is only built if some trial has no recorded outcome
+        engine = None
+        outcomes = []
+        for trial, key in zip(example["trials"], results.keys(example)):
+            result = results.get(key)
+            if result is None:
+                if engine is None:
+                    engine = engines.get(example["engine"])
+                    convertResult = compileConvertOut(json.loads(engine.outputType().toString()), dobase64=False)
+                try:
+                    result = {"success": convertResult(pef.action(engine, trial["sample"]))}
+                except PFARuntimeException as err:
+                    result = {"fail": err.code()}
+                results.put(key, result)
+            outcomes.append(result)
+
+        checkHadrianExample(counter, example, outcomes, sys.stdout, journal)
+        results.flush()
+        if journal is not None:
+            journal.done(counter)
+
+    if journal is not None:
+        journal.close()
+        backfillTemplate(inputFile, journal.entries(), outputFile)
+        os.remove(journal.fileName)
+
+    print >>sys.stderr, engines.summary()
+    print >>sys.stderr, results.summary()
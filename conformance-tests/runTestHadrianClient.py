@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import argparse
+import Queue
+import socket
+import sys
+import threading
+import traceback
+
+from runTest import *
+
+# Runs the PFA conformance tests against Hadrian, or fills in a template, like runTestHadrian.py,
+# but in CPython, with the trials scored by a hadrianDaemon.py.  Requests are pipelined: a thread
+# sends the examples ahead while the main thread reads the responses and writes the report.
+
+def sendExamples(texts, connection, pending, results):
+    # puts (counter, example, keys, outcomes, indexes) on the pending queue for each example,
+    # where outcomes has None for each trial (at indexes) that was sent to the daemon; None at the
+    # end, or an exception's traceback
+    try:
+        for counter, text in texts:
+            example = parseExample(text)
+            keys = results.keys(example)
+            outcomes = [results.get(key) for key in keys]
+            indexes = [i for i, x in enumerate(outcomes) if x is None]
+            if len(indexes) > 0:
+                samples = parseExampleJson(text)["trials"]
+                writeFrame(connection, {"id": counter, "function": example["function"], "engine": example["engine"], "samples": [samples[i]["sample"] for i in indexes]})
+                connection.flush()
+            pending.put((counter, example, keys, outcomes, indexes))
+        pending.put(None)
+    except Exception:
+        pending.put(traceback.format_exc())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PFA conformance tests against a hadrianDaemon.py, or fill in the UNKNOWN_ results of a test template.")
+    parser.add_argument("inputFile", help="test suite or template, such as pfa-tests.json")
+    parser.add_argument("outputFile", nargs="?", default=None, help="if given, fill in the template's results and write them here; an interrupted run resumes from " + journalFileName("<outputFile>"))
+    parser.add_argument("--port", type=int, default=7438, help="port of the daemon on the loopback interface (default 7438)")
+    parser.add_argument("--pipeline", type=int, default=16, help="number of examples to send ahead of the responses (default 16)")
+    parser.add_argument("--function", action="append", help="only run examples of functions matching this glob pattern (may be repeated); reads them through an index next to the input file, building it if necessary")
+    parser.add_argument("--results", default=None, help="store of trial outcomes, so that trials already run by this version of Hadrian are not run again (default " + resultsFileName("<inputFile>") + "; \"\" disables)")
+    parser.add_argument("--force", action="store_true", help="run every trial, replacing recorded outcomes")
+    args = parser.parse_args()
+
+    connection = socket.create_connection(("127.0.0.1", args.port))
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    inputFile = connection.makefile("rb")
+    outputFile = connection.makefile("wb")
+    hello = readFrame(inputFile)
+
+    # bytes come back from the daemon as latin-1 unicode, not as the str that runTestHadrian.py
+    # records, so the daemon's outcomes are kept apart from runTestHadrian.py's in the store
+    if args.results is None:
+        args.results = resultsFileName(args.inputFile)
+    results = ResultStore(args.results or None, hello["implementation"] + "+daemon", args.force)
+
+    if args.outputFile is not None:
+        journal = TemplateJournal(args.inputFile, journalFileName(args.outputFile))
+        numFunctions = countTemplateExamples(args.inputFile)
+    else:
+        journal = None
+        numFunctions = None
+
+    if args.function:
+        texts = selectExampleTexts(args.inputFile, args.function)
+    else:
+        texts = enumerate(getExampleTexts(open(args.inputFile)))
+    if journal is not None:
+        # resume after the examples filled in by an interrupted run
+        texts = ((counter, text) for counter, text in texts if counter > journal.lastDone)
+
+    pending = Queue.Queue(max(args.pipeline, 1))
+    sender = threading.Thread(target=sendExamples, args=(texts, outputFile, pending, results))
+    sender.daemon = True
+    sender.start()
+
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            elif isinstance(item, basestring):
+                sys.stderr.write(item)
+                sys.exit(1)
+            counter, example, keys, outcomes, indexes = item
+
+            if numFunctions is not None:
+                print "%4d/%4d   %-20s" % (counter + 1, numFunctions, example["function"])
+
+            if len(indexes) > 0:
+                response = readFrame(inputFile)
+                if response is None or response["id"] != counter:
+                    raise IOError("lost track of the daemon's responses")
+                if "error" in response:
+                    print "function: " + example["function"]
+                    print "engine:   " + json.dumps(example["engine"])
+                    print
+                    sys.stdout.flush()
+                    sys.stderr.write(response["error"])
+                    sys.exit(1)
+                for i, result in zip(indexes, response["outcomes"]):
+                    outcomes[i] = result
+                    results.put(keys[i], result)
+
+            checkHadrianExample(counter, example, outcomes, sys.stdout, journal)
+            results.flush()
+            if journal is not None:
+                journal.done(counter)
+    finally:
+        results.flush()
+        connection.close()
+
+    if journal is not None:
+        journal.close()
+        backfillTemplate(args.inputFile, journal.entries(), args.outputFile)
+        os.remove(journal.fileName)
+
+    print >>sys.stderr, results.summary()
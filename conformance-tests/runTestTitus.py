@@ -1,15 +1,21 @@
 #!/usr/bin/env python
 
+import argparse
 import json
+import os
+import Queue
 import sys
+import threading
+import time
+import traceback
+from StringIO import StringIO
 
+import titus
 from titus.genpy import PFAEngine
 from titus.errors import PFARuntimeException
 
 from runTest import *
 
-inputFile, = sys.argv[1:]
-
 # Failures that I'm giving up on:
 # 
 # prob.dist.binomialQF({"p": 0.99999, "prob": 1e-05, "size": 1}) should be 1, is 0 (rounding in count)
@@ -22,48 +28,188 @@ inputFile, = sys.argv[1:]
 #                               {"x": 100, "prob": 0.5, "size": 100} should be 5.7e42, is 0.02817
 # prob.dist.negativeBinomialQF has many errors (though not as many as the hypergeometric)
 
-for counter, example in enumerate(getExamples(open(inputFile))):
-    engine, = PFAEngine.fromJson(example["engine"])
+givingUpOn = ("prob.dist.binomialQF", "prob.dist.hypergeometricPDF", "prob.dist.hypergeometricCDF", "prob.dist.hypergeometricQF", "prob.dist.negativeBinomialPDF", "prob.dist.negativeBinomialQF")
+
+# (With --timeout, trials run under a Watchdog and the functions above are run too: a trial that
+# hangs is reported as a TIMEOUT instead of stalling the suite.)
+
+def buildEngine(document):
+    engine, = PFAEngine.fromJson(document)
+    return engine
+
+engines = EngineCache(buildEngine)
+results = ResultStore(None, None)
+profiler = StageProfiler(enabled=False)
+
+def watchdogWorker(connection, dobase64=True):
+    # runs the trials sent by a Watchdog, one at a time, with the most recently sent engine
+    document = None
+    engine = None
+    while True:
+        try:
+            kind, x = connection.recv()
+        except EOFError:
+            return
+        if kind == "engine":
+            document = x
+            engine = None
+        else:
+            try:
+                if engine is None:
+                    engine = engines.get(document)
+                    convertResult = compileConvertOut(engine.outputType.jsonNode(set()), dobase64=dobase64)
+                result = {"success": convertResult(engine.action(x))}
+            except PFARuntimeException as err:
+                result = {"fail": err.code}
+            except Exception:
+                result = {"exception": traceback.format_exc()}
+            connection.send((result, engines.hits, engines.misses))
+
+# A Watchdog runs trials in a worker process and kills it (starting a new one for the next trial)
+# when a trial exceeds its own time budget or the remainder of its example's budget.  Building the
+# engine counts against the first trial that needs it.  Results are converted as for the test file
+# (bytes in base64) unless dobase64 is False.
+class Watchdog(object):
+    def __init__(self, trialTimeout=None, exampleTimeout=None, dobase64=True):
+        self.trialTimeout = trialTimeout
+        self.exampleTimeout = exampleTimeout
+        self.dobase64 = dobase64
+        self.process = None
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+
+    def start(self):
+        import multiprocessing
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=watchdogWorker, args=(child, self.dobase64))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.document = None
+        self.workerHits = self.workerMisses = 0
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+
+    def run(self, document, sample, started):
+        # started is the time at which the example began
+        timeout = self.trialTimeout
+        budget = "trial budget of %g s" % timeout if timeout is not None else None
+        if self.exampleTimeout is not None:
+            remaining = self.exampleTimeout - (time.time() - started)
+            if timeout is None or remaining < timeout:
+                timeout = remaining
+                budget = "example budget of %g s" % self.exampleTimeout
+            if remaining <= 0.0:
+                self.timeouts += 1
+                return {"timeout": budget}
+
+        if self.process is None:
+            self.start()
+        if document is not self.document:
+            self.connection.send(("engine", document))
+            self.document = document
+        self.connection.send(("trial", sample))
+
+        if not self.connection.poll(timeout):
+            self.stop()
+            self.timeouts += 1
+            return {"timeout": budget}
+        result, hits, misses = self.connection.recv()
+        self.hits += hits - self.workerHits
+        self.misses += misses - self.workerMisses
+        self.workerHits, self.workerMisses = hits, misses
+        return result
+
+def writeCrash(example, trial, out):
+    # PFAEngine.fromJson(example["engine"], debug=True)
+    print >>out, "function: " + example["function"]
+    print >>out, "engine:   " + json.dumps(example["engine"])
+    print >>out, "input:    " + repr(trial["sample"])
+    if "error" in trial:
+        print >>out, "expected: ERROR CODE " + repr(trial["error"])
+    elif "result" in trial:
+        print >>out, "expected: " + repr(trial["result"])
+    print >>out
 
-    if example["function"] in ("prob.dist.binomialQF", "prob.dist.hypergeometricPDF", "prob.dist.hypergeometricCDF", "prob.dist.hypergeometricQF", "prob.dist.negativeBinomialPDF", "prob.dist.negativeBinomialQF"):
-        continue
+def runExample(counter, example, out, watchdog=None):
+    if watchdog is None and example["function"] in givingUpOn:
+        engines.get(example["engine"])
+        return
+
+    # the engine is only built if some trial has no recorded outcome
+    engine = None
+    started = time.time()
 
     functionWritten = False
     def maybeWriteFunction(functionWritten):
         if not functionWritten:
-            print "%4d    %-20s%s" % (counter + 1, example["function"], json.dumps(example["engine"]))
+            print >>out, "%4d    %-20s%s" % (counter + 1, example["function"], json.dumps(example["engine"]))
         return True
 
-    for trial in example["trials"]:
+    for trial, key in zip(example["trials"], results.keys(example)):
         trialWritten = False
-        try:
-            result = {"success": convertOut(engine.action(trial["sample"]), engine.outputType.jsonNode(set()), dobase64=True)}
-        except PFARuntimeException as err:
-            result = {"fail": err.code}
-        except Exception:
-            # PFAEngine.fromJson(example["engine"], debug=True)
-            print "function: " + example["function"]
-            print "engine:   " + json.dumps(example["engine"])
-            print "input:    " + repr(trial["sample"])
-            if "error" in trial:
-                print "expected: ERROR CODE " + repr(trial["error"])
-            elif "result" in trial:
-                print "expected: " + repr(trial["result"])
-            print
-            raise
+        result = results.get(key)
+        if result is None and watchdog is not None:
+            result = watchdog.run(example["engine"], trial["sample"], started)
+            if "exception" in result:
+                writeCrash(example, trial, out)
+                raise Exception("in the watchdog's worker process:\n" + result["exception"])
+            if "timeout" not in result:
+                results.put(key, result)
+        elif result is None:
+            if engine is None:
+                began = profiler.begin()
+                engine = engines.get(example["engine"])
+                convertResult = compileConvertOut(engine.outputType.jsonNode(set()), dobase64=True)
+                profiler.end(began, "build", example["function"])
+            began = profiler.begin()
+            try:
+                value = engine.action(trial["sample"])
+            except PFARuntimeException as err:
+                profiler.end(began, "action", example["function"])
+                result = {"fail": err.code}
+            except Exception:
+                writeCrash(example, trial, out)
+                raise
+            else:
+                profiler.end(began, "action", example["function"])
+                began = profiler.begin()
+                result = {"success": convertResult(value)}
+                profiler.end(began, "convertOut", example["function"])
+            results.put(key, result)
+
+        began = profiler.begin()
 
         if "success" in result:
             actual = json.dumps(result["success"])
-        else:
+        elif "fail" in result:
             actual = "ERROR CODE " + str(result["fail"])
+        else:
+            actual = "TIMEOUT (" + result["timeout"] + ")"
 
-        if "error" in trial:
+        if "timeout" in result:
+            # whatever was expected
+            functionWritten = maybeWriteFunction(functionWritten)
+            print >>out, "                            input:    " + json.dumps(trial["sample"])
+            if "error" in trial:
+                print >>out, "                            expected: ERROR CODE " + str(trial["error"])
+            elif "result" in trial:
+                print >>out, "                            expected: " + json.dumps(trial["result"])
+            print >>out, "                            actual:   " + actual
+
+        elif "error" in trial:
             if trial["error"] != result.get("fail", None):
                 functionWritten = maybeWriteFunction(functionWritten)
                 if not trialWritten:
-                    print "                            input:    " + json.dumps(trial["sample"])
-                    print "                            expected: ERROR CODE " + str(trial["error"])
-                    print "                            actual:   " + actual
+                    print >>out, "                            input:    " + json.dumps(trial["sample"])
+                    print >>out, "                            expected: ERROR CODE " + str(trial["error"])
+                    print >>out, "                            actual:   " + actual
                     trialWritten = True
 
         elif trial.get("nondeterministic", None) in ("pseudorandom", "unstable"):
@@ -72,9 +218,9 @@ for counter, example in enumerate(getExamples(open(inputFile))):
         else:
             def maybeWriteTrial(trialWritten):
                 if not trialWritten:
-                    print "                            input:    " + json.dumps(trial["sample"])
-                    print "                            expected: " + json.dumps(trial["result"])
-                    print "                            actual:   " + actual
+                    print >>out, "                            input:    " + json.dumps(trial["sample"])
+                    print >>out, "                            expected: " + json.dumps(trial["result"])
+                    print >>out, "                            actual:   " + actual
                 return True
 
             if "success" in result:
@@ -90,10 +236,243 @@ for counter, example in enumerate(getExamples(open(inputFile))):
                 for errorMessage in compare(left, right, 1e-4, 0.05, 1e80):
                     functionWritten = maybeWriteFunction(functionWritten)
                     trialWritten = maybeWriteTrial(trialWritten)
-                    print "                            " + errorMessage
+                    print >>out, "                            " + errorMessage
             else:
                 functionWritten = maybeWriteFunction(functionWritten)
                 trialWritten = maybeWriteTrial(trialWritten)
 
+        profiler.end(began, "compare", example["function"])
+
     if not functionWritten:
-        print "%4d    %s" % (counter + 1, example["function"])
+        print >>out, "%4d    %s" % (counter + 1, example["function"])
+
+def benchmarkExample(example, benchmark):
+    if example["function"] in givingUpOn:
+        return
+    engine = benchmark.build(example["function"], buildEngine, example["engine"])
+    def action(sample):
+        try:
+            engine.action(sample)
+        except PFARuntimeException:
+            pass
+    benchmark.run(example["function"], action, [trial["sample"] for trial in example["trials"]])
+
+def throttle(examples, window):
+    # Pool.imap reads its input in a thread of its own, which would otherwise read the whole test
+    # file ahead of the workers and drop an error in reading it (Python 2.7 loses one raised at the
+    # first example); the error is passed on as (None, traceback) for the worker to return
+    try:
+        for x in examples:
+            window.acquire()
+            yield x
+    except Exception:
+        window.acquire()
+        yield None, traceback.format_exc()
+
+def runExampleInWorker(args):
+    # each worker process parses the example and builds its own engine (parsing in the worker
+    # keeps dict ordering, and hence the report, identical to a serial run); the report is sent
+    # back as text so that the parent can write it in the original order, and new outcomes are
+    # sent back for the parent to record
+    counter, text = args
+    if counter is None:
+        return "", text, (0, 0, 0, 0), []
+    out = StringIO()
+    before = engines.hits, engines.misses, results.reused, results.run
+    try:
+        runExample(counter, parseExample(text), out)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    counts = engines.hits - before[0], engines.misses - before[1], results.reused - before[2], results.run - before[3]
+    return out.getvalue(), error, counts, results.takePending()
+
+def runParallel(examples, jobs, out):
+    import multiprocessing
+
+    window = threading.BoundedSemaphore(4 * jobs)
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for text, error, counts, records in pool.imap(runExampleInWorker, throttle(examples, window)):
+            window.release()
+            engines.hits += counts[0]
+            engines.misses += counts[1]
+            results.reused += counts[2]
+            results.run += counts[3]
+            results.addPending(records)
+            results.flush()
+            out.write(text)
+            if error is not None:
+                out.flush()
+                sys.stderr.write(error)
+                sys.exit(1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+def runSupervised(examples, jobs, out, trialTimeout, exampleTimeout):
+    # examples are parsed and checked by threads of this process, each with its own Watchdog to
+    # run the trials, and reported in the original order
+    from multiprocessing.pool import ThreadPool
+
+    watchdogs = [Watchdog(trialTimeout, exampleTimeout) for i in xrange(jobs)]
+    idle = Queue.Queue()
+    for watchdog in watchdogs:
+        idle.put(watchdog)
+
+    def runWithWatchdog(args):
+        counter, example = args
+        if counter is None:
+            return "", example
+        watchdog = idle.get()
+        text = StringIO()
+        try:
+            runExample(counter, example, text, watchdog)
+        except Exception:
+            return text.getvalue(), traceback.format_exc()
+        finally:
+            idle.put(watchdog)
+        return text.getvalue(), None
+
+    window = threading.BoundedSemaphore(4 * jobs)
+    pool = ThreadPool(jobs)
+    try:
+        for text, error in pool.imap(runWithWatchdog, throttle(examples, window)):
+            window.release()
+            results.flush()
+            out.write(text)
+            if error is not None:
+                out.flush()
+                sys.stderr.write(error)
+                sys.exit(1)
+    finally:
+        pool.terminate()
+        pool.join()
+        for watchdog in watchdogs:
+            watchdog.stop()
+            engines.hits += watchdog.hits
+            engines.misses += watchdog.misses
+        timeouts = sum(watchdog.timeouts for watchdog in watchdogs)
+        print >>sys.stderr, "watchdog: %d trial%s timed out" % (timeouts, "" if timeouts == 1 else "s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PFA conformance tests against Titus.")
+    parser.add_argument("inputFile", help="test suite, such as pfa-tests.json")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes to shard examples across (default 1: run serially)")
+    parser.add_argument("--function", action="append", help="only run examples of functions matching this glob pattern (may be repeated); reads them through an index next to the input file, building it if necessary")
+    parser.add_argument("--engine-cache", type=int, default=100, help="number of compiled engines to keep for reuse by examples with the same engine document, per process (default 100; 0 disables)")
+    parser.add_argument("--results", default=None, help="store of trial outcomes, so that trials already run by this version of Titus are not run again (default " + resultsFileName("<inputFile>") + "; \"\" disables)")
+    parser.add_argument("--implementation", default=None, help="identifier of the implementation in the result store (default: derived from the Titus source files)")
+    parser.add_argument("--force", action="store_true", help="run every trial, replacing recorded outcomes")
+    parser.add_argument("--timeout", type=float, default=None, help="run trials in supervised worker processes, reporting a trial that takes longer than this many seconds as a TIMEOUT (the worker is killed and replaced); functions that are otherwise skipped are run too")
+    parser.add_argument("--example-timeout", type=float, default=None, help="like --timeout, but a time budget in seconds for all the trials of an example; trials beyond it are reported as TIMEOUTs")
+    parser.add_argument("--benchmark", metavar="FILE", default=None, help="instead of checking results, time the engine builds and actions of each function, writing latency percentiles to FILE as JSON and a table to stdout (serially, without the result store)")
+    parser.add_argument("--profile", action="store_true", help="attribute the time of each stage (getExamples, convertInput, build, action, convertOut, compare) and the net number of gc-tracked objects it leaves (allocated less freed) to each function, printing a table to stderr (serially)")
+    parser.add_argument("--profile-top", type=int, default=20, metavar="N", help="number of functions (and cProfile entries) to show with --profile (default 20)")
+    parser.add_argument("--cprofile", metavar="FILE", default=None, help="with --profile, also run under cProfile, writing its stats to FILE and printing the top entries by cumulative time")
+    parser.add_argument("--flamegraph", metavar="FILE", default=None, help="with --profile, also write the stage times as collapsed stacks (root;family;function;stage microseconds) to FILE, for flame-graph tools")
+    args = parser.parse_args()
+
+    if args.benchmark is not None and (args.jobs > 1 or args.timeout is not None or args.example_timeout is not None):
+        parser.error("--benchmark runs serially, without --jobs, --timeout or --example-timeout")
+    if (args.cprofile is not None or args.flamegraph is not None) and not args.profile:
+        parser.error("--cprofile and --flamegraph require --profile")
+    if args.profile and (args.jobs > 1 or args.timeout is not None or args.example_timeout is not None or args.benchmark is not None):
+        parser.error("--profile runs serially, without --jobs, --timeout, --example-timeout or --benchmark")
+
+    engines.size = args.engine_cache
+
+    # workers inherit the loaded store
+    if args.results is None:
+        args.results = resultsFileName(args.inputFile)
+    if args.implementation is None:
+        args.implementation = implementationStamp("titus", [os.path.dirname(titus.__file__)])
+    results = ResultStore(args.results or None, args.implementation, args.force)
+
+    if args.benchmark is not None:
+        if args.function:
+            examples = selectExamples(args.inputFile, args.function)
+        else:
+            examples = enumerate(getExamples(open(args.inputFile)))
+        benchmark = Benchmark()
+        for counter, example in examples:
+            benchmarkExample(example, benchmark)
+        json.dump(OrderedDict([("implementation", args.implementation), ("functions", benchmark.summary())]), open(args.benchmark, "w"), indent=2)
+        print benchmark.table()
+        sys.exit(0)
+
+    elif args.timeout is not None or args.example_timeout is not None:
+        if args.function:
+            examples = selectExamples(args.inputFile, args.function)
+        else:
+            examples = enumerate(getExamples(open(args.inputFile)))
+        try:
+            runSupervised(examples, args.jobs, sys.stdout, args.timeout, args.example_timeout)
+        finally:
+            results.flush()
+    elif args.profile:
+        if args.function:
+            texts = selectExampleTexts(args.inputFile, args.function)
+        else:
+            texts = enumerate(getExampleTexts(open(args.inputFile)))
+        profiler = StageProfiler()
+        if args.cprofile is not None:
+            import cProfile
+            cprofiler = cProfile.Profile()
+            cprofiler.enable()
+        try:
+            while True:
+                # reading and parsing the example is attributed to its function once it is known
+                began = profiler.begin()
+                try:
+                    counter, text = next(texts)
+                except StopIteration:
+                    break
+                if text[:1] == "{":
+                    example = json.loads(text)
+                    profiler.end(began, "getExamples", example["function"])
+                    began = profiler.begin()
+                    example = convertInput(example)
+                    profiler.end(began, "convertInput", example["function"])
+                else:
+                    example = parseExample(text)
+                    profiler.end(began, "getExamples", example["function"])
+                runExample(counter, example, sys.stdout)
+                results.flush()
+                profiler.collect()
+        finally:
+            if args.cprofile is not None:
+                cprofiler.disable()
+            profiler.stop()
+            results.flush()
+
+        print >>sys.stderr, profiler.table(args.profile_top)
+        if args.cprofile is not None:
+            import pstats
+            cprofiler.dump_stats(args.cprofile)
+            print >>sys.stderr
+            pstats.Stats(args.cprofile, stream=sys.stderr).sort_stats("cumulative").print_stats(args.profile_top)
+        if args.flamegraph is not None:
+            out = open(args.flamegraph, "w")
+            profiler.writeCollapsed(out)
+            out.close()
+    elif args.jobs > 1:
+        if args.function:
+            texts = selectExampleTexts(args.inputFile, args.function)
+        else:
+            texts = enumerate(getExampleTexts(open(args.inputFile)))
+        runParallel(texts, args.jobs, sys.stdout)
+    else:
+        if args.function:
+            examples = selectExamples(args.inputFile, args.function)
+        else:
+            examples = enumerate(getExamples(open(args.inputFile)))
+        try:
+            for counter, example in examples:
+                runExample(counter, example, sys.stdout)
+                results.flush()
+        finally:
+            results.flush()
+
+    print >>sys.stderr, engines.summary()
+    print >>sys.stderr, results.summary()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+import cPickle
+import hashlib
+import os
+import sys
+import xml.etree.ElementTree
+from collections import OrderedDict as odict
+
+# The library signatures of libfcns.xml, as patterns of types: a Pattern for each parameter and
+# return type, in which <any>, <ref>, <record>, <enum> and <fixed> are labels to be assigned
+# consistently across a signature.
+
+class Parameter(object):
+    def __init__(self, par):
+        self.name = par.attrib["name"]
+        self.pattern = pattern(par)
+    def __repr__(self):
+        return "Parameter(" + repr(self.name) + ", " + repr(self.pattern) + ")"
+    def getlabels(self, labels):
+        self.pattern.getlabels(labels)
+
+class Pattern(object):
+    def getlabels(self, labels):
+        pass
+    def assignNames(self, nameCounters):
+        pass
+
+class Primitive(Pattern):
+    def __init__(self, name):
+        self.name = name
+    def __repr__(self):
+        return "Primitive(" + repr(self.name) + ")"
+
+class Any(Pattern):
+    def __init__(self, label, of):
+        self.label = label
+        if of is None:
+            self.of = []
+        else:
+            self.of = [Primitive(x) for x in of.split(", ")]
+    def __repr__(self):
+        return "Label(" + repr(self.label) + ", [" + ", ".join(repr(x) for x in self.of) + "])"
+    def getlabels(self, labels):
+        if self.label in labels:
+            raise Exception
+        else:
+            labels[self.label] = self.of
+
+class Ref(Pattern):
+    def __init__(self, label):
+        self.label = label
+    def __repr__(self):
+        return "Ref(" + repr(self.label) + ")"
+    def getlabels(self, labels):
+        if self.label not in labels:
+            raise Exception
+
+class Array(Pattern):
+    def __init__(self, items):
+        self.items = items
+    def __repr__(self):
+        return "Array(" + repr(self.items) + ")"
+    def getlabels(self, labels):
+        self.items.getlabels(labels)
+    def assignNames(self, nameCounters):
+        self.items.assignNames(nameCounters)
+
+class Map(Pattern):
+    def __init__(self, values):
+        self.values = values
+    def __repr__(self):
+        return "Map(" + repr(self.values) + ")"
+    def getlabels(self, labels):
+        self.values.getlabels(labels)
+    def assignNames(self, nameCounters):
+        self.values.assignNames(nameCounters)
+
+class Record(Pattern):
+    def __init__(self, label, fields, name=None):
+        self.label = label
+        self.fields = fields
+        self.name = name
+    def __repr__(self):
+        return "Record(" + repr(self.label) + ", [" + ", ".join(repr(x) for x in self.fields) + "])"
+    def getlabels(self, labels):
+        if self.label in labels:
+            raise Exception
+        else:
+            labels[self.label] = ["record", self.fields]
+            for x in self.fields:
+                x.getlabels(labels)
+    def assignNames(self, nameCounters):
+        if self.label is None:
+            self.name = "Record" + str(nameCounters["record"])
+            nameCounters["record"] += 1
+        for x in self.fields:
+            x.type.assignNames(nameCounters)
+
+class Field(Pattern):
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+    def __repr__(self):
+        return "Field(" + repr(self.name) + ", " + repr(self.type) + ")"
+    def getlabels(self, labels):
+        self.type.getlabels(labels)
+
+class Enum(Pattern):
+    def __init__(self, label, ofRecord, name=None, symbols=None):
+        self.label = label
+        self.ofRecord = ofRecord
+        self.name = name
+        self.symbols = symbols
+    def __repr__(self):
+        return "Enum(" + repr(self.label) + ", " + repr(self.ofRecord) + ")"
+    def getlabels(self, labels):
+        if self.label in labels:
+            raise Exception
+        else:
+            if self.ofRecord is None:
+                labels[self.label] = ["enum"]
+            else:
+                labels[self.label] = ["enum", self.ofRecord]
+    def assignNames(self, nameCounters):
+        if self.label is None:
+            self.name = "Enum" + str(nameCounters["enum"])
+            nameCounters["enum"] += 1
+
+class Fixed(Pattern):
+    def __init__(self, label, name=None, size=None):
+        self.label = label
+        self.name = name
+        self.size = size
+    def __repr__(self):
+        return "Fixed(" + repr(self.label) + ")"
+    def getlabels(self, labels):
+        if self.label in labels:
+            raise Exception
+        else:
+            labels[self.label] = ["fixed"]
+    def assignNames(self, nameCounters):
+        if self.label is None:
+            self.name = "Fixed" + str(nameCounters["fixed"])
+            nameCounters["fixed"] += 1
+
+class Union(Pattern):
+    def __init__(self, types):
+        self.types = types
+    def __repr__(self):
+        return "Union([" + ", ".join(repr(x) for x in self.types) + "])"
+    def getlabels(self, labels):
+        for x in self.types:
+            x.getlabels(labels)
+    def assignNames(self, nameCounters):
+        for x in self.types:
+            x.assignNames(nameCounters)
+
+class Function(Pattern):
+    def __init__(self, parameters, ret):
+        self.parameters = parameters
+        self.ret = ret
+    def __repr__(self):
+        return "Function([" + ", ".join(repr(x) for x in self.parameters) + "], " + repr(self.ret) + ")"
+    def getlabels(self, labels):
+        for x in self.parameters:
+            x.getlabels(labels)
+        self.ret.getlabels(labels)
+    def assignNames(self, nameCounters):
+        for x in self.parameters:
+            x.assignNames(nameCounters)
+        self.ret.assignNames(nameCounters)
+
+def pattern(par):
+    children = par.getchildren()
+
+    if len(children) == 0:
+        return Primitive(par.text)
+
+    elif len(children) == 1 and children[0].tag == "any":
+        return Any(children[0].attrib["label"], children[0].attrib.get("of", None))
+
+    elif len(children) == 1 and children[0].tag == "ref":
+        return Ref(children[0].attrib["label"])
+
+    elif len(children) == 1 and children[0].tag == "array":
+        return Array(pattern(children[0]))
+
+    elif len(children) == 1 and children[0].tag == "map":
+        return Map(pattern(children[0]))
+
+    elif len(children) == 1 and children[0].tag == "record":
+        return Record(children[0].attrib["label"],
+                      [Field(x.attrib["name"], pattern(x)) for x in children[0].findall("./field")])
+
+    elif len(children) == 1 and children[0].tag == "enum":
+        return Enum(children[0].attrib["label"], children[0].attrib.get("ofRecord", None))
+
+    elif len(children) == 1 and children[0].tag == "fixed":
+        return Fixed(children[0].attrib["label"])
+
+    elif all(x.tag == "union" for x in children):
+        return Union([pattern(x) for x in children])
+
+    elif len(children) == 1 and children[0].tag == "function":
+        return Function([pattern(x) for x in children[0].findall("./par")], pattern(children[0].find("./ret")))
+
+    else:
+        raise Exception
+
+def versionNumbers(text):
+    return map(int, text.split("."))
+
+class LibrarySignature(object):
+    def __init__(self, sig):
+        self.parameters = [Parameter(x) for x in sig.findall("./par")]
+        self.ret = pattern(sig.find("./ret"))
+        self.birth = versionNumbers(sig.attrib.get("birth", "0.0.0"))
+        self.deprecation = versionNumbers(sig.attrib.get("deprecation", "999999.999999.999999"))
+    def __repr__(self):
+        return "LibrarySignature([" + ", ".join(repr(x) for x in self.parameters) + "], " + repr(self.ret) + ")"
+    def availableIn(self, version):
+        return self.birth <= version and self.deprecation > version
+
+class LibraryFunction(object):
+    def __init__(self, fcn):
+        self.name = fcn.attrib["name"]
+        self.signatures = [LibrarySignature(x) for x in fcn.findall("./sig")]
+        self.nondeterministic = None
+        for x in fcn.findall("./doc/nondeterministic"):
+            self.nondeterministic = x.attrib["type"]
+        self.errorCodes = [int(x.attrib["code"]) for x in fcn.findall("./doc/error")]
+        # identifies the function's whole <fcn> element, documentation included
+        self.digest = hashlib.sha1(xml.etree.ElementTree.tostring(fcn).rstrip()).hexdigest()
+    def __repr__(self):
+        return "LibraryFunction(" + repr(self.name) + ")"
+
+class SignatureCatalog(object):
+    def __init__(self, libfcns):
+        self.version = versionNumbers(libfcns.find("./version").text)
+        self.functions = odict((x.name, x) for x in (LibraryFunction(fcn) for fcn in libfcns.findall("libfcns/fcn")))
+    def __getitem__(self, name):
+        return self.functions[name]
+    def __contains__(self, name):
+        return name in self.functions
+    def __iter__(self):
+        return iter(self.functions.values())
+    def __len__(self):
+        return len(self.functions)
+
+# Parsing libfcns.xml and building the patterns is done once: the catalog is pickled next to it
+# (fileName + ".catalog"), under a first line that identifies the version of this format and the
+# content of the XML, and loaded from there as long as both match.  Change catalogVersion along
+# with the classes above.
+
+catalogVersion = "pfa-signature-catalog 1"
+
+def catalogFileName(fileName):
+    return fileName + ".catalog"
+
+def loadCatalog(fileName):
+    text = open(fileName, "rb").read()
+    header = "%s\t%s" % (catalogVersion, hashlib.sha1(text).hexdigest())
+
+    try:
+        openFile = open(catalogFileName(fileName), "rb")
+    except IOError:
+        pass
+    else:
+        try:
+            if openFile.readline().rstrip("\n") == header:
+                return cPickle.load(openFile)
+        except (cPickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+            pass   # a damaged snapshot: rebuilt below
+        finally:
+            openFile.close()
+
+    catalog = SignatureCatalog(xml.etree.ElementTree.fromstring(text))
+    try:
+        out = open(catalogFileName(fileName) + ".tmp", "wb")
+        out.write(header + "\n")
+        cPickle.dump(catalog, out, 2)
+        out.close()
+        os.rename(catalogFileName(fileName) + ".tmp", catalogFileName(fileName))
+    except (IOError, OSError):
+        pass   # a read-only location: the catalog is used for this run only
+    return catalog
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build (if out of date) and summarize the signature catalog of libfcns.xml.")
+    parser.add_argument("fileName", nargs="?", default="../libfcns.xml", help="library description (default ../libfcns.xml)")
+    parser.add_argument("--function", action="append", help="also print the signatures of this function (may be repeated)")
+    args = parser.parse_args()
+
+    # through the module, so that the snapshot names its classes as signatureCatalog's, not
+    # __main__'s, and the other scripts can load it
+    import signatureCatalog
+    catalog = signatureCatalog.loadCatalog(args.fileName)
+    print "PFA %s: %d functions, %d signatures" % (".".join(map(str, catalog.version)), len(catalog), sum(len(x.signatures) for x in catalog))
+    for name in args.function or []:
+        if name not in catalog:
+            print >>sys.stderr, "no function named " + name
+            sys.exit(1)
+        for sig in catalog[name].signatures:
+            print "    " + repr(sig)
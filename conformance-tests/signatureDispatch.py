@@ -0,0 +1,594 @@
+#!/usr/bin/env python
+
+import json
+import sys
+from collections import OrderedDict as odict
+
+from signatureCatalog import Primitive, Any, Ref, Array, Map, Record, Enum, Fixed, Union, Function, loadCatalog
+
+# Resolution of library function calls against the signatures of the catalog, following the type
+# rules of the PFA specification: the "accepts" relation (with numeric promotion and covariant
+# arrays, maps and records), the narrowest supertype of a collection of types, and labeled type
+# patterns, which must be matched consistently across a signature.
+
+class TypeCheckError(Exception):
+    pass
+
+primitiveNames = ("null", "boolean", "int", "long", "float", "double", "string", "bytes")
+numericRank = {"int": 0, "long": 1, "float": 2, "double": 3}
+
+class AvroType(object):
+    # kind is the type's top-level kind: a primitive name, "array", "map", "record", "enum",
+    # "fixed", "union" or "function"
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    def __repr__(self):
+        return json.dumps(self.toJson(set()))
+
+class AvroPrimitive(AvroType):
+    def __init__(self, name):
+        self.name = name
+        self.kind = name
+    def __eq__(self, other):
+        return isinstance(other, AvroPrimitive) and other.name == self.name
+    def __hash__(self):
+        return hash(self.name)
+    def toJson(self, memo):
+        return self.name
+
+class AvroArray(AvroType):
+    kind = "array"
+    def __init__(self, items):
+        self.items = items
+    def __eq__(self, other):
+        return isinstance(other, AvroArray) and other.items == self.items
+    def __hash__(self):
+        return hash(("array", self.items))
+    def toJson(self, memo):
+        return odict([("type", "array"), ("items", self.items.toJson(memo))])
+
+class AvroMap(AvroType):
+    kind = "map"
+    def __init__(self, values):
+        self.values = values
+    def __eq__(self, other):
+        return isinstance(other, AvroMap) and other.values == self.values
+    def __hash__(self):
+        return hash(("map", self.values))
+    def toJson(self, memo):
+        return odict([("type", "map"), ("values", self.values.toJson(memo))])
+
+class AvroNamed(AvroType):
+    # named types are identified by their fully-qualified names; in JSON, they are defined where
+    # they first appear (memo holds the names already defined) and referred to by name after that
+    def __eq__(self, other):
+        return isinstance(other, AvroNamed) and other.kind == self.kind and other.fullName == self.fullName
+    def __hash__(self):
+        return hash((self.kind, self.fullName))
+    def toJson(self, memo):
+        if self.fullName in memo:
+            return self.fullName
+        memo.add(self.fullName)
+        return self.definition(memo)
+
+class AvroRecord(AvroNamed):
+    kind = "record"
+    def __init__(self, fullName, fields):
+        self.fullName = fullName
+        self.fields = fields   # OrderedDict of field name -> type
+    def definition(self, memo):
+        return odict([("type", "record"), ("name", self.fullName), ("fields", [odict([("name", k), ("type", v.toJson(memo))]) for k, v in self.fields.items()])])
+
+class AvroEnum(AvroNamed):
+    kind = "enum"
+    def __init__(self, fullName, symbols):
+        self.fullName = fullName
+        self.symbols = symbols
+    def definition(self, memo):
+        return odict([("type", "enum"), ("name", self.fullName), ("symbols", self.symbols)])
+
+class AvroFixed(AvroNamed):
+    kind = "fixed"
+    def __init__(self, fullName, size):
+        self.fullName = fullName
+        self.size = size
+    def definition(self, memo):
+        return odict([("type", "fixed"), ("name", self.fullName), ("size", self.size)])
+
+class AvroUnion(AvroType):
+    kind = "union"
+    def __init__(self, types):
+        self.types = types
+    def __eq__(self, other):
+        return isinstance(other, AvroUnion) and set(other.types) == set(self.types)
+    def __hash__(self):
+        return hash(("union", frozenset(self.types)))
+    def toJson(self, memo):
+        return [x.toJson(memo) for x in self.types]
+
+class FunctionType(AvroType):
+    # the type of a function argument (fcndef or fcnref), which is not an Avro type
+    kind = "function"
+    def __init__(self, params, ret):
+        self.params = params
+        self.ret = ret
+    def __eq__(self, other):
+        return isinstance(other, FunctionType) and other.params == self.params and other.ret == self.ret
+    def __hash__(self):
+        return hash(("function", tuple(self.params), self.ret))
+    def toJson(self, memo):
+        return odict([("params", [x.toJson(memo) for x in self.params]), ("ret", self.ret.toJson(memo))])
+
+def parseType(x, names, namespace=None):
+    # an AvroType from Avro JSON; names (fully-qualified name -> type) is updated with the named
+    # types defined in x and used to look up those it refers to
+    if isinstance(x, basestring):
+        if x in primitiveNames:
+            return AvroPrimitive(x)
+        for name in ([namespace + "." + x] if namespace is not None and "." not in x else []) + [x]:
+            if name in names:
+                return names[name]
+        raise TypeCheckError("unknown type name " + json.dumps(x))
+
+    elif isinstance(x, list):
+        types = [parseType(t, names, namespace) for t in x]
+        if any(isinstance(t, AvroUnion) for t in types):
+            raise TypeCheckError("unions may not directly contain unions")
+        if len(set(types)) != len(types):
+            raise TypeCheckError("union has duplicate types: " + json.dumps(x))
+        return AvroUnion(types)
+
+    elif isinstance(x, dict) and x.get("type") in primitiveNames:
+        return AvroPrimitive(x["type"])
+
+    elif isinstance(x, dict) and x.get("type") == "array" and "items" in x:
+        return AvroArray(parseType(x["items"], names, namespace))
+
+    elif isinstance(x, dict) and x.get("type") == "map" and "values" in x:
+        return AvroMap(parseType(x["values"], names, namespace))
+
+    elif isinstance(x, dict) and x.get("type") in ("record", "enum", "fixed") and isinstance(x.get("name"), basestring):
+        namespace = x.get("namespace", namespace)
+        fullName = x["name"] if "." in x["name"] or namespace is None else namespace + "." + x["name"]
+        if fullName in names:
+            raise TypeCheckError("type name " + json.dumps(fullName) + " defined twice")
+        if x["type"] == "record":
+            if not isinstance(x.get("fields"), list):
+                raise TypeCheckError("record " + json.dumps(fullName) + " has no fields list")
+            out = names[fullName] = AvroRecord(fullName, odict())
+            for field in x["fields"]:
+                if not isinstance(field, dict) or not isinstance(field.get("name"), basestring) or "type" not in field:
+                    raise TypeCheckError("malformed field in record " + json.dumps(fullName))
+                out.fields[field["name"]] = parseType(field["type"], names, namespace)
+            return out
+        elif x["type"] == "enum":
+            if not isinstance(x.get("symbols"), list) or not all(isinstance(s, basestring) for s in x["symbols"]):
+                raise TypeCheckError("enum " + json.dumps(fullName) + " has no symbols list")
+            out = names[fullName] = AvroEnum(fullName, list(x["symbols"]))
+            return out
+        else:
+            if not isinstance(x.get("size"), (int, long)):
+                raise TypeCheckError("fixed " + json.dumps(fullName) + " has no size")
+            out = names[fullName] = AvroFixed(fullName, x["size"])
+            return out
+
+    else:
+        raise TypeCheckError("not a type: " + json.dumps(x))
+
+def accepts(expected, observed):
+    # whether a value of the observed type can be used where the expected type is
+    if expected is observed:
+        return True
+
+    if isinstance(observed, AvroUnion) and not isinstance(expected, AvroUnion):
+        return all(accepts(expected, t) for t in observed.types)
+
+    if isinstance(expected, AvroUnion):
+        if isinstance(observed, AvroUnion):
+            return all(any(accepts(e, t) for e in expected.types) for t in observed.types)
+        return any(accepts(e, observed) for e in expected.types)
+
+    if isinstance(expected, AvroPrimitive):
+        if not isinstance(observed, AvroPrimitive):
+            return False
+        if expected.name in numericRank and observed.name in numericRank:
+            return numericRank[observed.name] <= numericRank[expected.name]
+        return expected.name == observed.name
+
+    elif isinstance(expected, AvroArray):
+        return isinstance(observed, AvroArray) and accepts(expected.items, observed.items)
+
+    elif isinstance(expected, AvroMap):
+        return isinstance(observed, AvroMap) and accepts(expected.values, observed.values)
+
+    elif isinstance(expected, AvroRecord):
+        # within one document, a record's name identifies it
+        return isinstance(observed, AvroRecord) and observed.fullName == expected.fullName and \
+               (observed.fields is expected.fields or all(k in observed.fields and accepts(v, observed.fields[k]) for k, v in expected.fields.items()))
+
+    elif isinstance(expected, AvroEnum):
+        return isinstance(observed, AvroEnum) and observed.fullName == expected.fullName and set(observed.symbols) <= set(expected.symbols)
+
+    elif isinstance(expected, AvroFixed):
+        return isinstance(observed, AvroFixed) and observed.fullName == expected.fullName and observed.size == expected.size
+
+    elif isinstance(expected, FunctionType):
+        # parameters are contravariant, the return type covariant
+        return isinstance(observed, FunctionType) and len(observed.params) == len(expected.params) and \
+               all(accepts(o, e) for e, o in zip(expected.params, observed.params)) and accepts(expected.ret, observed.ret)
+
+    else:
+        return False
+
+def makeUnion(types):
+    # a union of the types (flattening unions), or the type itself if there is only one
+    out = []
+    for t in types:
+        for x in (t.types if isinstance(t, AvroUnion) else [t]):
+            if x not in out:
+                out.append(x)
+    if len(out) == 1:
+        return out[0]
+    return AvroUnion(out)
+
+def narrowestSupertype(types):
+    # the narrowest type that accepts all of the types, following the rules of the specification
+    first = types[0]
+    if all(t == first for t in types[1:]) and not isinstance(first, (AvroArray, AvroMap)):
+        return first
+
+    if all(isinstance(t, AvroPrimitive) and t.name in numericRank for t in types):
+        return max(types, key=lambda t: numericRank[t.name])
+
+    if all(isinstance(t, AvroArray) for t in types):
+        return AvroArray(narrowestSupertype([t.items for t in types]))
+
+    if all(isinstance(t, AvroMap) for t in types):
+        return AvroMap(narrowestSupertype([t.values for t in types]))
+
+    members = []
+    for t in types:
+        members.extend(t.types if isinstance(t, AvroUnion) else [t])
+    if any(isinstance(t, (AvroEnum, AvroFixed)) for t in members) and not all(t == first for t in types):
+        raise TypeCheckError("no common supertype of " + ", ".join(repr(t) for t in types))
+    if any(isinstance(t, FunctionType) for t in members):
+        raise TypeCheckError("functions are not values")
+
+    # a union, with the members that can be combined by the rules above combined
+    out = []
+    for kind in ("numeric", "array", "map"):
+        group = [t for t in members if (t.kind == kind if kind != "numeric" else t.kind in numericRank)]
+        if len(group) > 0:
+            out.append(narrowestSupertype(group))
+    for t in members:
+        if t.kind not in numericRank and t.kind not in ("array", "map") and t not in out:
+            out.append(t)
+    return makeUnion(out)
+
+# Matching a signature: labels are bound to the types observed where they appear (promoted to
+# their narrowest supertype), arguments that are functions are matched after the others, so that
+# the labels in their parameters are known, and the return type is the signature's return pattern
+# with the labels replaced.
+
+class LabelBinding(object):
+    def __init__(self):
+        self.observed = odict()   # label -> observed types
+        self.constraints = {}     # label -> allowed primitive names, or the kind of named type
+        self.enumsOfRecords = []  # (enum type, record label)
+
+    def copy(self):
+        out = LabelBinding()
+        out.observed = odict((k, list(v)) for k, v in self.observed.items())
+        out.constraints = dict(self.constraints)
+        out.enumsOfRecords = list(self.enumsOfRecords)
+        return out
+
+    def observe(self, label, t):
+        self.observed.setdefault(label, []).append(t)
+
+    def current(self, label):
+        # the type a label stands for so far, or None
+        if label not in self.observed:
+            return None
+        try:
+            return narrowestSupertype(self.observed[label])
+        except TypeCheckError:
+            return None
+
+    def resolved(self):
+        # label -> type, or None if the observations are inconsistent with the constraints
+        out = {}
+        for label, observed in self.observed.items():
+            try:
+                t = narrowestSupertype(observed)
+            except TypeCheckError:
+                return None
+            constraint = self.constraints.get(label)
+            if isinstance(constraint, tuple):
+                if not isinstance(t, AvroPrimitive) or t.name not in constraint:
+                    return None
+            elif constraint is not None and t.kind != constraint:
+                return None
+            out[label] = t
+        for enum, label in self.enumsOfRecords:
+            record = out.get(label)
+            if not isinstance(record, AvroRecord) or enum.symbols != list(record.fields.keys()):
+                return None
+        return out
+
+def matchPattern(pattern, t, binding):
+    # whether type t matches the pattern, recording label observations in binding
+    if isinstance(pattern, Primitive):
+        return accepts(AvroPrimitive(pattern.name), t)
+
+    elif isinstance(pattern, Any):
+        if len(pattern.of) > 0:
+            binding.constraints[pattern.label] = tuple(x.name for x in pattern.of)
+            if not any(accepts(AvroPrimitive(x.name), t) for x in pattern.of):
+                return False
+        binding.observe(pattern.label, t)
+        return True
+
+    elif isinstance(pattern, Ref):
+        binding.observe(pattern.label, t)
+        return True
+
+    elif isinstance(pattern, Array):
+        return isinstance(t, AvroArray) and matchPattern(pattern.items, t.items, binding)
+
+    elif isinstance(pattern, Map):
+        return isinstance(t, AvroMap) and matchPattern(pattern.values, t.values, binding)
+
+    elif isinstance(pattern, Record):
+        if not isinstance(t, AvroRecord):
+            return False
+        binding.constraints[pattern.label] = "record"
+        binding.observe(pattern.label, t)
+        for field in pattern.fields:
+            if field.name not in t.fields or not matchPattern(field.type, t.fields[field.name], binding):
+                return False
+        return True
+
+    elif isinstance(pattern, Enum):
+        if not isinstance(t, AvroEnum):
+            return False
+        binding.constraints[pattern.label] = "enum"
+        binding.observe(pattern.label, t)
+        if pattern.ofRecord is not None:
+            binding.enumsOfRecords.append((t, pattern.ofRecord))
+        return True
+
+    elif isinstance(pattern, Fixed):
+        if not isinstance(t, AvroFixed):
+            return False
+        binding.constraints[pattern.label] = "fixed"
+        binding.observe(pattern.label, t)
+        return True
+
+    elif isinstance(pattern, Union):
+        # each member of the observed union must match a definite member of the pattern (a
+        # concrete type or a label already bound) or else the one open label among them, which
+        # stands for the union of what is left
+        def isOpen(p):
+            return isinstance(p, Any) or (isinstance(p, Ref) and binding.current(p.label) is None)
+        open = [p for p in pattern.types if isOpen(p)]
+        definite = [p for p in pattern.types if not isOpen(p)]
+        leftover = []
+        for x in (t.types if isinstance(t, AvroUnion) else [t]):
+            for p in definite:
+                if isinstance(p, Ref):
+                    if accepts(binding.current(p.label), x):
+                        break
+                else:
+                    trial = binding.copy()
+                    if matchPattern(p, x, trial):
+                        binding.__dict__.update(trial.__dict__)
+                        break
+            else:
+                leftover.append(x)
+        if len(leftover) == 0:
+            return True
+        if len(open) != 1:
+            return False
+        return matchPattern(open[0], makeUnion(leftover), binding)
+
+    elif isinstance(pattern, Function):
+        return isinstance(t, FunctionType) and len(t.params) == len(pattern.parameters)
+
+    else:
+        return False
+
+def patternLabels(pattern, out):
+    if isinstance(pattern, (Any, Ref, Record, Enum, Fixed)):
+        out.add(pattern.label)
+    for x in [getattr(pattern, "items", None), getattr(pattern, "values", None), getattr(pattern, "ret", None)]:
+        if x is not None:
+            patternLabels(x, out)
+    for x in getattr(pattern, "types", None) or getattr(pattern, "parameters", None) or []:
+        patternLabels(x, out)
+    for x in getattr(pattern, "fields", None) or []:
+        patternLabels(x.type, out)
+    return out
+
+def instantiate(pattern, labels):
+    # the type a pattern stands for, given the types of its labels
+    if isinstance(pattern, Primitive):
+        return AvroPrimitive(pattern.name)
+    elif isinstance(pattern, (Any, Ref, Record, Enum, Fixed)):
+        return labels[pattern.label]
+    elif isinstance(pattern, Array):
+        return AvroArray(instantiate(pattern.items, labels))
+    elif isinstance(pattern, Map):
+        return AvroMap(instantiate(pattern.values, labels))
+    elif isinstance(pattern, Union):
+        return makeUnion([instantiate(x, labels) for x in pattern.types])
+    elif isinstance(pattern, Function):
+        return FunctionType([instantiate(x, labels) for x in pattern.parameters], instantiate(pattern.ret, labels))
+    else:
+        raise TypeCheckError("can't instantiate " + repr(pattern))
+
+def matchSignature(sig, args):
+    # the return type of a signature for arguments of the given types, or None if they don't match
+    if len(args) != len(sig.parameters):
+        return None
+    binding = LabelBinding()
+    functions = []
+    for par, t in zip(sig.parameters, args):
+        if not matchPattern(par.pattern, t, binding):
+            return None
+        if isinstance(par.pattern, Function):
+            functions.append((par.pattern, t))
+
+    for pattern, t in functions:
+        known = binding.resolved()
+        if known is None:
+            return None
+        for p, x in zip(pattern.parameters, t.params):
+            if patternLabels(p, set()).issubset(known):
+                # the function will be passed values of this type
+                if not accepts(x, instantiate(p, known)):
+                    return None
+            elif not matchPattern(p, x, binding):
+                return None
+        if not matchPattern(pattern.ret, t.ret, binding):
+            return None
+
+    labels = binding.resolved()
+    if labels is None:
+        return None
+    try:
+        return instantiate(sig.ret, labels)
+    except KeyError:
+        return None
+
+# The dispatch index: for each function, the signatures available in a version grouped by number of
+# parameters, each with the top-level kinds of type that could match each parameter (None for any),
+# so that only the plausible signatures are matched, in order; the first that matches is used.
+# Results are memoized by function and argument types.
+
+def patternKinds(pattern):
+    if isinstance(pattern, Primitive):
+        return frozenset([x for x in primitiveNames if accepts(AvroPrimitive(pattern.name), AvroPrimitive(x))] + ["union"])
+    elif isinstance(pattern, Any) and len(pattern.of) > 0:
+        return frozenset.union(*[patternKinds(x) for x in pattern.of])
+    elif isinstance(pattern, (Any, Ref)):
+        return None
+    elif isinstance(pattern, Array):
+        return frozenset(["array"])
+    elif isinstance(pattern, Map):
+        return frozenset(["map"])
+    elif isinstance(pattern, Record):
+        return frozenset(["record"])
+    elif isinstance(pattern, Enum):
+        return frozenset(["enum"])
+    elif isinstance(pattern, Fixed):
+        return frozenset(["fixed"])
+    elif isinstance(pattern, Function):
+        return frozenset(["function"])
+    elif isinstance(pattern, Union):
+        members = [patternKinds(x) for x in pattern.types]
+        if None in members:
+            return None
+        return frozenset.union(frozenset(["union"]), *members)
+    else:
+        return None
+
+class DispatchIndex(object):
+    def __init__(self, catalog, version=None):
+        if version is None:
+            version = catalog.version
+        self.byArity = {}   # function name -> {number of parameters -> [(signature number, signature, kinds)]}
+        for fcn in catalog:
+            arities = self.byArity[fcn.name] = {}
+            for i, sig in enumerate(fcn.signatures):
+                if sig.availableIn(version):
+                    arities.setdefault(len(sig.parameters), []).append((i, sig, [patternKinds(x.pattern) for x in sig.parameters]))
+        self.candidates = {}   # (function name, argument kinds) -> [(signature number, signature)]
+        self.results = {}      # (function name, argument types as JSON) -> (signature number, signature, return type) or None
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, name):
+        return name in self.byArity
+
+    def arities(self, name):
+        return sorted(self.byArity[name])
+
+    def resolve(self, name, args):
+        # (signature number, signature, return type) of the first signature of the function that
+        # matches arguments of the given types, or None if none does
+        memo = set()
+        key = (name, json.dumps([x.toJson(memo) for x in args]))
+        if key in self.results:
+            self.hits += 1
+            return self.results[key]
+        self.misses += 1
+
+        kinds = (name, tuple(x.kind for x in args))
+        candidates = self.candidates.get(kinds)
+        if candidates is None:
+            candidates = self.candidates[kinds] = [(i, sig) for i, sig, patterns in self.byArity[name].get(len(args), []) if all(p is None or k in p for p, k in zip(patterns, kinds[1]))]
+
+        out = None
+        for i, sig in candidates:
+            ret = matchSignature(sig, args)
+            if ret is not None:
+                out = (i, sig, ret)
+                break
+        self.results[key] = out
+        return out
+
+    def summary(self):
+        return "dispatch: %d resolved, %d reused" % (self.misses, self.hits)
+
+def avroFromGenerator(t, names):
+    # the AvroType of a concrete type from generateTestTemplate.Signature.resolve
+    from generateTestTemplate import Function as GeneratedFunction
+    if isinstance(t, GeneratedFunction):
+        return FunctionType([avroFromGenerator(x, names) for x in t.parameters], avroFromGenerator(t.ret, names))
+    return parseType(json.loads(json.dumps(t)), names)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Check the dispatch index against the concrete signatures that generateTestTemplate.py enumerates from ../libfcns.xml: each must resolve to its own return type.")
+    parser.add_argument("--function", action="append", help="only check functions with this name (may be repeated)")
+    parser.add_argument("--verbose", action="store_true", help="print every concrete signature checked")
+    args = parser.parse_args()
+
+    import generateTestTemplate
+    catalog = loadCatalog("../libfcns.xml")
+    index = DispatchIndex(catalog)
+
+    numChecked = 0
+    numNarrower = 0
+    failures = []
+    for fcn in catalog:
+        if args.function and fcn.name not in args.function:
+            continue
+        for sig in fcn.signatures:
+            if not sig.availableIn(catalog.version):
+                continue
+            for nameLookup, types, output in generateTestTemplate.Signature(sig).concreteSignatures():
+                names = {}
+                argTypes = [avroFromGenerator(t, names) for t in types.values()]
+                expected = avroFromGenerator(output, names)
+                result = index.resolve(fcn.name, argTypes)
+                numChecked += 1
+                if result is None:
+                    failures.append((fcn.name, argTypes, expected, "no signature matches"))
+                elif result[2] != expected and accepts(expected, result[2]):
+                    # the generator assigns a union with null to a label that the pattern takes
+                    # out of a union with null, such as B in union of {B, null}
+                    numNarrower += 1
+                    if args.verbose:
+                        print "%-30s %r -> %r (narrower than %r)" % (fcn.name, argTypes, result[2], expected)
+                elif result[2] != expected:
+                    failures.append((fcn.name, argTypes, expected, "returns %r (signature %d)" % (result[2], result[0])))
+                elif args.verbose:
+                    print "%-30s %r -> %r" % (fcn.name, argTypes, result[2])
+
+    for name, argTypes, expected, message in failures:
+        print "%-30s %r -> %r: %s" % (name, argTypes, expected, message)
+    print >>sys.stderr, "%d functions, %d concrete signatures checked, %d failures (%d resolved to a narrower type than the generator's); %s" % (len(catalog), numChecked, len(failures), numNarrower, index.summary())
+    if len(failures) > 0:
+        sys.exit(1)
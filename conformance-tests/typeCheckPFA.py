@@ -0,0 +1,1160 @@
+#!/usr/bin/env python
+
+import base64
+import gzip
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+from signatureCatalog import Function, loadCatalog, versionNumbers
+from signatureDispatch import TypeCheckError, AvroType, AvroPrimitive, AvroArray, AvroMap, AvroRecord, AvroEnum, AvroFixed, AvroUnion, FunctionType, \
+                              parseType, accepts, makeUnion, narrowestSupertype, patternLabels, instantiate, matchSignature, DispatchIndex
+
+# A static type checker for PFA documents: the semantic checks that an engine build performs
+# (symbol scopes, cells, pools, user functions, special forms and library calls) without building
+# an engine.  Library calls are resolved against the signatures of libfcns.xml by the dispatch index
+# of signatureDispatch.py.  A document is rejected at its first error, which is reported with the
+# path to the offending expression.
+#
+# The type of a subtree that doesn't declare symbols in its enclosing scope or define named types
+# depends only on its text and on the types of the symbols, cells, pools, functions and named types
+# it could refer to; it is cached under those, for the rest of the run, so that documents generated
+# from the same parts check their common subtrees once per worker process.
+
+null = AvroPrimitive("null")
+boolean = AvroPrimitive("boolean")
+intType = AvroPrimitive("int")
+longType = AvroPrimitive("long")
+floatType = AvroPrimitive("float")
+doubleType = AvroPrimitive("double")
+stringType = AvroPrimitive("string")
+bytesType = AvroPrimitive("bytes")
+
+class BottomType(AvroType):
+    # the type of the "error" special form, which never returns: it is dropped from the
+    # alternatives of a branching form and is null anywhere else
+    kind = "bottom"
+    def __eq__(self, other):
+        return isinstance(other, BottomType)
+    def __hash__(self):
+        return hash("bottom")
+    def toJson(self, memo):
+        return "bottom"
+
+bottom = BottomType()
+
+def value(t):
+    return null if t is bottom else t
+
+def branches(types):
+    # the type of a form that returns one of several alternatives
+    returning = [t for t in types if t is not bottom]
+    if len(returning) == 0:
+        return bottom
+    return narrowestSupertype(returning)
+
+def typeKey(t, seen):
+    # a hashable canonical form of a type, in which named types are spelled out where they first
+    # appear, like their JSON
+    if isinstance(t, AvroPrimitive):
+        return t.name
+    elif isinstance(t, AvroArray):
+        return ("array", typeKey(t.items, seen))
+    elif isinstance(t, AvroMap):
+        return ("map", typeKey(t.values, seen))
+    elif isinstance(t, (AvroRecord, AvroEnum, AvroFixed)):
+        if t.fullName in seen:
+            return (t.kind, t.fullName)
+        seen.add(t.fullName)
+        if isinstance(t, AvroRecord):
+            return ("record", t.fullName, tuple((k, typeKey(v, seen)) for k, v in t.fields.items()))
+        elif isinstance(t, AvroEnum):
+            return ("enum", t.fullName, tuple(t.symbols))
+        else:
+            return ("fixed", t.fullName, t.size)
+    elif isinstance(t, AvroUnion):
+        return ("union",) + tuple(typeKey(x, seen) for x in t.types)
+    elif isinstance(t, FunctionType):
+        return ("function", tuple(typeKey(x, seen) for x in t.params), typeKey(t.ret, seen))
+    else:
+        return t.kind
+
+def located(err, *where):
+    err.path = list(where) + getattr(err, "path", [])
+    return err
+
+def errorMessage(err):
+    path = getattr(err, "path", [])
+    if len(path) == 0:
+        return str(err)
+    return "/".join(str(x) for x in path) + ": " + str(err)
+
+def withoutLocators(x):
+    # locator marks ("@" members) may appear in any JSON object of a document
+    if isinstance(x, dict):
+        return dict((k, withoutLocators(v)) for k, v in x.items() if k != "@")
+    elif isinstance(x, list):
+        return [withoutLocators(v) for v in x]
+    else:
+        return x
+
+symbolName = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# the text of a subtree that the cache is keyed by, and the strings (keys and values) in it; keys
+# aren't sorted, which would take the encoder out of C, so equal subtrees whose keys come out in a
+# different order are merely cached twice
+canonical = json.JSONEncoder(separators=(",", ":")).encode
+quoted = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+topLevelFields = set(["name", "method", "input", "output", "begin", "action", "end", "fcns", "zero", "merge", "cells", "pools", "randseed", "doc", "version", "metadata", "options"])
+
+# the top-level fields that need no more than a check of their JSON
+simpleFields = [("name", "a string", lambda x: isinstance(x, basestring)),
+                ("doc", "a string", lambda x: isinstance(x, basestring)),
+                ("randseed", "an integer", lambda x: isinstance(x, (int, long)) and not isinstance(x, bool)),
+                ("version", "an integer", lambda x: isinstance(x, (int, long)) and not isinstance(x, bool)),
+                ("metadata", "an object of strings", lambda x: isinstance(x, dict) and all(isinstance(v, basestring) for v in x.values())),
+                ("options", "an object", lambda x: isinstance(x, dict)),
+                ("cells", "an object", lambda x: isinstance(x, dict)),
+                ("pools", "an object", lambda x: isinstance(x, dict)),
+                ("fcns", "an object", lambda x: isinstance(x, dict))]
+
+def conforms(t, x):
+    # whether embedded JSON data x is a value of type t
+    if isinstance(t, AvroPrimitive):
+        if t.name == "null":
+            return x is None
+        elif t.name == "boolean":
+            return isinstance(x, bool)
+        elif t.name == "int":
+            return isinstance(x, (int, long)) and not isinstance(x, bool) and -2147483648 <= x <= 2147483647
+        elif t.name == "long":
+            return isinstance(x, (int, long)) and not isinstance(x, bool) and -9223372036854775808 <= x <= 9223372036854775807
+        elif t.name in ("float", "double"):
+            return isinstance(x, (int, long, float)) and not isinstance(x, bool)
+        else:
+            return isinstance(x, basestring)
+    elif isinstance(t, AvroArray):
+        return isinstance(x, list) and all(conforms(t.items, v) for v in x)
+    elif isinstance(t, AvroMap):
+        return isinstance(x, dict) and all(conforms(t.values, v) for v in x.values())
+    elif isinstance(t, AvroRecord):
+        return isinstance(x, dict) and set(x) == set(t.fields) and all(conforms(v, x[k]) for k, v in t.fields.items())
+    elif isinstance(t, AvroEnum):
+        return x in t.symbols
+    elif isinstance(t, AvroFixed):
+        return isinstance(x, basestring) and len(x) == t.size
+    elif isinstance(t, AvroUnion):
+        if x is None:
+            return null in t.types
+        if not isinstance(x, dict) or len(x) != 1:
+            return False
+        tag, v = x.items()[0]
+        for member in t.types:
+            if tag == member.kind or (isinstance(member, (AvroRecord, AvroEnum, AvroFixed)) and tag in (member.fullName, member.fullName.split(".")[-1])):
+                return conforms(member, v)
+        return False
+    else:
+        return False
+
+# format specifiers of "unpack" and "pack", with the types of the values they stand for
+endianness = r"(<|>|!|little|big|network)?"
+formatTypes = [(re.compile(r"^\s*" + pattern + r"\s*$"), t) for pattern, t in [
+    (r"pad", null),
+    (r"boolean", boolean),
+    (r"(byte|int8)", intType),
+    (r"unsigned\s*(byte|int8)", intType),
+    (endianness + r"\s*(short|int16)", intType),
+    (endianness + r"\s*(unsigned\s*short|unsigned\s*int16)", intType),
+    (endianness + r"\s*(int|int32)", intType),
+    (endianness + r"\s*(unsigned\s*int|unsigned\s*int32)", longType),
+    (endianness + r"\s*(long|long\s+long|int64)", longType),
+    (endianness + r"\s*(unsigned\s*long|unsigned\s*long\s+long|unsigned\s*int64)", doubleType),
+    (endianness + r"\s*(float|float32)", floatType),
+    (endianness + r"\s*(double|float64)", doubleType),
+    (r"raw\s*[0-9]+", bytesType),
+    (r"null\s*terminated", bytesType),
+    (r"length\s*prefixed", bytesType)]]
+packOnlyFormat = re.compile(r"^\s*raw\s*$")
+
+def formatType(spec, pack):
+    if isinstance(spec, basestring):
+        if pack and packOnlyFormat.match(spec):
+            return bytesType
+        for regex, t in formatTypes:
+            if regex.match(spec):
+                return t
+    raise TypeCheckError("unrecognized format specifier " + json.dumps(spec))
+
+def literalString(x):
+    # the string of a string literal, ["..."] or {"string": "..."}, or None
+    if isinstance(x, list) and len(x) == 1 and isinstance(x[0], basestring):
+        return x[0]
+    elif isinstance(x, dict) and len(x) == 1 and isinstance(x.get("string"), basestring):
+        return x["string"]
+    return None
+
+def typeDeclarations(x, where, out):
+    # appends (path, Avro JSON) of the types declared in expressions to out: the parameters and
+    # return types of "fcndef", the "type" of "new" and of literals and the "as" of "upcast" and
+    # "cast"
+    if isinstance(x, dict):
+        skip = ()
+        if "params" in x and "ret" in x and isinstance(x["params"], list):
+            for i, par in enumerate(x["params"]):
+                if isinstance(par, dict) and len(par) == 1:
+                    out.append((where + ("params", i), par.values()[0]))
+            out.append((where + ("ret",), x["ret"]))
+            skip = ("params", "ret")
+        if "type" in x and ("value" in x or "new" in x):
+            out.append((where + ("type",), x["type"]))
+            skip += ("type", "value")
+        if "as" in x and ("upcast" in x or "named" in x):
+            out.append((where + ("as",), x["as"]))
+            skip += ("as",)
+        for k, v in x.iteritems():
+            if k not in skip and isinstance(v, (dict, list)):
+                typeDeclarations(v, where + (k,), out)
+    elif isinstance(x, list):
+        for i, v in enumerate(x):
+            if isinstance(v, (dict, list)):
+                typeDeclarations(v, where + (i,), out)
+
+def isFunctionForm(x):
+    return isinstance(x, dict) and ("fcn" in x or "params" in x)
+
+class Scope(object):
+    # the symbols declared in a block: a sealedAbove scope can't modify the symbols of the scopes
+    # around it and a sealedWithin scope can't declare any
+    def __init__(self, parent, sealedAbove, sealedWithin, symbols=None):
+        self.parent = parent
+        self.sealedAbove = sealedAbove
+        self.sealedWithin = sealedWithin
+        self.symbols = {} if symbols is None else symbols
+
+    def child(self, sealedAbove=False, sealedWithin=False):
+        return Scope(self, sealedAbove, sealedWithin)
+
+    def sealed(self):
+        return Scope(self, True, True)
+
+    def lookup(self, name):
+        # (type, whether it can be modified here), or None
+        writable = True
+        scope = self
+        while scope is not None:
+            if name in scope.symbols:
+                return scope.symbols[name], writable
+            if scope.sealedAbove:
+                writable = False
+            scope = scope.parent
+        return None
+
+    def declare(self, name, t):
+        if self.sealedWithin:
+            raise TypeCheckError("can't declare symbol " + json.dumps(name) + " here (wrap it in a \"do\")")
+        if not isinstance(name, basestring) or not symbolName.match(name):
+            raise TypeCheckError("invalid symbol name " + json.dumps(name))
+        if self.lookup(name) is not None:
+            raise TypeCheckError("symbol " + json.dumps(name) + " is already declared (symbols may not be shadowed)")
+        self.symbols[name] = t
+
+def expect(condition, message):
+    if not condition:
+        raise TypeCheckError(message)
+
+# special forms by the member that identifies them, in order of precedence (a "for" has a "while"
+# and a "do", for instance): method name, required members and optional members
+specialForms = [
+    ("int", "literalInt", [], []),
+    ("long", "literalLong", [], []),
+    ("float", "literalFloat", [], []),
+    ("double", "literalDouble", [], []),
+    ("string", "literalString", [], []),
+    ("base64", "literalBase64", [], []),
+    ("value", "literalValue", ["type"], []),
+    ("new", "newForm", ["type"], []),
+    ("let", "letForm", [], []),
+    ("set", "setForm", [], []),
+    ("for", "forForm", ["while", "step", "do"], []),
+    ("foreach", "foreachForm", ["in", "do"], ["seq"]),
+    ("forkey", "forkeyForm", ["forval", "in", "do"], []),
+    ("while", "whileForm", ["do"], []),
+    ("until", "doUntilForm", ["do"], []),
+    ("cond", "condForm", [], ["else"]),
+    ("if", "ifForm", ["then"], ["else"]),
+    ("cast", "castForm", ["cases"], ["partial"]),
+    ("upcast", "upcastForm", ["as"], []),
+    ("ifnotnull", "ifnotnullForm", ["then"], ["else"]),
+    ("unpack", "unpackForm", ["format", "then"], ["else"]),
+    ("pack", "packForm", [], []),
+    ("attr", "attrForm", ["path"], ["to"]),
+    ("cell", "cellForm", [], ["path", "to"]),
+    ("pool", "poolForm", [], ["path", "to", "init", "del"]),
+    ("call", "callForm", ["args"], []),
+    ("doc", "docForm", [], []),
+    ("error", "errorForm", [], ["code"]),
+    ("try", "tryForm", [], ["filter"]),
+    ("log", "logForm", [], ["namespace"]),
+    ("fcn", "misplacedFunction", [], ["fill"]),
+    ("params", "misplacedFunction", ["ret", "do"], []),
+    ("do", "doForm", [], [])]
+
+class TypeChecker(object):
+    def __init__(self, catalog, version=None, cacheSize=100000):
+        self.catalog = catalog
+        self.version = catalog.version if version is None else version
+        self.index = DispatchIndex(catalog, self.version)
+        self.cache = {}
+        self.cacheSize = cacheSize
+        self.structures = {}    # canonical text of a subtree -> (number, strings)
+        self.typeNumbers = {}   # typeKey -> number
+        self.counter = itertools.count()   # numbers are never reused, even after the cache is cleared
+        self.hits = 0
+        self.lookups = 0
+
+    # per-document state
+
+    def checkDocument(self, doc):
+        # raises TypeCheckError at the first problem in the document
+        self.names = {}
+        self.declared = {}      # id of the JSON of a declared type -> type
+        self.numbered = {}      # id of a type -> (type, number)
+        expect(isinstance(doc, dict), "a PFA document must be a JSON object")
+        unknown = sorted(set(doc) - topLevelFields)
+        if len(unknown) > 0:
+            raise TypeCheckError("unrecognized top-level fields: " + ", ".join(unknown))
+        for field in ("input", "output", "action"):
+            if field not in doc:
+                raise TypeCheckError("missing top-level field " + json.dumps(field))
+        self.method = doc.get("method", "map")
+        expect(self.method in ("map", "emit", "fold"), "method must be \"map\", \"emit\" or \"fold\"")
+        if self.method == "fold":
+            expect("zero" in doc and "merge" in doc, "a \"fold\" engine must have \"zero\" and \"merge\"")
+        else:
+            expect("zero" not in doc and "merge" not in doc, "only a \"fold\" engine may have \"zero\" and \"merge\"")
+        for field, kind, check in simpleFields:
+            if field in doc and not check(doc[field]):
+                raise TypeCheckError(json.dumps(field) + " must be " + kind)
+
+        # all declared types first, since a named type may be defined in any of them and used in
+        # any other
+        cells = doc.get("cells", {})
+        pools = doc.get("pools", {})
+        fcns = doc.get("fcns", {})
+        declarations = [(("input",), doc["input"]), (("output",), doc["output"])]
+        for field, specs in (("cells", cells), ("pools", pools)):
+            for name, spec in sorted(specs.items()):
+                try:
+                    expect(symbolName.match(name), "invalid name")
+                    expect(isinstance(spec, dict) and "type" in spec, "no type")
+                    allowed = set(["type", "init", "shared", "rollback", "source"])
+                    if not (set(spec) <= allowed):
+                        raise TypeCheckError("unrecognized members " + ", ".join(sorted(set(spec) - allowed)))
+                    expect(field == "pools" or "init" in spec, "no init")
+                    expect(not (spec.get("shared", False) and spec.get("rollback", False)), "can't be both shared and rolled back")
+                    expect(spec.get("source", "embedded") in ("embedded", "json", "avro"), "source must be \"embedded\", \"json\" or \"avro\"")
+                except TypeCheckError as err:
+                    raise located(err, field, name)
+                declarations.append(((field, name, "type"), spec["type"]))
+        params = {}
+        for name, fcn in sorted(fcns.items()):
+            try:
+                expect(symbolName.match(name), "invalid function name")
+                params[name] = self.parameters(fcn)
+            except TypeCheckError as err:
+                raise located(err, "fcns", name)
+            declarations.extend((("fcns", name, "params", i), t) for i, (n, t) in enumerate(params[name]))
+            declarations.append((("fcns", name, "ret"), fcn["ret"]))
+            typeDeclarations(fcn["do"], ("fcns", name, "do"), declarations)
+        for field in ("begin", "action", "end", "merge"):
+            if field in doc:
+                typeDeclarations(doc[field], (field,), declarations)
+        types = self.declareTypes(declarations)
+        self.input = types[("input",)]
+        self.output = types[("output",)]
+
+        self.cells = dict((name, types[("cells", name, "type")]) for name in cells)
+        self.pools = dict((name, types[("pools", name, "type")]) for name in pools)
+        self.fcns = {}
+        for name, fcn in fcns.items():
+            self.fcns["u." + name] = ([n for n, t in params[name]], FunctionType([types[("fcns", name, "params", i)] for i in xrange(len(params[name]))], types[("fcns", name, "ret")]))
+        if self.method == "emit":
+            self.fcns["emit"] = (["x"], FunctionType([self.output], null))
+
+        # embedded data
+        if "zero" in doc:
+            if not conforms(self.output, doc["zero"]):
+                raise TypeCheckError("\"zero\" does not have the output type " + repr(self.output))
+        for field, specs in (("cells", cells), ("pools", pools)):
+            for name, spec in specs.items():
+                if spec.get("source", "embedded") == "embedded" and "init" in spec:
+                    t = self.cells[name] if field == "cells" else AvroMap(self.pools[name])
+                    if not conforms(t, spec["init"]):
+                        raise located(TypeCheckError("init does not have type " + repr(t)), field, name)
+
+        # function bodies and methods
+        for name, fcn in sorted(fcns.items()):
+            try:
+                paramNames, fcnType = self.fcns["u." + name]
+                self.functionBody(fcn, paramNames, fcnType, Scope(None, True, True))
+            except TypeCheckError as err:
+                raise located(err, "fcns", name)
+
+        common = {"name": stringType, "instance": intType, "metadata": AvroMap(stringType)}
+        if "version" in doc:
+            common["version"] = intType
+        counters = {"actionsStarted": longType, "actionsFinished": longType}
+        tally = {"tally": self.output} if self.method == "fold" else {}
+
+        if "begin" in doc:
+            self.phase("begin", doc["begin"], common)
+        actionType = self.phase("action", doc["action"], dict(common, input=self.input, **dict(counters, **tally)), empty=False)
+        if self.method in ("map", "fold") and actionType is not bottom and not accepts(self.output, actionType):
+            raise located(TypeCheckError("action returns " + repr(actionType) + ", not the output type " + repr(self.output)), "action")
+        if "end" in doc:
+            self.phase("end", doc["end"], dict(common, **dict(counters, **tally)))
+        if "merge" in doc:
+            mergeType = self.phase("merge", doc["merge"], {"tallyOne": self.output, "tallyTwo": self.output}, empty=False)
+            if mergeType is not bottom and not accepts(self.output, mergeType):
+                raise located(TypeCheckError("merge returns " + repr(mergeType) + ", not the output type " + repr(self.output)), "merge")
+
+    def phase(self, field, body, predefined, empty=True):
+        # the predefined symbols can't be modified
+        if not empty and body == []:
+            raise TypeCheckError(json.dumps(field) + " must not be empty")
+        scope = Scope(Scope(None, True, True, predefined), True, False)
+        if body == []:
+            return null
+        return self.block(body, scope, field)
+
+    def declareTypes(self, declarations):
+        # (path -> type) for the (path, Avro JSON) declarations, which may refer to the named types
+        # defined in each other in any order
+        out = {}
+        pending = declarations
+        while len(pending) > 0:
+            deferred = []
+            for where, x in pending:
+                trial = dict(self.names)
+                try:
+                    out[where] = self.declared[id(x)] = parseType(x, trial)
+                    self.names = trial
+                except TypeCheckError as err:
+                    deferred.append((where, x, err))
+            if len(deferred) == len(pending):
+                where, x, err = deferred[0]
+                raise located(err, *where)
+            pending = [(where, x) for where, x, err in deferred]
+        return out
+
+    def parse(self, x):
+        out = self.declared.get(id(x))
+        if out is None:
+            out = parseType(x, self.names)
+        return out
+
+    # functions
+
+    def parameters(self, fcn):
+        # [(name, Avro JSON)] of a "fcndef"
+        expect(isinstance(fcn, dict) and set(fcn) == set(["params", "ret", "do"]), "a function definition must have exactly \"params\", \"ret\" and \"do\"")
+        expect(isinstance(fcn["params"], list), "\"params\" must be a JSON array")
+        out = []
+        for par in fcn["params"]:
+            expect(isinstance(par, dict) and len(par) == 1, "each parameter must be a single-member JSON object")
+            name, t = par.items()[0]
+            if not symbolName.match(name):
+                raise TypeCheckError("invalid parameter name " + json.dumps(name))
+            out.append((name, t))
+        expect(len(set(n for n, t in out)) == len(out), "duplicate parameter names")
+        return out
+
+    def functionBody(self, fcn, paramNames, fcnType, scope):
+        # the body can read but not modify the symbols around the definition
+        expect(fcn["do"] != [], "a function body must not be empty")
+        body = scope.child(sealedAbove=True)
+        for n, t in zip(paramNames, fcnType.params):
+            body.declare(n, t)
+        result = self.block(fcn["do"], body, "do")
+        if result is not bottom and not accepts(fcnType.ret, result):
+            raise TypeCheckError("function returns " + repr(result) + ", not its declared " + repr(fcnType.ret))
+
+    def functionArgument(self, x, scope):
+        # the FunctionType of a "fcndef" or "fcnref" passed as an argument
+        if "params" in x:
+            params = self.parameters(x)
+            fcnType = FunctionType([self.parse(t) for n, t in params], self.parse(x["ret"]))
+            self.functionBody(x, [n for n, t in params], fcnType, scope)
+            return fcnType
+
+        expect(set(x) <= set(["fcn", "fill"]), "a function reference must have only \"fcn\" and \"fill\"")
+        name = x["fcn"]
+        fill = x.get("fill", {})
+        expect(isinstance(name, basestring), "\"fcn\" must be a function name")
+        expect(isinstance(fill, dict), "\"fill\" must be a JSON object")
+        filled = {}
+        for n, arg in fill.items():
+            try:
+                filled[n] = self.functionArgument(arg, scope) if isFunctionForm(arg) else value(self.expression(arg, scope.sealed()))
+            except TypeCheckError as err:
+                raise located(err, "fill", n)
+
+        if name in self.fcns:
+            paramNames, fcnType = self.fcns[name]
+            if not (set(filled) <= set(paramNames)):
+                raise TypeCheckError("unknown parameters of " + name + " in \"fill\": " + ", ".join(sorted(set(filled) - set(paramNames))))
+            for n, t in zip(paramNames, fcnType.params):
+                if n in filled and not accepts(t, filled[n]):
+                    raise located(TypeCheckError("parameter " + n + " of " + name + " is " + repr(t) + ", not " + repr(filled[n])), "fill", n)
+            return FunctionType([t for n, t in zip(paramNames, fcnType.params) if n not in filled], fcnType.ret)
+
+        if name not in self.catalog:
+            raise TypeCheckError("unknown function " + json.dumps(name))
+        signatures = [sig for sig in self.catalog[name].signatures if sig.availableIn(self.version)]
+        if len(signatures) != 1:
+            raise TypeCheckError("only functions with a single signature can be referenced, not " + name)
+        sig = signatures[0]
+        if not (set(filled) <= set(par.name for par in sig.parameters)):
+            raise TypeCheckError("unknown parameters of " + name + " in \"fill\": " + ", ".join(sorted(set(filled) - set(par.name for par in sig.parameters))))
+        args = []
+        remaining = []
+        for par in sig.parameters:
+            if par.name in filled:
+                args.append(filled[par.name])
+            else:
+                if isinstance(par.pattern, Function) or len(patternLabels(par.pattern, set())) > 0:
+                    raise TypeCheckError("generic or function parameter " + par.name + " of " + name + " must be filled")
+                remaining.append(instantiate(par.pattern, {}))
+                args.append(remaining[-1])
+        ret = matchSignature(sig, args)
+        if ret is None:
+            raise TypeCheckError("\"fill\" does not match the signature of " + name)
+        return FunctionType(remaining, ret)
+
+    def misplacedFunction(self, x, scope):
+        raise TypeCheckError("functions can only be passed as arguments")
+
+    # expressions
+
+    def block(self, x, scope, *where):
+        # an expression or a JSON array of expressions, checked in the given scope; its type is
+        # that of the last
+        if isinstance(x, list):
+            if len(x) == 0:
+                raise located(TypeCheckError("empty JSON array of expressions"), *where)
+            for i, expr in enumerate(x):
+                out = self.check(expr, scope, *(where + (i,)))
+            return out
+        return self.check(x, scope, *where)
+
+    def check(self, x, scope, *where):
+        try:
+            return self.expression(x, scope)
+        except TypeCheckError as err:
+            raise located(err, *where)
+
+    def expression(self, x, scope):
+        if isinstance(x, dict):
+            if "let" in x or self.cacheSize == 0:
+                return self.form(x, scope)
+            key = self.cacheKey(x, scope)
+            self.lookups += 1
+            out = self.cache.get(key)
+            if out is not None:
+                self.hits += 1
+                return out
+            numNames = len(self.names)
+            out = self.form(x, scope)
+            if len(self.names) == numNames:
+                if len(self.cache) >= self.cacheSize:
+                    self.cache.clear()
+                    self.structures.clear()
+                    self.typeNumbers.clear()
+                self.cache[key] = out
+            return out
+        elif isinstance(x, basestring):
+            return self.symbol(x, scope)
+        elif x is None:
+            return null
+        elif isinstance(x, bool):
+            return boolean
+        elif isinstance(x, (int, long)):
+            if -2147483648 <= x <= 2147483647:
+                return intType
+            expect(-9223372036854775808 <= x <= 9223372036854775807, "integer literal is too large for a long")
+            return longType
+        elif isinstance(x, float):
+            return doubleType
+        elif literalString(x) is not None:
+            return stringType
+        else:
+            raise TypeCheckError("expected an expression, not " + json.dumps(x))
+
+    def form(self, x, scope):
+        keys = set(x)
+        for head, method, required, optional in specialForms:
+            if head in keys:
+                missing = [k for k in required if k not in keys]
+                if len(missing) > 0:
+                    raise TypeCheckError(json.dumps(head) + " form requires " + ", ".join(json.dumps(k) for k in missing))
+                extra = keys.difference([head], required, optional)
+                if len(extra) > 0:
+                    raise TypeCheckError(json.dumps(head) + " form does not have " + ", ".join(json.dumps(k) for k in sorted(extra)))
+                return getattr(self, method)(x, scope)
+        if len(x) != 1:
+            raise TypeCheckError("unrecognized special form with members " + ", ".join(json.dumps(k) for k in sorted(keys)))
+        name, args = x.items()[0]
+        return self.functionCall(name, args if isinstance(args, list) else [args], scope)
+
+    def symbol(self, name, scope):
+        # a dotted name is a shortcut for "attr" with a path of literals
+        if "." in name:
+            parts = name.split(".")
+            try:
+                return self.walk(self.symbol(parts[0], scope), parts[1:], scope, literal=True)
+            except TypeCheckError as err:
+                raise located(err, name)
+        found = scope.lookup(name)
+        if found is None:
+            raise TypeCheckError("unknown symbol " + json.dumps(name))
+        return found[0]
+
+    def walk(self, t, path, scope, literal=False):
+        # the type at the end of an "attr", "cell" or "pool" path, whose indexes are expressions
+        # (or literal strings for the shortcut)
+        for i, index in enumerate(path):
+            if isinstance(t, AvroArray):
+                if literal:
+                    if not index.isdigit():
+                        raise TypeCheckError("array index " + json.dumps(index) + " must be an integer")
+                else:
+                    expect(self.check(index, scope.sealed(), "path", i) == intType, "array index must be an int")
+                t = t.items
+            elif isinstance(t, AvroMap):
+                if not literal:
+                    expect(self.check(index, scope.sealed(), "path", i) == stringType, "map key must be a string")
+                t = t.values
+            elif isinstance(t, AvroRecord):
+                field = index if literal else literalString(index)
+                expect(field is not None, "record field must be a literal string")
+                if field not in t.fields:
+                    raise TypeCheckError("record " + t.fullName + " has no field " + json.dumps(field))
+                t = t.fields[field]
+            else:
+                raise TypeCheckError("can't extract from " + repr(t))
+        return t
+
+    def updater(self, to, t, scope):
+        # the "to" of "attr", "cell" and "pool": a value of type t or a function from t to t
+        try:
+            if isFunctionForm(to):
+                f = self.functionArgument(to, scope)
+                if not (len(f.params) == 1 and accepts(f.params[0], t) and accepts(t, f.ret)):
+                    raise TypeCheckError("\"to\" function must take and return " + repr(t) + ", not " + repr(f))
+            else:
+                v = value(self.expression(to, scope.sealed()))
+                if not accepts(t, v):
+                    raise TypeCheckError("\"to\" must be " + repr(t) + ", not " + repr(v))
+        except TypeCheckError as err:
+            raise located(err, "to")
+
+    def functionCall(self, name, args, scope):
+        types = []
+        for i, arg in enumerate(args):
+            try:
+                types.append(self.functionArgument(arg, scope) if isFunctionForm(arg) else value(self.expression(arg, scope.sealed())))
+            except TypeCheckError as err:
+                raise located(err, name, i)
+
+        if name in self.fcns:
+            paramNames, fcnType = self.fcns[name]
+            if len(types) != len(fcnType.params):
+                raise TypeCheckError(name + " takes %d arguments, not %d" % (len(fcnType.params), len(types)))
+            for i, (p, t) in enumerate(zip(fcnType.params, types)):
+                if not accepts(p, t):
+                    raise located(TypeCheckError("argument must be " + repr(p) + ", not " + repr(t)), name, i)
+            return fcnType.ret
+
+        if name not in self.index:
+            raise TypeCheckError("unknown function " + json.dumps(name))
+        result = self.index.resolve(name, types)
+        if result is None:
+            raise located(TypeCheckError("no signature of " + name + " accepts (" + ", ".join(repr(t) for t in types) + ")"), name)
+        return result[2]
+
+    # caching: subtrees are hash-consed into structure numbers, each with the strings in it; the key
+    # of a subtree is its structure and the types of everything named by one of its strings that is
+    # a symbol, cell, pool, function or named type (a superset of what it refers to)
+
+    def structure(self, x):
+        # (number, sorted strings) of a JSON array or object, by its text
+        text = canonical(x)
+        out = self.structures.get(text)
+        if out is None:
+            strings = set()
+            for s in quoted.findall(text):
+                strings.add(s)
+                if "." in s:
+                    strings.add(s[:s.index(".")])
+            out = self.structures[text] = (next(self.counter), tuple(sorted(strings)))
+        return out
+
+    def number(self, t):
+        found = self.numbered.get(id(t))
+        if found is None:
+            key = typeKey(t, set())
+            number = self.typeNumbers.get(key)
+            if number is None:
+                number = self.typeNumbers[key] = next(self.counter)
+            found = self.numbered[id(t)] = (t, number)
+        return found[1]
+
+    def cacheKey(self, x, scope):
+        number, strings = self.structure(x)
+        context = []
+        for s in strings:
+            symbol = scope.lookup(s)
+            if symbol is not None:
+                context.append((s, "symbol", self.number(symbol[0]), symbol[1]))
+            if s in self.cells:
+                context.append((s, "cell", self.number(self.cells[s])))
+            if s in self.pools:
+                context.append((s, "pool", self.number(self.pools[s])))
+            if s in self.fcns:
+                context.append((s, "fcn", self.number(self.fcns[s][1]), tuple(self.fcns[s][0])))
+            if s in self.names:
+                context.append((s, "type", self.number(self.names[s])))
+        return number, tuple(context)
+
+    # literals
+
+    def literalInt(self, x, scope):
+        expect(conforms(intType, x["int"]), "\"int\" literal must be a 32-bit integer")
+        return intType
+
+    def literalLong(self, x, scope):
+        expect(conforms(longType, x["long"]), "\"long\" literal must be a 64-bit integer")
+        return longType
+
+    def literalFloat(self, x, scope):
+        expect(conforms(floatType, x["float"]), "\"float\" literal must be a number")
+        return floatType
+
+    def literalDouble(self, x, scope):
+        expect(conforms(doubleType, x["double"]), "\"double\" literal must be a number")
+        return doubleType
+
+    def literalString(self, x, scope):
+        expect(isinstance(x["string"], basestring), "\"string\" literal must be a string")
+        return stringType
+
+    def literalBase64(self, x, scope):
+        expect(isinstance(x["base64"], basestring), "\"base64\" literal must be a string")
+        try:
+            base64.b64decode(x["base64"])
+        except TypeError:
+            raise TypeCheckError("\"base64\" literal is not base-64 encoded")
+        return bytesType
+
+    def literalValue(self, x, scope):
+        t = self.parse(x["type"])
+        if not conforms(t, x["value"]):
+            raise TypeCheckError("value does not have type " + repr(t))
+        return t
+
+    # special forms
+
+    def newForm(self, x, scope):
+        t = self.parse(x["type"])
+        items = x["new"]
+        if isinstance(t, AvroArray):
+            expect(isinstance(items, list), "\"new\" of an array must be a JSON array")
+            expected = [(i, t.items) for i in xrange(len(items))]
+        elif isinstance(t, AvroMap):
+            expect(isinstance(items, dict), "\"new\" of a map must be a JSON object")
+            expected = [(k, t.values) for k in sorted(items)]
+        elif isinstance(t, AvroRecord):
+            if not (isinstance(items, dict) and set(items) == set(t.fields)):
+                raise TypeCheckError("\"new\" of record " + t.fullName + " must have exactly its fields")
+            expected = t.fields.items()
+        else:
+            raise TypeCheckError("\"new\" can only make arrays, maps and records, not " + repr(t))
+        for k, e in expected:
+            v = value(self.check(items[k], scope.sealed(), "new", k))
+            if not accepts(e, v):
+                raise located(TypeCheckError("must be " + repr(e) + ", not " + repr(v)), "new", k)
+        return t
+
+    def letForm(self, x, scope):
+        expect(isinstance(x["let"], dict) and len(x["let"]) > 0, "\"let\" must be a non-empty JSON object")
+        types = {}
+        for name, expr in sorted(x["let"].items()):
+            types[name] = value(self.check(expr, scope.sealed(), "let", name))
+        for name, t in sorted(types.items()):
+            try:
+                scope.declare(name, t)
+            except TypeCheckError as err:
+                raise located(err, "let", name)
+        return null
+
+    def assign(self, assignments, scope, field):
+        # "set" and the "step" of "for"
+        if not (isinstance(assignments, dict) and len(assignments) > 0):
+            raise TypeCheckError(json.dumps(field) + " must be a non-empty JSON object")
+        for name, expr in sorted(assignments.items()):
+            found = scope.lookup(name)
+            if found is None:
+                raise located(TypeCheckError("unknown symbol " + json.dumps(name)), field, name)
+            if not found[1]:
+                raise located(TypeCheckError("symbol " + json.dumps(name) + " can't be modified here"), field, name)
+            t = value(self.check(expr, scope.sealed(), field, name))
+            if not accepts(found[0], t):
+                raise located(TypeCheckError("symbol has type " + repr(found[0]) + ", not " + repr(t)), field, name)
+
+    def setForm(self, x, scope):
+        self.assign(x["set"], scope, "set")
+        return null
+
+    def condition(self, x, scope, *where):
+        t = self.check(x, scope.sealed(), *where)
+        if t != boolean:
+            raise located(TypeCheckError("condition must be boolean, not " + repr(t)), *where)
+
+    def forForm(self, x, scope):
+        expect(isinstance(x["for"], dict) and len(x["for"]) > 0, "\"for\" must be a non-empty JSON object")
+        loop = scope.child()
+        types = {}
+        for name, expr in sorted(x["for"].items()):
+            types[name] = value(self.check(expr, scope.sealed(), "for", name))
+        for name, t in sorted(types.items()):
+            try:
+                loop.declare(name, t)
+            except TypeCheckError as err:
+                raise located(err, "for", name)
+        self.condition(x["while"], loop, "while")
+        self.assign(x["step"], loop, "step")
+        self.block(x["do"], loop.child(), "do")
+        return null
+
+    def foreachForm(self, x, scope):
+        seq = x.get("seq", True)
+        expect(isinstance(seq, bool), "\"seq\" must be true or false")
+        t = self.check(x["in"], scope.sealed(), "in")
+        if not isinstance(t, AvroArray):
+            raise TypeCheckError("\"foreach\" must iterate over an array, not " + repr(t))
+        loop = scope.child(sealedAbove=not seq)
+        try:
+            loop.declare(x["foreach"], t.items)
+        except TypeCheckError as err:
+            raise located(err, "foreach")
+        self.block(x["do"], loop, "do")
+        return null
+
+    def forkeyForm(self, x, scope):
+        t = self.check(x["in"], scope.sealed(), "in")
+        if not isinstance(t, AvroMap):
+            raise TypeCheckError("\"forkey\" must iterate over a map, not " + repr(t))
+        expect(x["forkey"] != x["forval"], "\"forkey\" and \"forval\" must be different symbols")
+        loop = scope.child()
+        for field, symbolType in (("forkey", stringType), ("forval", t.values)):
+            try:
+                loop.declare(x[field], symbolType)
+            except TypeCheckError as err:
+                raise located(err, field)
+        self.block(x["do"], loop, "do")
+        return null
+
+    def whileForm(self, x, scope):
+        self.condition(x["while"], scope, "while")
+        self.block(x["do"], scope.child(), "do")
+        return null
+
+    def doUntilForm(self, x, scope):
+        # the condition sees the symbols declared in the body
+        loop = scope.child()
+        self.block(x["do"], loop, "do")
+        self.condition(x["until"], loop, "until")
+        return null
+
+    def ifForm(self, x, scope):
+        self.condition(x["if"], scope, "if")
+        then = self.block(x["then"], scope.child(), "then")
+        if "else" not in x:
+            return null
+        return branches([then, self.block(x["else"], scope.child(), "else")])
+
+    def condForm(self, x, scope):
+        expect(isinstance(x["cond"], list) and len(x["cond"]) > 0, "\"cond\" must be a non-empty JSON array")
+        types = []
+        for i, clause in enumerate(x["cond"]):
+            if not isinstance(clause, dict) or set(clause) != set(["if", "then"]):
+                raise located(TypeCheckError("each clause must have exactly \"if\" and \"then\""), "cond", i)
+            self.condition(clause["if"], scope, "cond", i, "if")
+            types.append(self.block(clause["then"], scope.child(), "cond", i, "then"))
+        if "else" not in x:
+            return null
+        return branches(types + [self.block(x["else"], scope.child(), "else")])
+
+    def castForm(self, x, scope):
+        partial = x.get("partial", False)
+        expect(isinstance(partial, bool), "\"partial\" must be true or false")
+        t = self.check(x["cast"], scope.sealed(), "cast")
+        expect(isinstance(x["cases"], list) and len(x["cases"]) > 0, "\"cases\" must be a non-empty JSON array")
+        caseTypes = []
+        types = []
+        for i, case in enumerate(x["cases"]):
+            try:
+                expect(isinstance(case, dict) and set(case) == set(["as", "named", "do"]), "each case must have exactly \"as\", \"named\" and \"do\"")
+                caseType = self.parse(case["as"])
+                if not accepts(t, caseType):
+                    raise TypeCheckError("case " + repr(caseType) + " can never match " + repr(t))
+                body = scope.child()
+                body.declare(case["named"], caseType)
+                types.append(self.block(case["do"], body, "do"))
+                caseTypes.append(caseType)
+            except TypeCheckError as err:
+                raise located(err, "cases", i)
+        if partial:
+            return null
+        for member in (t.types if isinstance(t, AvroUnion) else [t]):
+            if not any(accepts(c, member) for c in caseTypes):
+                raise TypeCheckError("cases do not cover " + repr(member) + " (use \"partial\")")
+        return branches(types)
+
+    def upcastForm(self, x, scope):
+        t = self.check(x["upcast"], scope.sealed(), "upcast")
+        target = self.parse(x["as"])
+        if not accepts(target, t):
+            raise TypeCheckError("can't upcast " + repr(t) + " to " + repr(target))
+        return target
+
+    def ifnotnullForm(self, x, scope):
+        expect(isinstance(x["ifnotnull"], dict) and len(x["ifnotnull"]) > 0, "\"ifnotnull\" must be a non-empty JSON object")
+        then = scope.child()
+        for name, expr in sorted(x["ifnotnull"].items()):
+            t = self.check(expr, scope.sealed(), "ifnotnull", name)
+            if not isinstance(t, AvroUnion) or null not in t.types:
+                raise located(TypeCheckError("must be a union with null, not " + repr(t)), "ifnotnull", name)
+            try:
+                then.declare(name, makeUnion([m for m in t.types if m != null]))
+            except TypeCheckError as err:
+                raise located(err, "ifnotnull", name)
+        thenType = self.block(x["then"], then, "then")
+        if "else" not in x:
+            return null
+        return branches([thenType, self.block(x["else"], scope.child(), "else")])
+
+    def unpackForm(self, x, scope):
+        t = self.check(x["unpack"], scope.sealed(), "unpack")
+        if t != bytesType:
+            raise TypeCheckError("\"unpack\" must be given bytes, not " + repr(t))
+        expect(isinstance(x["format"], list) and len(x["format"]) > 0, "\"format\" must be a non-empty JSON array")
+        then = scope.child()
+        for i, spec in enumerate(x["format"]):
+            try:
+                expect(isinstance(spec, dict) and len(spec) == 1, "each format must be a single-member JSON object")
+                name, fmt = spec.items()[0]
+                then.declare(name, formatType(fmt, False))
+            except TypeCheckError as err:
+                raise located(err, "format", i)
+        thenType = self.block(x["then"], then, "then")
+        if "else" not in x:
+            return null
+        return branches([thenType, self.block(x["else"], scope.child(), "else")])
+
+    def packForm(self, x, scope):
+        expect(isinstance(x["pack"], list) and len(x["pack"]) > 0, "\"pack\" must be a non-empty JSON array")
+        for i, spec in enumerate(x["pack"]):
+            try:
+                expect(isinstance(spec, dict) and len(spec) == 1, "each format must be a single-member JSON object")
+                fmt, expr = spec.items()[0]
+                expected = formatType(fmt, True)
+                t = value(self.expression(expr, scope.sealed()))
+                if not accepts(expected, t):
+                    raise TypeCheckError("format " + json.dumps(fmt) + " packs " + repr(expected) + ", not " + repr(t))
+            except TypeCheckError as err:
+                raise located(err, "pack", i)
+        return bytesType
+
+    def attrForm(self, x, scope):
+        t = self.check(x["attr"], scope.sealed(), "attr")
+        expect(isinstance(x["path"], list) and len(x["path"]) > 0, "\"path\" must be a non-empty JSON array")
+        target = self.walk(t, x["path"], scope)
+        if "to" in x:
+            self.updater(x["to"], target, scope)
+            return t
+        return target
+
+    def cellForm(self, x, scope):
+        if x["cell"] not in self.cells:
+            raise TypeCheckError("unknown cell " + json.dumps(x["cell"]))
+        t = self.cells[x["cell"]]
+        path = x.get("path", [])
+        expect(isinstance(path, list), "\"path\" must be a JSON array")
+        target = self.walk(t, path, scope)
+        if "to" in x:
+            self.updater(x["to"], target, scope)
+            return t
+        return target
+
+    def poolForm(self, x, scope):
+        if x["pool"] not in self.pools:
+            raise TypeCheckError("unknown pool " + json.dumps(x["pool"]))
+        t = self.pools[x["pool"]]
+        if "del" in x:
+            expect(set(x) == set(["pool", "del"]), "\"del\" can't be combined with \"path\", \"to\" or \"init\"")
+            expect(self.check(x["del"], scope.sealed(), "del") == stringType, "\"del\" must be a string")
+            return null
+        expect(isinstance(x.get("path"), list) and len(x["path"]) > 0, "\"path\" must be a non-empty JSON array")
+        target = self.walk(AvroMap(t), x["path"], scope)
+        if "to" in x:
+            expect("init" in x, "\"to\" requires \"init\"")
+            init = value(self.check(x["init"], scope.sealed(), "init"))
+            if not accepts(t, init):
+                raise TypeCheckError("\"init\" must be " + repr(t) + ", not " + repr(init))
+            self.updater(x["to"], target, scope)
+            return t
+        expect("init" not in x, "\"init\" requires \"to\"")
+        return target
+
+    def callForm(self, x, scope):
+        t = self.check(x["call"], scope.sealed(), "call")
+        if not isinstance(t, AvroEnum):
+            raise TypeCheckError("\"call\" must be an enum of function names, not " + repr(t))
+        expect(isinstance(x["args"], list), "\"args\" must be a JSON array")
+        returns = []
+        for symbol in t.symbols:
+            if "u." + symbol not in self.fcns:
+                raise TypeCheckError("\"call\" enum names unknown function u." + symbol)
+            returns.append(self.functionCall("u." + symbol, x["args"], scope))
+        return branches(returns)
+
+    def doForm(self, x, scope):
+        return value(self.block(x["do"], scope.child(), "do"))
+
+    def docForm(self, x, scope):
+        expect(isinstance(x["doc"], basestring), "\"doc\" must be a string")
+        return null
+
+    def errorForm(self, x, scope):
+        expect(isinstance(x["error"], basestring), "\"error\" must be a string")
+        code = x.get("code", -1)
+        expect(isinstance(code, (int, long)) and not isinstance(code, bool) and code < 0, "\"code\" must be a negative integer")
+        return bottom
+
+    def tryForm(self, x, scope):
+        expect(isinstance(x.get("filter", []), list) and all(isinstance(f, (basestring, int, long)) for f in x.get("filter", [])), "\"filter\" must be a JSON array of strings and integers")
+        t = value(self.block(x["try"], scope.child(), "try"))
+        return makeUnion([t, null])
+
+    def logForm(self, x, scope):
+        expect(isinstance(x.get("namespace", ""), basestring), "\"namespace\" must be a string")
+        for i, expr in enumerate(x["log"] if isinstance(x["log"], list) else [x["log"]]):
+            self.check(expr, scope.sealed(), "log", i)
+        return null
+
+def readDocument(fileName):
+    if fileName.endswith(".gz"):
+        return gzip.open(fileName).read()
+    return open(fileName).read()
+
+documentExtensions = (".json", ".pfa", ".json.gz", ".pfa.gz")
+
+def documentFiles(paths):
+    # the files named and the documents in the directories named, recursively
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, fileNames in os.walk(path):
+                subdirectories.sort()
+                for fileName in sorted(fileNames):
+                    if fileName.endswith(documentExtensions):
+                        yield os.path.join(directory, fileName)
+        else:
+            yield path
+
+checker = None
+
+def startChecker(catalogFile, version, cacheSize):
+    global checker
+    catalog = loadCatalog(catalogFile)
+    checker = TypeChecker(catalog, None if version is None else versionNumbers(version), cacheSize)
+
+def checkItem(item):
+    # (label, error message or None, seconds, subtree cache hits, lookups) of a document given by
+    # file name, or by text (an example of a test suite if isExample)
+    label, fileName, text, isExample = item
+    hits = checker.hits
+    lookups = checker.lookups
+    start = time.time()
+    try:
+        if text is None:
+            text = readDocument(fileName)
+        doc = json.loads(text)
+        if isExample:
+            doc = doc["engine"]
+        if '"@"' in text:
+            doc = withoutLocators(doc)
+        checker.checkDocument(doc)
+        message = None
+    except ValueError as err:
+        message = "not JSON: " + str(err)
+    except TypeCheckError as err:
+        message = errorMessage(err)
+    except Exception as err:
+        message = "internal error: " + repr(err)
+    return label, message, time.time() - start, checker.hits - hits, checker.lookups - lookups
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    from runTest import scanExamples, latencies
+
+    parser = argparse.ArgumentParser(description="Type-check PFA documents against the library signatures of ../libfcns.xml without building engines. Prints each rejected document with the reason; exits with status 1 if any were rejected.")
+    parser.add_argument("paths", nargs="+", help="PFA documents, or directories to search for *.json and *.pfa documents (optionally gzipped)")
+    parser.add_argument("--suite", action="store_true", help="the paths are test suites, such as pfa-tests.json: check the engine of every example")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes (default 1)")
+    parser.add_argument("--pfa-version", default=None, help="check against the library of this PFA version (default: that of libfcns.xml)")
+    parser.add_argument("--cache-size", type=int, default=100000, help="subtree types to keep per worker before starting over; 0 disables the cache (default 100000)")
+    parser.add_argument("--verbose", action="store_true", help="also print the documents that pass, with their checking times")
+    args = parser.parse_args()
+
+    def items():
+        if args.suite:
+            for fileName in args.paths:
+                for counter, (offset, text, function) in enumerate(scanExamples(open(fileName))):
+                    yield "%s:%d %s" % (fileName, counter + 1, function), None, text, True
+        else:
+            for fileName in documentFiles(args.paths):
+                yield fileName, fileName, None, False
+
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs, startChecker, ("../libfcns.xml", args.pfa_version, args.cache_size))
+        results = pool.imap(checkItem, items(), 16)
+    else:
+        startChecker("../libfcns.xml", args.pfa_version, args.cache_size)
+        results = itertools.imap(checkItem, items())
+
+    times = []
+    numRejected = 0
+    numHits = 0
+    numLookups = 0
+    for label, message, seconds, hits, lookups in results:
+        times.append(seconds * 1000.0)
+        numHits += hits
+        numLookups += lookups
+        if message is not None:
+            numRejected += 1
+            print "%s: %s" % (label, message)
+        elif args.verbose:
+            print "%s: OK (%.2f ms)" % (label, seconds * 1000.0)
+
+    if len(times) == 0:
+        print >>sys.stderr, "no documents found"
+        sys.exit(1)
+    print >>sys.stderr, "%d documents, %d rejected; per document: %s; subtree cache: %d of %d reused" % (len(times), numRejected, ", ".join("%s %.2f ms" % x for x in latencies(times).items()), numHits, numLookups)
+    if numRejected > 0:
+        sys.exit(1)